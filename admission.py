@@ -0,0 +1,236 @@
+# Admission control for heavy work (queries, exports, conversions).
+# At most max_active requests run at once in the process and at most
+# max_per_user for any one user; the rest wait in a queue. When a slot frees
+# up, the waiting request whose user has the fewest running requests goes
+# next (oldest first on ties), so one user queueing many requests cannot
+# starve the others. A newer request from the same owner (a browser session,
+# not the username, which several people may share) for the same kind of work
+# supersedes the older one: a waiting request is dropped from the queue and a
+# running one has its cancel callbacks called (e.g. cursor.cancel). A cancelled
+# request that was already running keeps its slot until it is released, since
+# the work it started may still be finishing. Instead of blocking in wait(),
+# background work can pass on_admit to be called once its ticket is admitted.
+import itertools
+import threading
+import time
+
+DEFAULT_MAX_ACTIVE = 4
+DEFAULT_MAX_PER_USER = 1
+DEFAULT_MAX_WAIT_SECONDS = 300
+
+WAITING = "waiting"
+ACTIVE = "active"
+RELEASED = "released"
+CANCELLED = "cancelled"
+
+
+class AdmissionCancelled(Exception):
+    pass
+
+
+class AdmissionTimeout(Exception):
+    pass
+
+
+class Ticket:
+    def __init__(self, controller, seq, user, kind, owner=None, on_admit=None):
+        self.controller = controller
+        self.seq = seq
+        self.user = user
+        self.kind = kind
+        self.owner = owner
+        self.state = WAITING
+        self.reason = None
+        self.created_at = time.time()
+        self.admitted_at = None
+        self._callbacks = []
+        self._on_admit = on_admit
+
+    @property
+    def cancelled(self):
+        return self.state == CANCELLED
+
+    # 1-based place in the queue while waiting, 0 once admitted
+    @property
+    def position(self):
+        return self.controller.position(self)
+
+    # Block until admitted or timeout seconds pass (None = until admitted).
+    # Returns True once admitted and False on timeout; raises AdmissionCancelled
+    # if the ticket was superseded, and AdmissionTimeout (dropping the ticket)
+    # once it has waited longer than the controller's max_wait_seconds.
+    def wait(self, timeout=None):
+        return self.controller.wait(self, timeout)
+
+    # fn() runs if the ticket is cancelled while admitted; errors are ignored
+    def add_cancel_callback(self, fn):
+        with self.controller._lock:
+            if self.state != CANCELLED:
+                self._callbacks.append(fn)
+                return
+        _call_quietly(fn)
+
+    def release(self):
+        self.controller.release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+def _call_quietly(fn):
+    try:
+        fn()
+    except Exception:
+        pass
+
+
+class AdmissionController:
+    def __init__(self, max_active=DEFAULT_MAX_ACTIVE, max_per_user=DEFAULT_MAX_PER_USER,
+                 max_wait_seconds=DEFAULT_MAX_WAIT_SECONDS):
+        self.max_active = max(1, max_active)
+        self.max_per_user = max(1, max_per_user)
+        self.max_wait_seconds = max_wait_seconds
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._seq = itertools.count()
+        self._waiting = []
+        self._active = []
+        self._counts = {"admitted": 0, "cancelled": 0, "timed_out": 0}
+        self._max_wait = 0.0
+
+    # Queue a request for user; the per-user limit applies to user. Given an
+    # owner, that owner's earlier request of the same kind is cancelled.
+    # on_admit(ticket), if given, is called (outside the lock) once it is admitted.
+    def request(self, user, kind, owner=None, on_admit=None):
+        superseded = []
+        with self._lock:
+            ticket = Ticket(self, next(self._seq), user, kind, owner, on_admit)
+            if owner is not None:
+                superseded = [t for t in self._waiting + self._active
+                              if t.owner == owner and t.kind == kind and t.state != CANCELLED]
+                for old in superseded:
+                    self._cancel_locked(old, "Superseded by a newer request")
+            self._waiting.append(ticket)
+            admitted = self._dispatch_locked()
+        for old in superseded:
+            self._run_callbacks(old)
+        self._run_admitted(admitted)
+        return ticket
+
+    def cancel(self, ticket, reason="Cancelled"):
+        with self._lock:
+            if ticket.state not in (WAITING, ACTIVE):
+                return
+            self._cancel_locked(ticket, reason)
+            admitted = self._dispatch_locked()
+        self._run_callbacks(ticket)
+        self._run_admitted(admitted)
+
+    def release(self, ticket):
+        with self._lock:
+            if ticket in self._waiting:
+                self._waiting.remove(ticket)
+            if ticket in self._active:
+                self._active.remove(ticket)
+            if ticket.state in (WAITING, ACTIVE):
+                ticket.state = RELEASED
+            ticket._callbacks = []
+            admitted = self._dispatch_locked()
+        self._run_admitted(admitted)
+
+    def wait(self, ticket, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            while True:
+                if ticket.state == ACTIVE:
+                    return True
+                if ticket.state == CANCELLED:
+                    raise AdmissionCancelled(ticket.reason)
+                if ticket.state == RELEASED:
+                    raise AdmissionCancelled("Request was released before it was admitted")
+                waited = time.time() - ticket.created_at
+                if self.max_wait_seconds and waited >= self.max_wait_seconds:
+                    self._waiting.remove(ticket)
+                    ticket.state = CANCELLED
+                    ticket.reason = "Timed out waiting for a free slot"
+                    self._counts["timed_out"] += 1
+                    raise AdmissionTimeout(
+                        f"Still waiting after {self.max_wait_seconds}s; the server is busy, please try again")
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                if self.max_wait_seconds:
+                    limit = self.max_wait_seconds - waited
+                    remaining = limit if remaining is None else min(remaining, limit)
+                self._changed.wait(remaining)
+
+    def position(self, ticket):
+        with self._lock:
+            if ticket.state != WAITING:
+                return 0
+            running = self._running_locked()
+            order = sorted(self._waiting, key=lambda t: (running.get(t.user, 0), t.seq))
+            return order.index(ticket) + 1
+
+    def _running_locked(self):
+        running = {}
+        for t in self._active:
+            running[t.user] = running.get(t.user, 0) + 1
+        return running
+
+    # A running ticket stays in _active (and counted) until release()
+    def _cancel_locked(self, ticket, reason):
+        if ticket in self._waiting:
+            self._waiting.remove(ticket)
+        ticket.state = CANCELLED
+        ticket.reason = reason
+        self._counts["cancelled"] += 1
+
+    def _run_callbacks(self, ticket):
+        with self._lock:
+            callbacks, ticket._callbacks = ticket._callbacks, []
+        for fn in callbacks:
+            _call_quietly(fn)
+
+    def _run_admitted(self, tickets):
+        for ticket in tickets:
+            if ticket._on_admit is not None:
+                try:
+                    ticket._on_admit(ticket)
+                except Exception:
+                    pass
+
+    # Admit waiting tickets while there is room: fewest running requests per user first, then oldest.
+    # Returns the tickets admitted by this call.
+    def _dispatch_locked(self):
+        admitted = []
+        while len(self._active) < self.max_active:
+            running = self._running_locked()
+            eligible = [t for t in self._waiting if running.get(t.user, 0) < self.max_per_user]
+            if not eligible:
+                break
+            ticket = min(eligible, key=lambda t: (running.get(t.user, 0), t.seq))
+            self._waiting.remove(ticket)
+            self._active.append(ticket)
+            ticket.state = ACTIVE
+            ticket.admitted_at = time.time()
+            self._counts["admitted"] += 1
+            self._max_wait = max(self._max_wait, ticket.admitted_at - ticket.created_at)
+            admitted.append(ticket)
+        # Waiters re-check their state and queue position
+        self._changed.notify_all()
+        return admitted
+
+    def stats(self):
+        with self._lock:
+            return {
+                "active": len(self._active),
+                "waiting": len(self._waiting),
+                "max_active": self.max_active,
+                "max_per_user": self.max_per_user,
+                "max_wait_ms": 1000 * self._max_wait,
+                **self._counts,
+            }
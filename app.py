@@ -3,19 +3,41 @@ import streamlit as st
 import pandas as pd
 import os
 from io import BytesIO 
-import openpyxl
-import pyodbc
-from datetime import datetime, timedelta
-import streamlit.components.v1 as components
+import copy
+from datetime import datetime
 import logging
 import streamlit_authenticator as stauth
-import yaml
-from yaml.loader import SafeLoader
-import json
-import toml
-from pathlib import Path
 from dotenv import load_dotenv
-import bcrypt
+import uuid
+import tempfile
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from sql_fetch import (DEFAULT_BATCH_SIZE, PREVIEW_ROWS, DATE_CSV_FORMAT, TYPED_AMOUNT_COLUMNS, TYPED_DATE_COLUMNS,
+                       coerce_typed_columns, concat_frames, display_columns, fetch_frame, rows_to_frame, stream_to_spool,
+                       typed_excel_formats)
+from result_cache import ResultCache, make_cache_key
+from delta_fetch import IncrementalResultCache, make_filter_key
+from parallel_fetch import (DEFAULT_SLICES, SOURCE_COLUMN, fetch_each, fetch_ranges_parallel, merge_sources,
+                            split_date_range)
+from connection_pool import PoolRegistry
+from query_builder import OutstandingQueryBuilder
+from excel_export import XLSX_MIME, available_backends, frame_chunks, write_excel, write_excel_sheets
+from results_grid import render_results_grid, render_spool_grid
+from export_jobs import DONE, FAILED, QUEUED, RUNNING, ExportJobManager
+from query_log import get_query_logger, log_event
+from perf_timings import RunProfiler, StageTimer, TimingStore
+from fast_readers import PARSER_BACKENDS
+from snapshot_store import SnapshotStore
+from report_config import (connection_string, database_selection, invoice_type_filters, odbc_connect, odbc_errors,
+                           payment_terms_filters, product_code_range)
+from auth_setup import build_credentials
+from admission import AdmissionCancelled, AdmissionController, AdmissionTimeout
+from summaries import (SUMMARY_AMOUNT_COLUMNS, SUMMARY_KINDS, SUMMARY_SHEETS, fetch_summaries, summarize,
+                       summary_excel_formats, summary_sections)
+from file_converter import (DEFAULT_CHUNK_ROWS, FileState, batch_convert, content_digest, convert_streaming,
+                            make_process_pool, parse_file, read_header, read_preview)
 
 # Load environment variables from .env file if it exists
 if os.path.exists(".env"):
@@ -29,103 +51,250 @@ SQL_PASSWORD = os.getenv("SQL_PASSWORD", "")
 AUTH_COOKIE_NAME = os.getenv("AUTH_COOKIE_NAME", "auth_cookie")
 AUTH_COOKIE_KEY = os.getenv("AUTH_COOKIE_KEY", "default_insecure_key")
 AUTH_COOKIE_EXPIRY_DAYS = int(os.getenv("AUTH_COOKIE_EXPIRY_DAYS", "30"))
+RESULT_CACHE_TTL_SECONDS = int(os.getenv("RESULT_CACHE_TTL_SECONDS", "600"))
+RESULT_CACHE_MAX_MB = int(os.getenv("RESULT_CACHE_MAX_MB", "512"))
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "5"))
+DB_POOL_IDLE_SECONDS = int(os.getenv("DB_POOL_IDLE_SECONDS", "300"))
+DB_POOL_CHECKOUT_TIMEOUT = int(os.getenv("DB_POOL_CHECKOUT_TIMEOUT", "30"))
+EXPORT_DIR = os.getenv("EXPORT_DIR", "")
+EXPORT_TTL_SECONDS = int(os.getenv("EXPORT_TTL_SECONDS", "3600"))
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "2"))
+PARALLEL_FETCH_MAX_CONCURRENCY = int(os.getenv("PARALLEL_FETCH_MAX_CONCURRENCY", "4"))
+INCREMENTAL_VOLATILE_DAYS = int(os.getenv("INCREMENTAL_VOLATILE_DAYS", "7"))
+INCREMENTAL_TTL_HOURS = int(os.getenv("INCREMENTAL_TTL_HOURS", "12"))
+INCREMENTAL_CACHE_MAX_MB = int(os.getenv("INCREMENTAL_CACHE_MAX_MB", "512"))
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "")
+SNAPSHOT_MAX_MB = int(os.getenv("SNAPSHOT_MAX_MB", "2048"))
+SNAPSHOT_MAX_AGE_HOURS = int(os.getenv("SNAPSHOT_MAX_AGE_HOURS", "168"))
+CONVERT_WORKERS = int(os.getenv("CONVERT_WORKERS", str(min(4, os.cpu_count() or 1))))
+MAX_CONCURRENT_QUERIES = int(os.getenv("MAX_CONCURRENT_QUERIES", "4"))
+MAX_QUERIES_PER_USER = int(os.getenv("MAX_QUERIES_PER_USER", "1"))
+MAX_CONCURRENT_EXPORTS = int(os.getenv("MAX_CONCURRENT_EXPORTS", "2"))
+MAX_EXPORTS_PER_USER = int(os.getenv("MAX_EXPORTS_PER_USER", "1"))
+ADMISSION_MAX_WAIT_SECONDS = int(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "300"))
+QUERY_TIMEOUT_SECONDS = int(os.getenv("QUERY_TIMEOUT_SECONDS", "300"))
+ADMISSION_POLL_SECONDS = 0.5
+QUERY_POLL_SECONDS = 0.5
+EXPORT_POLL_SECONDS = 1.0
+ADMIN_USERS = [u.strip() for u in os.getenv("ADMIN_USERS", "admin").split(",") if u.strip()]
 
 # Log startup info
 print(f"Starting app with SQL server: {SQL_SERVER}")
 
-# Helper function to check if a password is already hashed
-def is_hashed(password):
-    return password and password.startswith("$2b$") and len(password) > 50
+# Shared across all sessions in this process
+@st.cache_resource
+def get_result_cache():
+    return ResultCache(ttl_seconds=RESULT_CACHE_TTL_SECONDS, max_bytes=RESULT_CACHE_MAX_MB * 1024 * 1024)
 
-# Helper function to hash a password if it's not already hashed
-def hash_password_if_needed(password):
-    if not password:
+# Per-day coverage of earlier fetches, so a widened date range only queries the new days
+@st.cache_resource
+def get_incremental_cache():
+    return IncrementalResultCache(
+        volatile_days=INCREMENTAL_VOLATILE_DAYS,
+        ttl_seconds=INCREMENTAL_TTL_HOURS * 3600,
+        max_bytes=INCREMENTAL_CACHE_MAX_MB * 1024 * 1024
+    )
+
+# One pyodbc connection pool per database, shared across all sessions in this process
+@st.cache_resource
+def get_connection_pools():
+    return PoolRegistry(
+        min_size=DB_POOL_MIN_SIZE,
+        max_size=DB_POOL_MAX_SIZE,
+        idle_seconds=DB_POOL_IDLE_SECONDS,
+        checkout_timeout=DB_POOL_CHECKOUT_TIMEOUT
+    )
+
+# Global and per-user limits on concurrent database queries, with a fair queue for the rest
+@st.cache_resource
+def get_query_admission():
+    return AdmissionController(max_active=MAX_CONCURRENT_QUERIES, max_per_user=MAX_QUERIES_PER_USER,
+                               max_wait_seconds=ADMISSION_MAX_WAIT_SECONDS)
+
+# Same for memory-heavy file builds: export jobs and File Converter conversions
+@st.cache_resource
+def get_export_admission():
+    return AdmissionController(max_active=MAX_CONCURRENT_EXPORTS, max_per_user=MAX_EXPORTS_PER_USER,
+                               max_wait_seconds=ADMISSION_MAX_WAIT_SECONDS)
+
+# Background export workers and their on-disk artifacts, shared across sessions
+@st.cache_resource
+def get_export_jobs():
+    kwargs = {"ttl_seconds": EXPORT_TTL_SECONDS, "max_workers": EXPORT_WORKERS, "admission": get_export_admission()}
+    if EXPORT_DIR:
+        kwargs["export_dir"] = EXPORT_DIR
+    return ExportJobManager(**kwargs)
+
+# Fetched results saved to local disk so they survive session resets; SNAPSHOT_MAX_MB=0 turns this off
+@st.cache_resource
+def get_snapshot_store():
+    if SNAPSHOT_MAX_MB <= 0:
         return None
-    if is_hashed(password):
-        return password
-    else:
-        return stauth.Hasher([password]).generate()[0]
+    kwargs = {"max_bytes": SNAPSHOT_MAX_MB * 1024 * 1024, "max_age_seconds": SNAPSHOT_MAX_AGE_HOURS * 3600}
+    if SNAPSHOT_DIR:
+        kwargs["directory"] = SNAPSHOT_DIR
+    return SnapshotStore(**kwargs)
 
-# Create a credentials dictionary from environment variables with fallbacks
-try:
-    # Get user credentials
-    user1_username = os.getenv("USER1_USERNAME", "")
-    user1_name = os.getenv("USER1_NAME", "")
-    user1_password = os.getenv("USER1_PASSWORD", "")
-    
-    user2_username = os.getenv("USER2_USERNAME", "")
-    user2_name = os.getenv("USER2_NAME", "")
-    user2_password = os.getenv("USER2_PASSWORD", "")
-    
-    # Hash passwords if needed
-    user1_password = hash_password_if_needed(user1_password)
-    user2_password = hash_password_if_needed(user2_password)
-    
-    print(f"User 1 username: {user1_username}, name: {user1_name}")
-    print(f"User 2 username: {user2_username}, name: {user2_name}")
-    
-    # Create credentials dictionary
-    credentials = {
-        "usernames": {}
-    }
-    
-    # Add users to credentials dictionary
-    if user1_username and user1_name and user1_password:
-        credentials["usernames"][user1_username] = {
-            "name": user1_name,
-            "password": user1_password
-        }
-        
-    if user2_username and user2_name and user2_password:
-        credentials["usernames"][user2_username] = {
-            "name": user2_name,
-            "password": user2_password
-        }
-    
-    # Ensure we have at least one valid user
-    if not credentials["usernames"]:
-        st.warning("No valid users found in environment variables! Adding a default test user.")
-        # Hash a default password
-        default_password = hash_password_if_needed("password")
-        credentials["usernames"]["admin"] = {
-            "name": "Admin User",
-            "password": default_password
-        }
-        st.info("Default credentials: username = 'admin', password = 'password'")
-    
-    print(f"Available users: {list(credentials['usernames'].keys())}")
-    
-except Exception as e:
-    st.error(f"Error setting up credentials: {e}")
-    # Create a default admin user with a properly hashed password
-    default_password = hash_password_if_needed("password")
-    credentials = {
-        "usernames": {
-            "admin": {
-                "name": "Admin",
-                "password": default_password
-            }
+# Recent per-stage timings from every session, for the admin performance panel
+@st.cache_resource
+def get_timing_store():
+    return TimingStore()
+
+# Worker processes for batch file conversion; parsing is CPU-bound, so threads would serialize on the GIL
+@st.cache_resource
+def get_convert_pool():
+    return make_process_pool(max_workers=CONVERT_WORKERS)
+
+# A worker that dies (e.g. out of memory on a large upload) leaves the cached pool broken
+# for everyone; drop it so the next get_convert_pool() starts a fresh one
+def reset_convert_pool():
+    get_convert_pool().shutdown(wait=False, cancel_futures=True)
+    get_convert_pool.clear()
+
+# Parsed uploads keyed by name + content hash, so reruns and other sessions reuse them.
+# _file is excluded from hashing; the digest already identifies the content.
+@st.cache_resource(max_entries=32, ttl=3600, show_spinner=False)
+def parse_upload(name, ext, digest, backend, downcast, arrow_dtypes, _file):
+    return parse_file(_file, ext, backend=backend, downcast=downcast, arrow_dtypes=arrow_dtypes)
+
+# Content hash of an upload, computed once per uploaded file rather than on every rerun
+def upload_key(file):
+    digests = st.session_state.setdefault("upload_digests", {})
+    file_id = getattr(file, "file_id", None) or (file.name, file.size)
+    if file_id not in digests:
+        digests[file_id] = content_digest(file.getvalue())
+    return (file.name, digests[file_id])
+
+# Display-only formatting for typed results; the underlying values stay numeric/datetime
+def typed_column_config():
+    config = {name: st.column_config.NumberColumn(name, format="%.2f") for name in display_columns(TYPED_AMOUNT_COLUMNS)}
+    config.update({name: st.column_config.DatetimeColumn(name, format="DD-MMM-YYYY") for name in display_columns(TYPED_DATE_COLUMNS)})
+    return config
+
+# Holds this run until the ticket is admitted, showing its place in the queue meanwhile.
+# Raises AdmissionCancelled / AdmissionTimeout like Ticket.wait.
+def wait_for_admission(ticket, label):
+    if ticket.wait(0):
+        return
+    placeholder = st.empty()
+    try:
+        while not ticket.wait(ADMISSION_POLL_SECONDS):
+            placeholder.info(f"⏳ {label} is waiting for a free slot (position {ticket.position} in the queue)")
+    finally:
+        placeholder.empty()
+
+# on_cursor hook for fetch_frame: the ticket's cancellation cancels the cursor, and a
+# cursor opened after the ticket was cancelled never executes
+def cancel_with(ticket):
+    def on_cursor(cursor):
+        ticket.add_cancel_callback(cursor.cancel)
+        if ticket.cancelled:
+            raise AdmissionCancelled(ticket.reason)
+    return on_cursor
+
+# Run fn(*args) on a worker thread and return its result. Streamlit only stops a run
+# at its next st.* call, which never comes while the script thread is blocked in
+# cursor.execute/fetchall, so the script thread waits here in short steps instead.
+# When a rerun or stop interrupts the wait, the ticket is cancelled (cancelling its
+# cursors) and the worker is allowed to unwind before the run does. The worker shares
+# the run's context, so fn may update placeholders created by the script.
+def run_cancellable(ticket, fn, *args):
+    outcome = {}
+
+    def work():
+        try:
+            outcome["result"] = fn(*args)
+        except BaseException as e:
+            outcome["error"] = e
+
+    worker = threading.Thread(target=work, name="query", daemon=True)
+    add_script_run_ctx(worker, get_script_run_ctx())
+    worker.start()
+    heartbeat = st.empty()
+    try:
+        while worker.is_alive():
+            worker.join(QUERY_POLL_SECONDS)
+            # Any st.* call lets Streamlit raise a pending rerun or stop here
+            heartbeat.empty()
+    except BaseException:
+        ticket.controller.cancel(ticket, "Stopped because the page was rerun")
+        worker.join()
+        raise
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"]
+
+# A saved snapshot no older than a result cache entry stands in for one, e.g. after a
+# restart emptied the in-memory cache. It is put back into the cache for other sessions.
+def load_snapshot(snapshot_store, key):
+    if snapshot_store is None:
+        return None
+    loaded = snapshot_store.load(key, max_age=RESULT_CACHE_TTL_SECONDS)
+    if loaded is None:
+        return None
+    get_result_cache().put(key, loaded[0])
+    return loaded[0]
+
+# Summary tables keep full precision; amounts are only rounded for display
+def summary_column_config():
+    return {name: st.column_config.NumberColumn(name, format="%.2f") for name in SUMMARY_AMOUNT_COLUMNS}
+
+# One tab per summary kind
+def render_summaries(summaries):
+    tabs = st.tabs([SUMMARY_SHEETS[kind] for kind in summaries])
+    for tab, summary in zip(tabs, summaries.values()):
+        with tab:
+            st.dataframe(summary, hide_index=True, use_container_width=True, column_config=summary_column_config())
+
+# Summaries are small, so the workbook is built once in memory when they are computed
+def summary_workbook(summaries, backend="auto"):
+    buffer = BytesIO()
+    write_excel_sheets(summary_sections(summaries), buffer, backend=backend, column_formats=summary_excel_formats())
+    return buffer.getvalue()
+
+# Keep the latest summaries (and their download) in the session until replaced
+def store_summaries(summaries, caption, name, backend="auto"):
+    st.session_state.sql_summaries = summaries
+    st.session_state.sql_summaries_caption = caption
+    st.session_state.sql_summaries_name = name
+    st.session_state.sql_summaries_xlsx = summary_workbook(summaries, backend)
+
+# Database list and filter fragments only change with the environment, so read them once
+@st.cache_resource
+def get_report_config():
+    return database_selection(), invoice_type_filters(), payment_terms_filters()
+
+@st.cache_resource
+def get_query_builder():
+    _, invoice_filters, payment_filters = get_report_config()
+    return OutstandingQueryBuilder(invoice_filters, payment_filters)
+
+# Hashed credentials and cookie settings, built once per process: bcrypt hashing
+# of plaintext env passwords is deliberately slow and must not run on every rerun
+@st.cache_resource(show_spinner=False)
+def get_auth_config():
+    credentials, notices = build_credentials()
+    config = {
+        "credentials": credentials,
+        "cookie": {
+            "name": AUTH_COOKIE_NAME,
+            "key": AUTH_COOKIE_KEY,
+            "expiry_days": AUTH_COOKIE_EXPIRY_DAYS
         }
     }
-    st.info("Using default credentials due to error: username = 'admin', password = 'password'")
+    return config, notices
 
-# Create a cookie dictionary from environment variables
-cookie = {
-    "name": AUTH_COOKIE_NAME,
-    "key": AUTH_COOKIE_KEY,
-    "expiry_days": AUTH_COOKIE_EXPIRY_DAYS
-}
-
-# Create a config dictionary
-config = {
-    "credentials": credentials,
-    "cookie": cookie
-}
+config, auth_notices = get_auth_config()
+for level, message in auth_notices:
+    getattr(st, level)(message)
 
 # Initialize authenticator
 try:
+    # The authenticator wraps this browser's cookie component, so it is built on every
+    # run; it gets a copy of the cached credentials, which the library may modify
     authenticator = stauth.Authenticate(
-        config['credentials'],
+        copy.deepcopy(config['credentials']),
         config['cookie']['name'],
         config['cookie']['key'],
         config['cookie']['expiry_days']
@@ -172,6 +341,10 @@ elif authentication_status:
         display_name = name  # Fallback to the name from authenticator
         
     st.sidebar.success(f"👋 Welcome, *{display_name}*!")
+    is_admin = username in ADMIN_USERS
+    current_user = username
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
     authenticator.logout("Logout", "sidebar")
     
     # ✅ Your main app content goes here
@@ -179,58 +352,76 @@ elif authentication_status:
     st.write("You are successfully logged in!")
     # Your app code goes below
 
-    # Setup logging config
-    logger = logging.getLogger(__name__)
-    logger.setLevel(logging.DEBUG)
-
-    # File handler
-    try:
-        file_handler = logging.FileHandler("query_log.log")
-        file_handler.setLevel(logging.DEBUG)
-
-        # Console handler (optional)
-        console_handler = logging.StreamHandler()
-        console_handler.setLevel(logging.INFO)
-
-        # Formatter
-        formatter = logging.Formatter('%(asctime)s | %(levelname)s | %(message)s')
-        file_handler.setFormatter(formatter)
-        console_handler.setFormatter(formatter)
-
-        # Add handlers to logger
-        logger.addHandler(file_handler)
-        logger.addHandler(console_handler)
-    except Exception as e:
-        st.warning(f"Logging setup error (non-critical): {e}")
-        # Create a basic logger that just prints to console
-        logger = logging.getLogger(__name__)
-        handler = logging.StreamHandler()
-        logger.addHandler(handler)
+    # Query logger is configured once per process; later reruns get the same instance
+    logger = get_query_logger()
 
     # Set up Streamlit app
     
-    # Database selection from environment variables or defaults
-    database_selecttion = {
-        os.getenv("DB1_NAME", "Pharma Solution"): os.getenv("DB1_VALUE", "PS_TRADE"),
-        os.getenv("DB2_NAME", "Hussain Trader"): os.getenv("DB2_VALUE", "Pharma_solution")
-    }
+    # Database selection and filter fragments from environment variables or defaults
+    database_selecttion, invoice_type_selection, payment_terms_selection = get_report_config()
 
-    # Invoice Type Selection query
-    invoice_type_selection = {
-        "All": "",
-        "Remaining": os.getenv("INVOICE_REMAINING", "AND DATEDIFF(DAY, refDate, GETDATE()) < DAYs"),
-        "Over Credit": os.getenv("INVOICE_OVER_CREDIT", "AND DATEDIFF(DAY, refDate, GETDATE()) > DAYs"),
-        "No Credit": os.getenv("INVOICE_NO_CREDIT", "AND TR.PaymentTerms = 'No Credit'"),
-        "Removed Remaining": os.getenv("INVOICE_REMOVED_REMAINING", "AND NOT DATEDIFF(DAY, refDate, GETDATE()) < DAYs"),
-        "Remove Over Credit": os.getenv("INVOICE_REMOVED_OVER_CREDIT", "AND NOT DATEDIFF(DAY, refDate, GETDATE()) > DAYs"),
-        "Remove No Credit": os.getenv("INVOICE_REMOVED_NO_CREDIT", "AND NOT TR.PaymentTerms = 'No Credit'")
-    }
+    result_cache = get_result_cache()
+    incremental_cache = get_incremental_cache()
+    with st.sidebar.expander("Query Cache"):
+        cache_stats = result_cache.stats()
+        st.write(f"Entries: {cache_stats['entries']} ({cache_stats['bytes'] / 1024 / 1024:.1f} MB)")
+        st.write(f"Hits: {cache_stats['hits']} | Misses: {cache_stats['misses']} | Hit rate: {cache_stats['hit_rate']:.0%}")
+        st.write(f"Evictions: {cache_stats['evictions']}")
+        delta_stats = incremental_cache.stats()
+        st.write(f"Incremental: {delta_stats['segments']} ranges ({delta_stats['bytes'] / 1024 / 1024:.1f} MB), "
+                 f"{delta_stats['reused_days']} days reused / {delta_stats['queried_days']} queried")
 
-    payment_terms_selection = {
-        "All": "",
-        "Cash": os.getenv("PAYMENT_CASH", "AND TR.Terms = 'CASH'"),
-        "Cheque": os.getenv("PAYMENT_CHEQUE", "AND TR.Terms = 'cheque'")
-    }
+    snapshot_store = get_snapshot_store()
+    if snapshot_store is not None:
+        with st.sidebar.expander("Saved Snapshots"):
+            snapshot_stats = snapshot_store.stats()
+            st.write(f"Snapshots: {snapshot_stats['snapshots']} ({snapshot_stats['bytes'] / 1024 / 1024:.1f} MB "
+                     f"of {SNAPSHOT_MAX_MB} MB)")
+            st.write(f"Kept for up to {SNAPSHOT_MAX_AGE_HOURS} hours")
+
+    excel_backend = st.sidebar.selectbox(
+        "Excel engine", ["auto"] + available_backends(),
+        help="Streaming engines write rows as they go and split past 1,048,576 rows into extra sheets"
+    )
+
+    timing_store = get_timing_store()
+    profile_next_fetch = False
+    if is_admin:
+        with st.sidebar.expander("Performance"):
+            timing_rows = timing_store.summary()
+            if timing_rows:
+                st.dataframe(pd.DataFrame(timing_rows), hide_index=True, use_container_width=True)
+            else:
+                st.write("No timed runs yet")
+            # A captured profile turns the toggle back off so only one run is profiled
+            if st.session_state.pop("profile_captured", False):
+                st.session_state.profile_next_fetch = False
+            profile_next_fetch = st.checkbox("Profile next fetch (cProfile)", key="profile_next_fetch")
+
+    connection_pools = get_connection_pools()
+    if is_admin:
+        with st.sidebar.expander("Connection Pools"):
+            pool_stats = connection_pools.stats()
+            if not pool_stats:
+                st.write("No pools opened yet")
+            for db_name, stats in pool_stats.items():
+                st.write(f"**{db_name}**: {stats['in_use']} in use, {stats['idle']} idle")
+                st.caption(f"Checkouts: {stats['checkouts']} | Avg wait: {stats['avg_wait_ms']:.1f} ms | "
+                           f"Max wait: {stats['max_wait_ms']:.1f} ms | Created: {stats['created']} | Discarded: {stats['discarded']}")
+
+    query_admission = get_query_admission()
+    export_admission = get_export_admission()
+    if is_admin:
+        with st.sidebar.expander("Admission"):
+            for admission_label, admission in (("Queries", query_admission), ("Exports", export_admission)):
+                admission_stats = admission.stats()
+                st.write(f"**{admission_label}**: {admission_stats['active']} of {admission_stats['max_active']} running, "
+                         f"{admission_stats['waiting']} waiting")
+                st.caption(f"Admitted: {admission_stats['admitted']} | Superseded: {admission_stats['cancelled']} | "
+                           f"Timed out: {admission_stats['timed_out']} | Max wait: {admission_stats['max_wait_ms']:.0f} ms")
+
+    query_builder = get_query_builder()
+    exports_pending = False
 
     # Create tabs for different functionalities
     tab1, tab2 = st.tabs(["SQL Data", "File Converter"])
@@ -267,184 +458,847 @@ elif authentication_status:
             peyment_terms_selected = st.selectbox("Payment Terms", list(payment_terms_selection.keys()))
             payment_terms = payment_terms_selection[peyment_terms_selected]
         with col3:
-            acc2 = st.text_input("First Product Code ", os.getenv("FIRST_PRODUCT_CODE", "0001"),disabled=True)
+            acc2 = st.text_input("First Product Code ", product_code_range()[0],disabled=True)
         with col4:
-            acc3 = st.text_input("Last Product Code", os.getenv("LAST_PRODUCT_CODE", "989801"),disabled=True)
+            acc3 = st.text_input("Last Product Code", product_code_range()[1],disabled=True)
         with col5:
             acc1 = st.text_input("ACC1", "",disabled=True)
+
+        # Streaming fetch keeps only a preview in memory and spools the rest to disk
+        col1, col2 = st.columns(2)
+        with col1:
+            stream_mode = st.checkbox("Streaming fetch (large date ranges)", value=False)
+            refresh_cache = st.checkbox("Refresh (bypass cached results)", value=False)
+            fetch_all_databases = st.checkbox(
+                "Fetch across all databases", value=False, disabled=stream_mode,
+                help="Run the query against every configured database at once and combine the results"
+            )
+            incremental_fetch = st.checkbox(
+                "Incremental fetch (only query days not fetched yet)", value=False,
+                disabled=stream_mode or fetch_all_databases,
+                help=f"Days older than {INCREMENTAL_VOLATILE_DAYS} days are reused for up to "
+                     f"{INCREMENTAL_TTL_HOURS} hours; recent days are always re-queried"
+            )
+            if fetch_all_databases and not stream_mode:
+                st.caption("Incremental fetch and parallel date slices apply to a single database; "
+                           "each database runs the full range as one query.")
+            typed_results = st.checkbox("Typed results (sortable numbers and dates)", value=False,
+                                        help="Fetch raw amounts and dates and format them only for display and export")
+        with col2:
+            batch_size = st.number_input("Batch size (rows)", min_value=500, max_value=100000,
+                                         value=DEFAULT_BATCH_SIZE, step=500, disabled=not stream_mode)
+            parallel_fetch = st.checkbox(
+                "Parallel date slices", value=False, disabled=stream_mode or fetch_all_databases,
+                help=f"Split the date range and run the slices on separate connections, "
+                     f"at most {PARALLEL_FETCH_MAX_CONCURRENCY} at a time"
+            )
+            fetch_slices = st.number_input("Slices", min_value=2, max_value=32, value=DEFAULT_SLICES, step=1,
+                                           disabled=stream_mode or fetch_all_databases or not parallel_fetch)
         
         
         # Execute query button
-        if st.button("Fetch Data"):
+        fetch_timer = None
+        col1, col2 = st.columns(2)
+        with col1:
+            fetch_clicked = st.button("Fetch Data")
+        with col2:
+            summary_clicked = st.button(
+                "Fetch Summaries Only",
+                help="Totals by institute, aging buckets and totals by HT person. Rows already in the result "
+                     "cache are summarized in place; otherwise SQL Server does the grouping and only the totals "
+                     "are transferred."
+            )
+        start_date_str = start_date.strftime("%d-%b-%Y")
+        end_date_str = end_date.strftime("%d-%b-%Y")
+
+        # Steps shared by the single-database and all-databases fetches, so the two cannot drift apart
+
+        # Validate connection parameters
+        def require_connection_settings(db_names):
+            if not server or not username or not all(db_names):
+                st.error("Server, database, and username are required.")
+                st.stop()
+
+        # Fields every fetch log line and snapshot carries
+        def fetch_fields(db_name):
+            return {
+                "user": current_user,
+                "database": db_name,
+                "start_date": start_date_str,
+                "end_date": end_date_str,
+                "invoice_type": invoice_type_selected,
+                "payment_terms": peyment_terms_selected,
+                "typed": typed_results,
+                "stream": stream_mode,
+            }
+
+        def fetch_cache_key(db_name):
+            return make_cache_key(db_name, start_date_str, end_date_str, Invoice_type, payment_terms, acc1, acc2, acc3,
+                                  typed=typed_results)
+
+        def fetch_filter_key(db_name):
+            return make_filter_key(db_name, Invoice_type, payment_terms, acc1, acc2, acc3, typed=typed_results)
+
+        def fetch_pool(db_name):
+            db_conn_str = connection_string(server, db_name, username, password)
+            return connection_pools.get(db_name, lambda: odbc_connect(db_conn_str, QUERY_TIMEOUT_SECONDS))
+
+        def log_fetch(db_name, rows, source, started, **extra):
+            log_event(logger, "fetch", source=source, rows=rows, fetch_seconds=round(time.perf_counter() - started, 3),
+                      **fetch_fields(db_name), **extra)
+
+        # One run's stage timings go to the Performance panel and the query log
+        def record_timings(db_name, timer):
+            timing_store.record(timer.durations)
+            log_event(logger, "timings", user=current_user, database=db_name,
+                      stages_ms={name: round(1000 * sec, 1) for name, sec in timer.durations.items()})
+
+        # Results already fetched by any session skip the database entirely. Returns (df, source), or
+        # (None, None) when the database has to be queried; Refresh drops the cached entries instead.
+        def cached_fetch(db_name):
+            cache_key = fetch_cache_key(db_name)
+            if refresh_cache:
+                result_cache.invalidate(cache_key)
+                incremental_cache.invalidate(fetch_filter_key(db_name))
+                return None, None
+            cached = result_cache.get(cache_key)
+            if cached is not None:
+                return cached, "cache"
+            cached = load_snapshot(snapshot_store, cache_key)
+            if cached is not None:
+                return cached, "snapshot"
+            return None, None
+
+        # The report statement on a checked-out connection. Parameterized so SQL Server reuses
+        # one cached plan per filter combination.
+        def run_query(conn, ticket, timer):
+            query, query_params = query_builder.build(
+                start_date_str, end_date_str, invoice_type_selected, peyment_terms_selected, acc1, acc2, acc3,
+                typed=typed_results
+            )
+            logger.debug(f"SQL Query: {query} | Params: {query_params}")
+            cursor = conn.cursor()
+            cancel_with(ticket)(cursor)
+            with timer.stage("execute"):
+                cursor.execute(query, query_params)
+            with timer.stage("transfer"):
+                columns = [col[0] for col in cursor.description]
+                rows = cursor.fetchall()
+            with timer.stage("dataframe"):
+                query_df = rows_to_frame(rows, columns)
+                del rows
+                if typed_results:
+                    coerce_typed_columns(query_df)
+            return query_df
+
+        # Query one database and keep the rows for other sessions: result cache, then a snapshot on disk.
+        # fetch_rows(pool, conn) stands in for the single statement and returns (df, source, log fields);
+        # with hold_connection=False it gets conn=None and checks out its own connections. Runs on
+        # run_cancellable's worker thread. Returns (df, source, log fields).
+        def database_fetch(db_name, ticket, timer, fetch_rows=None, hold_connection=True):
+            pool = fetch_pool(db_name)
+            conn = None
+            if hold_connection:
+                try:
+                    with timer.stage("connect"):
+                        conn = pool.acquire()
+                except odbc_errors() as e:
+                    raise ConnectionError(f"SQL Server Connection Error: {e}") from e
+            # Set once the rows are in; any other exit discards the connection, which may still
+            # have a half-read result on it
+            completed = False
             try:
-                # Validate connection parameters
-                if not server or not database or not username:
-                    st.error("Server, database, and username are required.")
-                    st.stop()
-                
-                # Construct connection string
-                conn_str = (
-                    f"DRIVER={{SQL Server}};"
-                    f"SERVER={server};"
-                    f"DATABASE={database};"
-                    f"UID={username};"
-                    f"PWD={password};"
-                )
-                
-                # Format dates for SQL query
-                start_date_str = start_date.strftime("%d-%b-%Y")
-                end_date_str = end_date.strftime("%d-%b-%Y")
-                
-                # Connect to database
-                with st.spinner("Connecting to database..."):
-                    try:
-                        conn = pyodbc.connect(conn_str)
-                    except pyodbc.Error as e:
-                        st.error(f"SQL Server Connection Error: {e}")
-                        st.info("Note: If you're running in Streamlit Cloud, make sure your SQL Server is accessible from the internet.")
-                        st.stop()
-                    
-                    # Modify the query with parameters
-                    query = f"""
-                    SELECT 
-                        acc4 INST_Code,
-                        tr.Company as Institute_Name,
-                        HTPersonName HT_Person,
-                        personName Related_Person,
-                        tr.Id INVOICE_NO,
-                        format(refDate,'dd-MMM-yyyy') as INV_Date,
-                        format(AmtPayable,'N2') NET_AMT,
-                        format(AmtReceived,'N2') RECVD_AMT,
-                        format(SUM(AmtPayable - AmtReceived),'N2') AS Balance,
-                        remarks REMARKS,
-                        DATEDIFF(DAY, refDate, GETDATE()) AS Day_Passed,
-                        CASE 
-                            WHEN TR.CR_Days = 0 THEN DAYs 
-                            ELSE TR.CR_Days 
-                        END AS Day_LIMIT
-                    FROM 
-                        OUTSTANDINGLISTING_NEW('{start_date_str}','{end_date_str}','{acc1}','{acc2}','{acc3}') AS TR
-                    LEFT JOIN 
-                        M_PARTY ON TR.ACC4 = M_PARTY.Id
-                    WHERE 
-                        ReportType = 'Sales Invoices'
-                            {Invoice_type} {payment_terms}
-                    GROUP BY 
-                        refDate,acc4, tr.Company, HTPersonName, personName, tr.Id, AmtPayable, AmtReceived, remarks,
-                        creditLimit, Days,TR.CR_Days
-                    """
-                    logger.info(f"Running query on DB: {database}, From: {start_date_str} To: {end_date_str}, InvoiceType: {invoice_type_selected}, PaymentTerms: {peyment_terms_selected}")
-                    logger.debug(f"SQL Query: {query}")
-                    # Execute query
-                    with st.spinner("Executing query..."):
+                if fetch_rows is None:
+                    df, source, extra = run_query(conn, ticket, timer), "db", {}
+                else:
+                    df, source, extra = fetch_rows(pool, conn)
+                completed = True
+            finally:
+                if conn is not None:
+                    pool.release(conn, discard=not completed)
+            result_cache.put(fetch_cache_key(db_name), df)
+            if snapshot_store is not None:
+                try:
+                    with timer.stage("snapshot"):
+                        snapshot_store.save(fetch_cache_key(db_name), df, fetch_fields(db_name))
+                except Exception as e:
+                    log_event(logger, "snapshot_error", f"Could not save snapshot: {e}", level=logging.WARNING,
+                              **fetch_fields(db_name))
+            return df, source, extra
+
+        if fetch_clicked and fetch_all_databases and not stream_mode:
+            # Same statement against every configured database; each result is shown as soon as it lands
+            require_connection_settings(database_selecttion.values())
+            fetch_timer = StageTimer()
+            fetch_started = time.perf_counter()
+            source_column_config = typed_column_config() if typed_results else None
+            source_frames = {}
+            source_status = st.container()
+
+            # Also called on run_cancellable's worker thread, so output goes to explicit containers
+            def show_source(label, source_df, source, extra):
+                source_frames[label] = source_df
+                cached_note = f" (from {source})" if source != "db" else ""
+                source_status.expander(f"✅ {label}: {len(source_df):,} records{cached_note}").dataframe(
+                    source_df.head(PREVIEW_ROWS).set_axis(display_columns(source_df.columns), axis=1),
+                    column_config=source_column_config)
+                log_fetch(database_selecttion[label], len(source_df), source, fetch_started, **extra)
+
+            pending = []
+            for label, db_name in database_selecttion.items():
+                cached_df, cached_source = cached_fetch(db_name)
+                if cached_df is None:
+                    pending.append(label)
+                else:
+                    show_source(label, cached_df, cached_source, {})
+            # Each database gets its own connect/execute/transfer/dataframe/snapshot timings
+            source_timers = {label: StageTimer() for label in pending}
+
+            def collect_sources():
+                for label, result, error in fetch_each(
+                        pending, lambda label: database_fetch(database_selecttion[label], fetch_ticket, source_timers[label]),
+                        max_concurrency=PARALLEL_FETCH_MAX_CONCURRENCY):
+                    if error is not None:
+                        source_status.error(f"{label}: {error}")
+                        log_event(logger, "fetch_error", f"Error fetching data: {error}", level=logging.ERROR,
+                                  user=current_user, database=database_selecttion[label])
+                        continue
+                    record_timings(database_selecttion[label], source_timers[label])
+                    show_source(label, *result)
+
+            # One admission ticket covers the whole fan-out; cached databases need none
+            if pending:
+                fetch_ticket = query_admission.request(current_user, "fetch", owner=st.session_state.session_id)
+                try:
+                    wait_for_admission(fetch_ticket, "Your query")
+                    with st.spinner(f"Fetching from {len(pending)} databases..."):
+                        run_cancellable(fetch_ticket, collect_sources)
+                except (AdmissionCancelled, AdmissionTimeout) as e:
+                    st.error(str(e))
+                finally:
+                    fetch_ticket.release()
+
+            if source_frames:
+                with fetch_timer.stage("rename"):
+                    df = merge_sources(source_frames, list(database_selecttion))
+                    df = df.set_axis(display_columns(df.columns), axis=1)
+                old_spool = st.session_state.pop("sql_spool", None)
+                if old_spool is not None:
+                    old_spool.close()
+                st.session_state.sql_df = df
+                st.session_state.sql_typed = typed_results
+                st.session_state.sql_source_name = "all_databases"
+                st.session_state.sql_multi_source = True
+                st.success(f"Retrieved {len(df)} records from {len(source_frames)} of "
+                           f"{len(database_selecttion)} databases")
+
+        elif fetch_clicked:
+            conn = None
+            # Set once the run is through; any other exit (errors, st.stop, a rerun) discards the streaming
+            # connection, which may still have a half-read result on it
+            fetch_completed = False
+            fetch_ticket = None
+            fetch_timer = StageTimer()
+            profiler = RunProfiler() if profile_next_fetch else None
+            if profiler is not None:
+                profiler.start()
+            try:
+                require_connection_settings([database])
+                fetch_started = time.perf_counter()
+
+                if stream_mode:
+                    fetch_ticket = query_admission.request(current_user, "fetch", owner=st.session_state.session_id)
+                    wait_for_admission(fetch_ticket, "Your query")
+
+                    # Connect to database
+                    with st.spinner("Connecting to database..."):
+                        pool = fetch_pool(database)
+                        try:
+                            with fetch_timer.stage("connect"):
+                                conn = pool.acquire()
+                        except odbc_errors() as e:
+                            st.error(f"SQL Server Connection Error: {e}")
+                            st.info("Note: If you're running in Streamlit Cloud, make sure your SQL Server is accessible from the internet.")
+                            st.stop()
+
+                    query, query_params = query_builder.build(
+                        start_date_str, end_date_str, invoice_type_selected, peyment_terms_selected, acc1, acc2, acc3,
+                        typed=typed_results
+                    )
+                    logger.debug(f"SQL Query: {query} | Params: {query_params}")
+                    # Drop the previous spool file before starting a new one
+                    old_spool = st.session_state.pop("sql_spool", None)
+                    if old_spool is not None:
+                        old_spool.close()
+                    st.session_state.pop("sql_df", None)
+
+                    column_config = typed_column_config() if typed_results else None
+                    count_placeholder = st.empty()
+                    preview_placeholder = st.empty()
+
+                    def show_progress(spool, batch):
+                        count_placeholder.info(f"Fetched {spool.row_count:,} rows...")
+                        # Render the first page as soon as it arrives
+                        if spool.batch_count == 1:
+                            preview_placeholder.dataframe(spool.preview, column_config=column_config)
+
+                    def stream_query():
+                        cursor = conn.cursor()
+                        cancel_with(fetch_ticket)(cursor)
+                        with fetch_timer.stage("execute"):
+                            cursor.execute(query, query_params)
+                        with fetch_timer.stage("stream"):
+                            return stream_to_spool(cursor, int(batch_size), on_batch=show_progress, typed=typed_results)
+
+                    with st.spinner("Streaming query results..."):
                         try:
-                            df = pd.read_sql(query, conn)
-                            st.session_state.sql_df = df
+                            spool = run_cancellable(fetch_ticket, stream_query)
+                            st.session_state.sql_spool = spool
+                            st.session_state.sql_typed = typed_results
+                            st.session_state.sql_source_name = selected_Db
+                            st.session_state.pop("sql_multi_source", None)
                         except Exception as e:
                             st.error(f"Query execution error: {e}")
                             st.stop()
-                        
-                    st.success(f"Retrieved {len(df)} records")
-                    
-                    # Display data
-                    df.columns = [col.replace("_", " ").title() for col in df.columns]
-                    st.subheader("Query Results")
-                    st.dataframe(df)
-                    
-                    # Download options
-                    st.subheader("Download Options")
-                    col1, col2 = st.columns(2)
-                    
-                    # Excel download
-                    with col1:
-                        buffer = BytesIO()
-                        df.to_excel(buffer, index=False)
-                        buffer.seek(0)
-                        st.download_button(
-                            label="Download as Excel",
-                            data=buffer,
-                            file_name=f"{selected_Db}_{datetime.now().strftime('%Y%m%d')}.xlsx",
-                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                        )
-                    
-                    # CSV download
-                    with col2:
-                        csv = df.to_csv(index=False)
-                        st.download_button(
-                            label="Download as CSV",
-                            data=csv,
-                            file_name=f"sql_data_{datetime.now().strftime('%Y%m%d')}.csv",
-                            mime="text/csv"
-                        )
-                    
+
+                    count_placeholder.success(f"Retrieved {spool.row_count} records")
+                    log_fetch(database, spool.row_count, "db", fetch_started)
+                    # The paginated grid below takes over from the live preview
+                    preview_placeholder.empty()
+                else:
+                    df, fetch_source = cached_fetch(database)
+                    if df is not None:
+                        st.success(f"Retrieved {len(df)} records (from {fetch_source})")
+                        log_fetch(database, len(df), fetch_source, fetch_started)
+                    else:
+                        # Cached results need no database slot; everything else queues for one
+                        fetch_ticket = query_admission.request(current_user, "fetch", owner=st.session_state.session_id)
+                        wait_for_admission(fetch_ticket, "Your query")
+
+                        # Each day range runs as its own call of the same statement
+                        def fetch_range(range_conn, range_start, range_end):
+                            range_query, range_params = query_builder.build(
+                                range_start.strftime("%d-%b-%Y"), range_end.strftime("%d-%b-%Y"),
+                                invoice_type_selected, peyment_terms_selected, acc1, acc2, acc3, typed=typed_results
+                            )
+                            return fetch_frame(range_conn, range_query, range_params, typed=typed_results,
+                                               on_cursor=cancel_with(fetch_ticket))
+
+                        # One frame per range; in parallel mode every range is sliced further and the
+                        # slices are spread over pooled connections
+                        def fetch_ranges(pool, conn, ranges):
+                            if not parallel_fetch:
+                                return [fetch_range(conn, range_start, range_end) for range_start, range_end in ranges]
+                            sliced = [(i, piece) for i, (range_start, range_end) in enumerate(ranges)
+                                      for piece in split_date_range(range_start, range_end, int(fetch_slices))]
+                            frames = fetch_ranges_parallel(pool, [piece for _, piece in sliced], fetch_range,
+                                                           max_concurrency=PARALLEL_FETCH_MAX_CONCURRENCY)
+                            return [concat_frames(frame for (owner, _), frame in zip(sliced, frames) if owner == i)
+                                    for i in range(len(ranges))]
+
+                        def fetch_incremental(pool, conn):
+                            with fetch_timer.stage("transfer"):
+                                delta_df, delta_plan = incremental_cache.fetch(
+                                    fetch_filter_key(database), start_date, end_date,
+                                    lambda ranges: fetch_ranges(pool, conn, ranges))
+                            return delta_df, "delta", {"reused_days": len(delta_plan.cached_days),
+                                                       "queried_days": delta_plan.missing_days,
+                                                       "queried_ranges": len(delta_plan.missing_ranges)}
+
+                        def fetch_parallel(pool, conn):
+                            with fetch_timer.stage("transfer"):
+                                parallel_df = fetch_ranges(pool, conn, [(start_date, end_date)])[0]
+                            return parallel_df, "parallel", {
+                                "slices": len(split_date_range(start_date, end_date, int(fetch_slices)))}
+
+                        fetch_rows = fetch_incremental if incremental_fetch else fetch_parallel if parallel_fetch else None
+                        with st.spinner("Executing query..."):
+                            try:
+                                # Parallel slices check out their own pooled connections; holding one
+                                # here as well would starve them
+                                df, fetch_source, fetch_extra = run_cancellable(
+                                    fetch_ticket, database_fetch, database, fetch_ticket, fetch_timer, fetch_rows,
+                                    not parallel_fetch)
+                            except ConnectionError as e:
+                                st.error(str(e))
+                                st.info("Note: If you're running in Streamlit Cloud, make sure your SQL Server is accessible from the internet.")
+                                st.stop()
+                            except Exception as e:
+                                st.error(f"Query execution error: {e}")
+                                st.stop()
+
+                        if fetch_source == "delta":
+                            st.info(f"Reused {fetch_extra['reused_days']} cached day(s); queried "
+                                    f"{fetch_extra['queried_days']} day(s) in {fetch_extra['queried_ranges']} range(s)")
+                        st.success(f"Retrieved {len(df)} records")
+                        log_fetch(database, len(df), fetch_source, fetch_started, **fetch_extra)
+
+                    # A new frame over the same column data: the cached frame keeps its SQL
+                    # names and no session pays for a private copy of the rows
+                    with fetch_timer.stage("rename"):
+                        df = df.set_axis(display_columns(df.columns), axis=1, copy=False)
+                    old_spool = st.session_state.pop("sql_spool", None)
+                    if old_spool is not None:
+                        old_spool.close()
+                    st.session_state.sql_df = df
+                    st.session_state.sql_typed = typed_results
+                    st.session_state.sql_source_name = selected_Db
+                    st.session_state.pop("sql_multi_source", None)
+                fetch_completed = True
+
             except Exception as e:
-                logger.error(f"Error fetching data: {e}")
+                log_event(logger, "fetch_error", f"Error fetching data: {e}", level=logging.ERROR,
+                          user=current_user, database=database)
                 st.error(f"Error: {str(e)}")
+            finally:
+                # Hand the connection back to the pool instead of leaking it
+                if conn is not None:
+                    pool.release(conn, discard=not fetch_completed)
+                if fetch_ticket is not None:
+                    fetch_ticket.release()
+                if profiler is not None:
+                    profiler.stop()
+                    st.session_state.last_profile = profiler.report()
+                    st.session_state.profile_captured = True
+
+            if is_admin and "last_profile" in st.session_state:
+                with st.expander("cProfile report (last profiled fetch)"):
+                    st.code(st.session_state.last_profile)
+
+        if summary_clicked:
+            summary_started = time.perf_counter()
+            summary_args = (start_date_str, end_date_str, invoice_type_selected, peyment_terms_selected,
+                            acc1, acc2, acc3)
+            summary_targets = list(database_selecttion) if fetch_all_databases else [selected_Db]
+
+            def summarize_database(label):
+                db_name = database_selecttion[label]
+                if not refresh_cache:
+                    # Either flavour of cached rows gives the same totals
+                    cached = result_cache.get_first([
+                        make_cache_key(db_name, start_date_str, end_date_str, Invoice_type, payment_terms,
+                                       acc1, acc2, acc3, typed=typed)
+                        for typed in (typed_results, not typed_results)
+                    ])
+                    if cached is not None:
+                        return summarize(cached), "cache"
+                db_conn_str = connection_string(server, db_name, username, password)
+                db_pool = connection_pools.get(db_name, lambda: odbc_connect(db_conn_str, QUERY_TIMEOUT_SECONDS))
+                with db_pool.connection() as db_conn:
+                    return fetch_summaries(db_conn, query_builder, *summary_args,
+                                           on_cursor=cancel_with(summary_ticket)), "db"
+
+            summary_results = {}
+            summary_status = st.container()
+
+            # Runs on run_cancellable's worker thread, so errors go to an explicit container
+            def collect_summaries():
+                for label, result, error in fetch_each(summary_targets, summarize_database,
+                                                       max_concurrency=PARALLEL_FETCH_MAX_CONCURRENCY):
+                    summary_fields = {"user": current_user, "database": database_selecttion[label],
+                                      "start_date": start_date_str, "end_date": end_date_str,
+                                      "invoice_type": invoice_type_selected, "payment_terms": peyment_terms_selected}
+                    if error is not None:
+                        summary_status.error(f"{label}: {error}")
+                        log_event(logger, "summary_error", f"Error computing summaries: {error}",
+                                  level=logging.ERROR, **summary_fields)
+                        continue
+                    summary_results[label], source = result
+                    log_event(logger, "summary", source=source,
+                              summary_seconds=round(time.perf_counter() - summary_started, 3), **summary_fields)
+
+            summary_ticket = query_admission.request(current_user, "summary", owner=st.session_state.session_id)
+            try:
+                wait_for_admission(summary_ticket, "Your summary query")
+                with st.spinner("Computing summaries..."):
+                    run_cancellable(summary_ticket, collect_summaries)
+            except (AdmissionCancelled, AdmissionTimeout) as e:
+                st.error(str(e))
+            finally:
+                summary_ticket.release()
+
+            if summary_results:
+                if len(summary_targets) > 1:
+                    summaries = {kind: merge_sources({label: result[kind] for label, result in summary_results.items()},
+                                                     summary_targets)
+                                 for kind in SUMMARY_KINDS}
+                else:
+                    summaries = summary_results[summary_targets[0]]
+                store_summaries(summaries, f"{', '.join(summary_results)} | {start_date_str} to {end_date_str} | "
+                                           f"{invoice_type_selected} | {peyment_terms_selected}",
+                                "all_databases" if len(summary_targets) > 1 else selected_Db, excel_backend)
+
+        # Earlier fetches of this database, reloaded from disk instead of SQL Server
+        if snapshot_store is not None:
+            snapshots = [meta for meta in snapshot_store.list() if meta["fields"].get("database") == database]
+            with st.expander(f"Saved snapshots ({len(snapshots)})"):
+                if not snapshots:
+                    st.caption("Results fetched from the database are saved here for later reloading.")
+                for meta in snapshots:
+                    fields = meta["fields"]
+                    col1, col2 = st.columns([5, 1])
+                    with col1:
+                        st.write(f"{fields.get('start_date')} to {fields.get('end_date')} | "
+                                 f"{fields.get('invoice_type')} | {fields.get('payment_terms')}"
+                                 f"{' | typed' if fields.get('typed') else ''} — {meta['rows']:,} rows, "
+                                 f"{meta['bytes'] / 1024 / 1024:.1f} MB, fetched "
+                                 f"{datetime.fromtimestamp(meta['fetched_at']).strftime('%d-%b-%Y %H:%M')}")
+                    with col2:
+                        if st.button("Load", key=f"load_snapshot_{meta['id']}"):
+                            load_started = time.perf_counter()
+                            loaded = snapshot_store.load_id(meta["id"])
+                            if loaded is None:
+                                st.error("This snapshot is no longer available.")
+                            else:
+                                df, meta = loaded
+                                old_spool = st.session_state.pop("sql_spool", None)
+                                if old_spool is not None:
+                                    old_spool.close()
+                                # copy=False keeps the columns on the memory-mapped buffers
+                                st.session_state.sql_df = df.set_axis(display_columns(df.columns), axis=1, copy=False)
+                                st.session_state.sql_typed = bool(meta["fields"].get("typed"))
+                                st.session_state.sql_source_name = selected_Db
+                                st.session_state.pop("sql_multi_source", None)
+                                log_event(logger, "fetch", source="snapshot", rows=len(df),
+                                          fetch_seconds=round(time.perf_counter() - load_started, 3),
+                                          **{**meta["fields"], "user": current_user})
+
+        # Results stay browsable across reruns; only the visible page is sent to the browser
+        if "sql_df" in st.session_state or "sql_spool" in st.session_state:
+            st.subheader("Query Results")
+            grid_column_config = typed_column_config() if st.session_state.get("sql_typed") else None
+            render_started = time.perf_counter()
+            if "sql_df" in st.session_state:
+                render_results_grid(st.session_state.sql_df, key="sql_grid", column_config=grid_column_config)
+            else:
+                render_spool_grid(st.session_state.sql_spool, key="sql_grid", column_config=grid_column_config)
+
+            if st.button("Summarize these rows"):
+                if "sql_df" in st.session_state:
+                    summaries = summarize(st.session_state.sql_df)
+                else:
+                    # Reads the spool one batch at a time; only the partial totals are kept
+                    summaries = summarize(st.session_state.sql_spool.iter_batches())
+                store_summaries(summaries, "From the fetched rows",
+                                st.session_state.get("sql_source_name", "sql_data"), excel_backend)
+
+            # Only runs that actually fetched are recorded, so paging does not skew the stats
+            if fetch_timer is not None:
+                fetch_timer.add("render", time.perf_counter() - render_started)
+                # The all-databases run only has the combined rename and render here
+                record_timings("all_databases" if st.session_state.get("sql_multi_source") else database, fetch_timer)
+
+            # Files are only built when asked for, on a background worker
+            st.subheader("Download Options")
+            export_jobs = get_export_jobs()
+            export_source = st.session_state.get("sql_df")
+            if export_source is None:
+                export_source = st.session_state.sql_spool
+            export_typed = st.session_state.get("sql_typed", False)
+            export_date = datetime.now().strftime('%Y%m%d')
+
+            def log_export(job):
+                if job.status == DONE:
+                    timing_store.record({f"export_{job.format}": job.duration})
+                log_event(logger, "export", user=job.username, format=job.format, status=job.status,
+                          rows=job.rows_written, bytes=job.bytes, export_seconds=round(job.duration, 3),
+                          error=job.error)
+            sheet_column = None
+            if st.session_state.get("sql_multi_source"):
+                excel_layout = st.radio("Excel layout", ["One sheet with a Source column", "One sheet per database"],
+                                        horizontal=True)
+                if excel_layout == "One sheet per database":
+                    sheet_column = SOURCE_COLUMN
+            include_summaries = st.checkbox("Add summary sheets to the Excel file", value=False,
+                                            help="Totals by institute, aging buckets and totals by HT person")
+            col1, col2 = st.columns(2)
+            with col1:
+                if st.button("Prepare Excel"):
+                    export_jobs.submit(
+                        st.session_state.session_id, export_source, "xlsx",
+                        f"{st.session_state.get('sql_source_name', 'sql_data')}_{export_date}.xlsx",
+                        excel_backend=excel_backend,
+                        column_formats=typed_excel_formats() if export_typed else None,
+                        username=current_user,
+                        on_finish=log_export,
+                        sheet_column=sheet_column,
+                        summaries=include_summaries
+                    )
+            with col2:
+                if st.button("Prepare CSV"):
+                    export_jobs.submit(
+                        st.session_state.session_id, export_source, "csv", f"sql_data_{export_date}.csv",
+                        csv_date_format=DATE_CSV_FORMAT if export_typed else None,
+                        username=current_user,
+                        on_finish=log_export
+                    )
+
+            for job in export_jobs.jobs_for(st.session_state.session_id):
+                col1, col2, col3 = st.columns([3, 2, 1])
+                with col1:
+                    st.write(f"{job.file_name} ({job.total_rows:,} rows)")
+                with col2:
+                    if job.status == DONE:
+                        file_label = f"{job.format.upper()} ({job.bytes / 1024 / 1024:.1f} MB)"
+                        # Only the file picked here is read into memory, not every finished export on each rerun
+                        if st.session_state.get("export_download") == job.id:
+                            st.download_button(
+                                label=f"Download {file_label}",
+                                data=export_jobs.read(job),
+                                file_name=job.file_name,
+                                mime=job.mime,
+                                key=f"download_{job.id}"
+                            )
+                        elif st.button(f"Get {file_label}", key=f"get_{job.id}"):
+                            st.session_state.export_download = job.id
+                            st.rerun()
+                    elif job.status == FAILED:
+                        st.error(f"Export failed: {job.error}")
+                    elif job.queue_position:
+                        st.info(f"⏳ Waiting for a free export slot (position {job.queue_position} in the queue)")
+                    else:
+                        st.progress(job.progress, text=f"{job.status.title()}... {job.rows_written:,} rows")
+                    exports_pending = exports_pending or job.status in (QUEUED, RUNNING)
+                with col3:
+                    if st.button("Remove", key=f"remove_{job.id}"):
+                        export_jobs.remove(job.id)
+                        st.rerun()
+
+        if "sql_summaries" in st.session_state:
+            st.subheader("Summaries")
+            st.caption(st.session_state.sql_summaries_caption)
+            render_summaries(st.session_state.sql_summaries)
+            st.download_button(
+                label="Download summaries as Excel",
+                data=st.session_state.sql_summaries_xlsx,
+                file_name=f"{st.session_state.sql_summaries_name}_summary_{datetime.now().strftime('%Y%m%d')}.xlsx",
+                mime=XLSX_MIME,
+                key="download_summaries"
+            )
 
     with tab2:
         # File uploader
         uploaded_files = st.file_uploader("Upload Your File (CSV or Excel):", type=["csv", "xlsx"], accept_multiple_files=True)
 
-        if uploaded_files:  # Ensures at least one file is uploaded
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            streaming_convert = st.checkbox("Streaming conversion (large files)", value=False,
+                                            help="Reads and writes in chunks so memory does not grow with file size")
+        with col2:
+            convert_chunk_rows = st.number_input("Chunk size (rows)", min_value=1000, max_value=500000,
+                                                 value=DEFAULT_CHUNK_ROWS, step=1000, disabled=not streaming_convert)
+        with col3:
+            parser_backend = st.selectbox("Parser", PARSER_BACKENDS, disabled=streaming_convert,
+                                          help="auto uses the pyarrow CSV engine and calamine for xlsx when installed")
+        with col4:
+            downcast_columns = st.checkbox("Compact dtypes", value=False, disabled=streaming_convert,
+                                           help="Downcast numbers and store repetitive text as categories to save memory")
+            arrow_dtypes = st.checkbox("Arrow dtypes (CSV)", value=False,
+                                       disabled=streaming_convert or parser_backend == "pandas",
+                                       help="Keep CSV columns in Arrow-backed dtypes: less memory for text "
+                                            "and nullable integers")
+
+        # Same cleaning and column choice for every upload, converted in parallel into one download
+        if uploaded_files and len(uploaded_files) > 1:
+            with st.expander(f"Batch convert all {len(uploaded_files)} files"):
+                batch_columns = []
+                for file in uploaded_files:
+                    try:
+                        for col in read_header(file, os.path.splitext(file.name)[-1].lower()):
+                            if col not in batch_columns:
+                                batch_columns.append(col)
+                    except Exception as e:
+                        st.warning(f"Could not read columns of {file.name}: {str(e)}")
+                selected_batch_columns = st.multiselect("Columns to keep (missing columns are skipped per file)",
+                                                        batch_columns, default=batch_columns, key="batch_columns")
+                col1, col2, col3, col4 = st.columns(4)
+                with col1:
+                    batch_dedup = st.checkbox("Remove Duplicates", key="batch_dedup")
+                with col2:
+                    batch_fill = st.checkbox("Fill Missing Values", key="batch_fill")
+                with col3:
+                    batch_format = st.radio("Convert to:", ["CSV", "Excel"], key="batch_format")
+                with col4:
+                    batch_package = st.radio("Package as:", ["ZIP archive", "One workbook (sheet per file)"],
+                                             key="batch_package", disabled=batch_format == "CSV")
+
+                if st.button("Convert all files", key="batch_convert"):
+                    package = "workbook" if batch_format == "Excel" and batch_package.startswith("One") else "zip"
+                    spec = {
+                        "columns": selected_batch_columns if len(selected_batch_columns) < len(batch_columns) else None,
+                        "dedup": batch_dedup,
+                        "fill_mean": batch_fill,
+                    }
+                    progress = st.progress(0.0, text="Converting...")
+                    status_box = st.container()
+                    finished = []
+
+                    def on_batch_progress(name, status, error):
+                        finished.append(name)
+                        progress.progress(len(finished) / len(uploaded_files),
+                                          text=f"{len(finished)} of {len(uploaded_files)} files")
+                        if error:
+                            status_box.error(f"{name}: {error}")
+                        else:
+                            status_box.write(f"✅ {name}")
+
+                    def convert_batch():
+                        return batch_convert(
+                            get_convert_pool(),
+                            [(file.name, file.getvalue()) for file in uploaded_files],
+                            spec, out_format=batch_format, package=package, excel_backend=excel_backend,
+                            on_progress=on_batch_progress
+                        )
+
+                    convert_ticket = export_admission.request(current_user, "convert",
+                                                              owner=st.session_state.session_id)
+                    try:
+                        wait_for_admission(convert_ticket, "Your conversion")
+                        try:
+                            data, out_name, mime_type, results = convert_batch()
+                        except BrokenProcessPool:
+                            # Retry once on a fresh pool; a second failure is reported below
+                            reset_convert_pool()
+                            finished.clear()
+                            status_box.warning("A conversion worker stopped unexpectedly; retrying the batch...")
+                            data, out_name, mime_type, results = convert_batch()
+                        failed = [name for name, result in results.items() if "error" in result]
+                        converted = len(results) - len(failed)
+                        if converted:
+                            st.download_button(label=f"Download {converted} converted file(s)", data=data,
+                                               file_name=out_name, mime=mime_type, key="batch_download")
+                        if failed:
+                            st.warning(f"{len(failed)} file(s) failed: {', '.join(failed)}")
+                        else:
+                            st.success("🎉 Files Processed!")
+                    except Exception as e:
+                        if isinstance(e, BrokenProcessPool):
+                            reset_convert_pool()
+                        st.error(f"Error converting files: {str(e)}")
+                    finally:
+                        convert_ticket.release()
+
+        if uploaded_files and streaming_convert:
+            for file in uploaded_files:
+                file_ext = os.path.splitext(file.name)[-1].lower()
+                st.write(f"*File Name:* {file.name}")
+                st.write(f"*File Size:* {file.size / 1024:.2f} KB")
+                try:
+                    file_columns = read_header(file, file_ext)
+                    st.write("Preview (first 20 rows):")
+                    st.dataframe(read_preview(file, file_ext))
+                except Exception as e:
+                    st.error(f"Error reading file {file.name}: {str(e)}")
+                    continue
+
+                # Column projection happens at read time, so unselected columns are never loaded
+                columns = st.multiselect(f"Choose Columns for {file.name}", file_columns, default=file_columns,
+                                         key=f"stream_cols_{file.name}")
+                col1, col2 = st.columns(2)
+                with col1:
+                    dedup = st.checkbox(f"Remove Duplicates From {file.name}", key=f"stream_dedup_{file.name}")
+                with col2:
+                    fill_mean = st.checkbox(f"Fill Missing Values for {file.name}", key=f"stream_fill_{file.name}")
+                conversion_type = st.radio(f"Convert {file.name} to:", ["CSV", "Excel"], key=f"stream_fmt_{file.name}")
+
+                if st.button(f"Convert {file.name}", key=f"stream_convert_{file.name}"):
+                    out_ext = ".csv" if conversion_type == "CSV" else ".xlsx"
+                    fd, out_path = tempfile.mkstemp(suffix=out_ext)
+                    os.close(fd)
+                    progress = st.empty()
+                    progress.info("Converting...")
+                    try:
+                        stats = convert_streaming(
+                            file, file_ext, out_path, conversion_type,
+                            usecols=columns if len(columns) < len(file_columns) else None,
+                            dedup=dedup, fill_mean=fill_mean, chunk_rows=int(convert_chunk_rows),
+                            excel_backend=excel_backend,
+                            on_progress=lambda rows: progress.info(f"Converted {rows:,} rows...")
+                        )
+                        progress.info(f"Read {stats['rows_read']:,} rows, wrote {stats['rows_written']:,}")
+                        with open(out_path, "rb") as f:
+                            st.download_button(
+                                label=f"Download {file.name} as {conversion_type}",
+                                data=f,
+                                file_name=os.path.splitext(file.name)[0] + out_ext,
+                                mime="text/csv" if conversion_type == "CSV" else XLSX_MIME,
+                                key=f"stream_download_{file.name}"
+                            )
+                        st.success("🎉 Files Processed!")
+                    except Exception as e:
+                        st.error(f"Error converting file: {str(e)}")
+                    finally:
+                        os.remove(out_path)
+
+        elif uploaded_files:  # Ensures at least one file is uploaded
+            # One state per file (name + content hash); states for removed files are dropped
+            file_states = st.session_state.setdefault("file_states", {})
+            current_keys = set()
+
             for file in uploaded_files:
                 file_ext = os.path.splitext(file.name)[-1].lower()
+                if file_ext not in (".csv", ".xlsx"):
+                    st.error(f"Unsupported file type: {file_ext}")
+                    continue
 
-                # Read file into a DataFrame
+                # Read file into a DataFrame (memoized, so unchanged files are not reparsed)
                 try:
-                    if file_ext == ".csv":
-                        df = pd.read_csv(file, encoding="cp1252")
-                    elif file_ext == ".xlsx":
-                        df = pd.read_excel(file)
-                    else:
-                        st.error(f"Unsupported file type: {file_ext}")
-                        continue
+                    # Parser options are part of the key so changing them reparses the file
+                    key = upload_key(file) + (parser_backend, downcast_columns, arrow_dtypes)
+                    current_keys.add(key)
+                    if key not in file_states:
+                        file_states[key] = FileState(key, parse_upload(file.name, file_ext, key[1], parser_backend,
+                                                                          downcast_columns, arrow_dtypes, file))
+                    state = file_states[key]
                 except Exception as e:
                     st.error(f"Error reading file {file.name}: {str(e)}")
                     continue
-                    
-                # store dataframe in session to persist updated data
-                if "df" not in st.session_state:
-                    st.session_state.df = df
-                    
+                widget_key = f"{file.name}_{key[1][:8]}"
+
                 # Display file details
                 st.write(f"*File Name:* {file.name}")
                 st.write(f"*File Size:* {file.size / 1024:.2f} KB")
 
                 # Show file preview
                 st.write("Current Preview of the DataFrame:")
-                st.dataframe(df.head(20))
+                st.dataframe(state.base_df.head(20))
 
                 # Data Cleaning Options
                 st.subheader(f"Data Cleaning Options for {file.name}")
-                if st.checkbox(f"Clean Data for {file.name}"):
-                    col1, col2 = st.columns(2)
+                if st.checkbox(f"Clean Data for {file.name}", key=f"clean_{widget_key}"):
+                    col1, col2, col3 = st.columns(3)
 
                     with col1:
-                        if st.button(f"Remove Duplicates From {file.name}"):
-                            st.session_state.df.drop_duplicates(inplace=True)
+                        if st.button(f"Remove Duplicates From {file.name}", key=f"dedup_{widget_key}"):
+                            state.remove_duplicates()
                             st.write("Removed Duplicates")
 
                     with col2:
-                        if st.button(f"Fill Missing Values for {file.name}"):
-                            numeric_cols = st.session_state.df.select_dtypes(include=['number']).columns
-                            if len(numeric_cols) > 0:
-                                st.session_state.df[numeric_cols] = st.session_state.df[numeric_cols].fillna(df[numeric_cols].mean())
+                        if st.button(f"Fill Missing Values for {file.name}", key=f"fill_{widget_key}"):
+                            if state.fill_missing():
                                 st.write("Missing Values have been Filled")
                             else:
                                 st.warning("No numeric columns found for filling missing values")
-                            
-                    st.write("Updated Preview of the DataFrame:")        
-                    st.write(st.session_state.df)
-                           
+
+                    with col3:
+                        if st.button(f"Reset {file.name}", key=f"reset_{widget_key}"):
+                            state.reset()
+
+                    if state.transforms:
+                        st.caption("Applied: " + ", ".join(state.transforms))
+                    st.write("Updated Preview of the DataFrame:")
+                    st.write(state.preview)
+
                 # Choose Specific Columns to convert or Keep
                 st.header("Select Columns to Convert")
-                columns = st.multiselect(f"Choose Columns for {file.name}", st.session_state.df.columns, default=st.session_state.df.columns)
-                st.session_state.df = st.session_state.df[columns]
+                columns = st.multiselect(f"Choose Columns for {file.name}", list(state.cleaned.columns),
+                                         default=state.columns, key=f"columns_{widget_key}")
+                state.select_columns(columns)
 
                 # Create some visualization
                 st.header("📊 Data Visualization")
-                if st.checkbox(f"Show Visualization for {file.name}"):
-                    numeric_cols = st.session_state.df.select_dtypes(include='number')
+                if st.checkbox(f"Show Visualization for {file.name}", key=f"viz_{widget_key}"):
+                    numeric_cols = state.frame.select_dtypes(include='number')
                     if not numeric_cols.empty and numeric_cols.shape[1] >= 1:
                         st.bar_chart(numeric_cols.iloc[:,:2])
                     else:
@@ -452,19 +1306,22 @@ elif authentication_status:
 
                 # Convert the file -> CSV to Excel 
                 st.header("🔄 Conversion Options")
-                conversion_type = st.radio(f"Convert {file.name} to:", ["CSV", "Excel"], key=file.name)
-                if st.button(f"Convert {file.name}"):
+                conversion_type = st.radio(f"Convert {file.name} to:", ["CSV", "Excel"], key=f"format_{widget_key}")
+                if st.button(f"Convert {file.name}", key=f"convert_{widget_key}"):
                     buffer = BytesIO()
+                    convert_ticket = export_admission.request(current_user, "convert",
+                                                              owner=st.session_state.session_id)
                     try:
+                        wait_for_admission(convert_ticket, "Your conversion")
                         if conversion_type == "CSV":
-                            st.session_state.df.to_csv(buffer, index=False)
+                            state.frame.to_csv(buffer, index=False)
                             file_name = file.name.replace(file_ext, ".csv")
                             mime_type = "text/csv"
                         
                         elif conversion_type == "Excel":
-                            st.session_state.df.to_excel(buffer, index=False)
+                            write_excel(frame_chunks(state.frame), buffer, backend=excel_backend)
                             file_name = file.name.replace(file_ext, ".xlsx")
-                            mime_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                            mime_type = XLSX_MIME
                         buffer.seek(0)
                         
                         # Download Button
@@ -472,9 +1329,20 @@ elif authentication_status:
                             label=f"Download {file.name} as {conversion_type}",
                             data=buffer,
                             file_name=file_name,
-                            mime=mime_type
+                            mime=mime_type,
+                            key=f"download_{widget_key}"
                         )
                         
                         st.success("🎉 Files Processed!")
                     except Exception as e:
-                        st.error(f"Error converting file: {str(e)}")
\ No newline at end of file
+                        st.error(f"Error converting file: {str(e)}")
+                    finally:
+                        convert_ticket.release()
+
+            for stale_key in set(file_states) - current_keys:
+                del file_states[stale_key]
+
+    # Rerun on a timer while exports are building so their progress updates without a click
+    if exports_pending:
+        time.sleep(EXPORT_POLL_SECONDS)
+        st.rerun()
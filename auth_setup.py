@@ -0,0 +1,68 @@
+# Login credentials built from environment variables.
+# bcrypt is deliberately slow, so plaintext passwords are hashed once per
+# process (the app caches the result) instead of on every Streamlit rerun.
+import os
+
+import bcrypt
+
+DEFAULT_USERNAME = "admin"
+DEFAULT_PASSWORD = "password"
+
+
+# Helper function to check if a password is already hashed
+def is_hashed(password):
+    return bool(password) and password.startswith("$2b$") and len(password) > 50
+
+
+# Helper function to hash a password if it's not already hashed
+def hash_password_if_needed(password):
+    if not password:
+        return None
+    if is_hashed(password):
+        return password
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+
+
+def _env_users():
+    for prefix in ("USER1", "USER2"):
+        yield (os.getenv(f"{prefix}_USERNAME", ""), os.getenv(f"{prefix}_NAME", ""),
+               os.getenv(f"{prefix}_PASSWORD", ""))
+
+
+# Returns (credentials, notices); notices are (level, message) pairs for the
+# login page, e.g. ("warning", "No valid users found ...")
+def build_credentials():
+    notices = []
+    try:
+        credentials = {"usernames": {}}
+        for user_username, user_name, user_password in _env_users():
+            print(f"User: {user_username}, name: {user_name}")
+            user_password = hash_password_if_needed(user_password)
+            if user_username and user_name and user_password:
+                credentials["usernames"][user_username] = {
+                    "name": user_name,
+                    "password": user_password
+                }
+
+        # Ensure we have at least one valid user
+        if not credentials["usernames"]:
+            notices.append(("warning", "No valid users found in environment variables! Adding a default test user."))
+            credentials["usernames"][DEFAULT_USERNAME] = {
+                "name": "Admin User",
+                "password": hash_password_if_needed(DEFAULT_PASSWORD)
+            }
+            notices.append(("info", "Default credentials: username = 'admin', password = 'password'"))
+
+        print(f"Available users: {list(credentials['usernames'].keys())}")
+    except Exception as e:
+        notices.append(("error", f"Error setting up credentials: {e}"))
+        credentials = {
+            "usernames": {
+                DEFAULT_USERNAME: {
+                    "name": "Admin",
+                    "password": hash_password_if_needed(DEFAULT_PASSWORD)
+                }
+            }
+        }
+        notices.append(("info", "Using default credentials due to error: username = 'admin', password = 'password'"))
+    return credentials, notices
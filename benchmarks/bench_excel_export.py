@@ -0,0 +1,90 @@
+# Rows/sec and peak RSS for each Excel writer backend.
+#
+# Each backend runs in a fresh process so peak RSS is not polluted by the
+# previous run. Rows are generated chunk by chunk, the same way the SQL tab
+# feeds rows from a streaming fetch, so streaming backends should stay flat.
+#
+#   python benchmarks/bench_excel_export.py --rows 300000
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from excel_export import available_backends, write_excel  # noqa: E402
+
+
+# Synthetic rows shaped like the outstanding listing
+def synthetic_chunks(rows, chunk_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    for start in range(0, rows, chunk_rows):
+        n = min(chunk_rows, rows - start)
+        yield pd.DataFrame({
+            "Inst Code": rng.integers(1, 9000, n).astype(str),
+            "Institute Name": "Institute " + pd.Series(rng.integers(1, 500, n)).astype(str),
+            "Invoice No": np.arange(start, start + n),
+            "Inv Date": pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.integers(0, 365, n), unit="D"),
+            "Net Amt": rng.uniform(100, 50000, n).round(2),
+            "Recvd Amt": rng.uniform(0, 100, n).round(2),
+            "Day Passed": rng.integers(0, 400, n),
+        })
+
+
+def peak_rss_mb():
+    # ru_maxrss is KB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024
+
+
+def _run_backend(backend, rows, chunk_rows, out):
+    baseline = peak_rss_mb()
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    started = time.perf_counter()
+    written = write_excel(synthetic_chunks(rows, chunk_rows), path, backend=backend)
+    elapsed = time.perf_counter() - started
+    out.put({
+        "backend": backend,
+        "rows": written,
+        "seconds": elapsed,
+        "rows_per_sec": written / elapsed if elapsed else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+        "rss_growth_mb": peak_rss_mb() - baseline,
+        "file_mb": os.path.getsize(path) / 1024 / 1024,
+    })
+    os.remove(path)
+
+
+def bench_backend(backend, rows, chunk_rows):
+    ctx = multiprocessing.get_context("spawn")
+    out = ctx.Queue()
+    proc = ctx.Process(target=_run_backend, args=(backend, rows, chunk_rows, out))
+    proc.start()
+    result = out.get()
+    proc.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Excel writer backend benchmark")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--chunk-rows", type=int, default=20000)
+    parser.add_argument("--backends", nargs="*", default=None, help=f"default: {available_backends()}")
+    args = parser.parse_args()
+
+    for backend in args.backends or available_backends():
+        r = bench_backend(backend, args.rows, args.chunk_rows)
+        print(f"{r['backend']:20s} rows={r['rows']:>9,d} time={r['seconds']:7.2f}s "
+              f"rows/s={r['rows_per_sec']:>9,.0f} peak_rss={r['peak_rss_mb']:7.1f}MB "
+              f"growth={r['rss_growth_mb']:7.1f}MB file={r['file_mb']:.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# Parse time and memory for the File Converter readers on synthetic files.
+#
+# Each (file, reader) pair runs in a fresh process so peak RSS belongs to that
+# reader alone. Files are generated once per size into a temp directory and
+# reused across readers; xlsx generation at 1M rows takes a few minutes.
+#
+#   python benchmarks/bench_parsers.py --sizes 10000 100000 1000000 --formats csv xlsx
+import argparse
+import multiprocessing
+import os
+import queue
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from excel_export import write_excel  # noqa: E402
+from fast_readers import HAS_CALAMINE, HAS_PYARROW, read_file  # noqa: E402
+
+# Longest a single reader may take before its process is treated as hung
+READER_TIMEOUT_SECONDS = 1800
+
+# name -> read_file kwargs
+READERS = {
+    "pandas": {"backend": "pandas"},
+    "pandas+downcast": {"backend": "pandas", "downcast": True},
+    "fast": {"backend": "auto"},
+    "fast+downcast": {"backend": "auto", "downcast": True},
+    "fast+arrow": {"backend": "auto", "arrow_dtypes": True},
+}
+
+
+# Rows shaped like an exported outstanding listing, with non-ASCII names
+def synthetic_chunks(rows, chunk_rows=100000, seed=0):
+    rng = np.random.default_rng(seed)
+    cities = np.array(["Karachi", "Lahore", "Multan", "Peshāwar", "Quetta", "Sukkur"])
+    for start in range(0, rows, chunk_rows):
+        n = min(chunk_rows, rows - start)
+        yield pd.DataFrame({
+            "Inst Code": rng.integers(1, 9000, n),
+            "Institute Name": "Institute " + pd.Series(rng.integers(1, 500, n)).astype(str),
+            "City": cities[rng.integers(0, len(cities), n)],
+            "Invoice No": np.arange(start, start + n),
+            "Inv Date": (pd.Timestamp("2025-01-01")
+                         + pd.to_timedelta(rng.integers(0, 365, n), unit="D")).strftime("%d-%b-%Y"),
+            "Net Amt": rng.uniform(100, 50000, n).round(2),
+            "Recvd Amt": np.where(rng.random(n) < 0.1, np.nan, rng.uniform(0, 100, n).round(2)),
+            "Day Passed": rng.integers(0, 400, n),
+        })
+
+
+def make_file(directory, rows, fmt):
+    path = os.path.join(directory, f"synthetic_{rows}.{fmt}")
+    if os.path.exists(path):
+        return path
+    if fmt == "csv":
+        header = True
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            for chunk in synthetic_chunks(rows):
+                chunk.to_csv(f, index=False, header=header)
+                header = False
+    else:
+        write_excel(synthetic_chunks(rows), path)
+    return path
+
+
+def peak_rss_mb():
+    # ru_maxrss is KB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024
+
+
+def _run_reader(path, reader, out):
+    ext = os.path.splitext(path)[-1]
+    baseline = peak_rss_mb()
+    started = time.perf_counter()
+    df = read_file(path, ext, **READERS[reader])
+    elapsed = time.perf_counter() - started
+    out.put({
+        "reader": reader,
+        "rows": len(df),
+        "seconds": elapsed,
+        "frame_mb": df.memory_usage(deep=True).sum() / 1024 / 1024,
+        "peak_rss_mb": peak_rss_mb(),
+        "rss_growth_mb": peak_rss_mb() - baseline,
+    })
+
+
+def bench_reader(path, reader):
+    ctx = multiprocessing.get_context("spawn")
+    out = ctx.Queue()
+    proc = ctx.Process(target=_run_reader, args=(path, reader, out))
+    proc.start()
+    # Poll so a child that crashes (e.g. killed for memory) is reported instead of blocking forever
+    deadline = time.monotonic() + READER_TIMEOUT_SECONDS
+    while True:
+        try:
+            result = out.get(timeout=1)
+            break
+        except queue.Empty:
+            if not proc.is_alive():
+                raise RuntimeError(f"{reader} process exited with code {proc.exitcode} on {path}")
+            if time.monotonic() > deadline:
+                proc.terminate()
+                proc.join()
+                raise RuntimeError(f"{reader} did not finish within {READER_TIMEOUT_SECONDS}s on {path}")
+    proc.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="File Converter parser benchmark")
+    parser.add_argument("--sizes", nargs="*", type=int, default=[10000, 100000, 1000000])
+    parser.add_argument("--formats", nargs="*", default=["csv", "xlsx"], choices=["csv", "xlsx"])
+    parser.add_argument("--readers", nargs="*", default=list(READERS), choices=list(READERS))
+    parser.add_argument("--dir", default=None, help="where to keep the generated files (default: a temp dir)")
+    args = parser.parse_args()
+
+    print(f"pyarrow={'yes' if HAS_PYARROW else 'no'} calamine={'yes' if HAS_CALAMINE else 'no'}")
+    directory = args.dir or tempfile.mkdtemp(prefix="bench_parsers_")
+    os.makedirs(directory, exist_ok=True)
+    for fmt in args.formats:
+        for rows in args.sizes:
+            path = make_file(directory, rows, fmt)
+            size_mb = os.path.getsize(path) / 1024 / 1024
+            for reader in args.readers:
+                if fmt == "xlsx" and reader.endswith("+arrow"):
+                    continue  # Arrow dtypes only apply to the CSV engine
+                r = bench_reader(path, reader)
+                print(f"{fmt:4s} rows={rows:>9,d} file={size_mb:7.1f}MB {r['reader']:16s} "
+                      f"time={r['seconds']:7.2f}s frame={r['frame_mb']:8.1f}MB "
+                      f"peak_rss={r['peak_rss_mb']:8.1f}MB growth={r['rss_growth_mb']:8.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+# Compare the old f-string query path against the parameterized builder.
+#
+# By default this runs against the synthetic_outstanding SQLite stand-in: SQLite
+# keeps a per-connection prepared statement cache keyed by SQL text, which
+# behaves like SQL Server's plan cache for our purposes. Set BENCH_ODBC_CONN_STR
+# to also run against a real ODBC data source (on SQL Server the plan cache is
+# inspected too).
+#
+#   python benchmarks/bench_query_builder.py --ranges 500 --rows 20000
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from query_builder import OutstandingQueryBuilder  # noqa: E402
+from report_config import invoice_type_filters, payment_terms_filters  # noqa: E402
+from synthetic_outstanding import DEFAULT_DAYS, connect, create_database, sqlite_builder  # noqa: E402
+
+
+# What app.py used to do: splice every value into the statement text
+def inline_builder(builder):
+    def build(*args):
+        sql, params = builder.build(*args)
+        for value in params:
+            sql = sql.replace("?", f"'{value}'", 1)
+        return sql, []
+    return build
+
+
+# Date ranges inside the generated data, with filter names the stand-in and
+# production builders both know
+def random_requests(count, invoice_types, payment_terms):
+    rng = random.Random(1)
+    base = date.today() - timedelta(days=DEFAULT_DAYS - 1)
+    for _ in range(count):
+        start = base + timedelta(days=rng.randint(0, DEFAULT_DAYS - 61))
+        end = start + timedelta(days=rng.randint(0, 60))
+        yield (start.strftime("%d-%b-%Y"), end.strftime("%d-%b-%Y"), rng.choice(invoice_types),
+               rng.choice(payment_terms), "", "0001", "989801")
+
+
+def run(conn, build, requests):
+    texts = set()
+    latencies = []
+    for req in requests:
+        sql, params = build(*req)
+        texts.add(sql)
+        started = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return {
+        "distinct_statements": len(texts),
+        "total_s": sum(latencies),
+        "p50_ms": 1000 * latencies[len(latencies) // 2],
+        "p95_ms": 1000 * latencies[int(len(latencies) * 0.95) - 1],
+    }
+
+
+# On SQL Server, count cached plans for our statement, how many were used only
+# once, and their total reuse. Needs VIEW SERVER STATE; returns None without it.
+def sql_server_plan_stats(conn):
+    import pyodbc
+
+    try:
+        row = conn.cursor().execute("""
+            SELECT COUNT(*), COALESCE(SUM(CASE WHEN cp.usecounts = 1 THEN 1 ELSE 0 END), 0),
+                   COALESCE(SUM(cp.usecounts), 0)
+            FROM sys.dm_exec_cached_plans cp
+            CROSS APPLY sys.dm_exec_sql_text(cp.plan_handle) st
+            WHERE st.text LIKE '%OUTSTANDINGLISTING_NEW%' AND st.text NOT LIKE '%dm_exec_cached_plans%'
+        """).fetchone()
+    except pyodbc.Error:
+        return None
+    return {"cached_plans": row[0], "single_use_plans": row[1], "total_usecounts": row[2]}
+
+
+# What one path added to the plan cache. Plans the other path compiled are
+# already counted in `before`, so each path is measured on its own.
+def plan_stats_delta(before, after):
+    if before is None or after is None:
+        return "plan cache: unavailable (needs VIEW SERVER STATE)"
+    delta = {name: after[name] - before[name] for name in after}
+    return (f"plan cache: +{delta['cached_plans']} plans, +{delta['single_use_plans']} single-use, "
+            f"+{delta['total_usecounts']} uses")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="f-string vs parameterized query benchmark")
+    parser.add_argument("--ranges", type=int, default=300, help="number of distinct requests to run")
+    parser.add_argument("--rows", type=int, default=20000, help="invoices in the SQLite stand-in database")
+    args = parser.parse_args()
+
+    builder = sqlite_builder()
+    requests = list(random_requests(args.ranges, list(builder.invoice_filters), list(builder.payment_filters)))
+
+    path = create_database(args.rows)
+    try:
+        print(f"SQLite stand-in: {args.rows} rows, {args.ranges} requests "
+              f"(the builder can emit at most {len(builder.statement_variants())} statement texts)")
+        for label, build in (("f-string", inline_builder(builder)), ("parameterized", builder.build)):
+            conn = connect(path)
+            result = run(conn, build, requests)
+            print(f"  {label:14s} statements={result['distinct_statements']:4d} "
+                  f"total={result['total_s']:.3f}s p50={result['p50_ms']:.2f}ms p95={result['p95_ms']:.2f}ms")
+            conn.close()
+    finally:
+        os.remove(path)
+
+    odbc_conn_str = os.getenv("BENCH_ODBC_CONN_STR")
+    if odbc_conn_str:
+        import pyodbc
+
+        conn = pyodbc.connect(odbc_conn_str)
+        builder = OutstandingQueryBuilder(invoice_type_filters(), payment_terms_filters())
+        print("ODBC source:")
+        for label, build in (("f-string", inline_builder(builder)), ("parameterized", builder.build)):
+            before = sql_server_plan_stats(conn)
+            result = run(conn.cursor(), build, requests)
+            after = sql_server_plan_stats(conn)
+            print(f"  {label:14s} statements={result['distinct_statements']:4d} "
+                  f"total={result['total_s']:.3f}s p50={result['p50_ms']:.2f}ms p95={result['p95_ms']:.2f}ms "
+                  f"{plan_stats_delta(before, after)}")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
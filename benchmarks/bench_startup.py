@@ -0,0 +1,115 @@
+# Cold-start and rerun time of the Streamlit script, measured with AppTest.
+#
+# Every sample runs in a fresh process, so the first run includes module
+# imports and one-time setup (credential hashing, pools, caches). The reruns
+# that follow show the per-interaction cost. Plaintext passwords are set for
+# both users so bcrypt hashing is part of the measurement. --rev benchmarks the
+# app as of another git revision for comparison. The query log goes to a
+# scratch directory that is removed afterwards, as is the exported revision.
+#
+#   python benchmarks/bench_startup.py --reruns 10
+#   python benchmarks/bench_startup.py --rev HEAD~1
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that should only load once the SQL or converter tab needs them
+HEAVY_MODULES = ["pyodbc", "openpyxl", "xlsxwriter"]
+
+_CHILD = r"""
+import json, os, sys, time
+sys.path.insert(0, os.getcwd())
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+
+at = AppTest.from_file(os.path.join(os.getcwd(), "app.py"), default_timeout=120)
+if os.environ.get("BENCH_LOGGED_IN") == "1":
+    at.session_state["authentication_status"] = True
+    at.session_state["name"] = "Bench User"
+    at.session_state["username"] = os.environ["USER1_USERNAME"]
+run_started = time.perf_counter()
+at.run()
+first = time.perf_counter() - run_started
+reruns = []
+for _ in range(int(os.environ["BENCH_RERUNS"])):
+    t = time.perf_counter()
+    at.run()
+    reruns.append(time.perf_counter() - t)
+print("BENCH_RESULT " + json.dumps({
+    "import_streamlit_s": run_started - started,
+    "first_run_s": first,
+    "reruns_s": reruns,
+    "errors": [str(e.value) for e in at.exception],
+    "heavy_modules_loaded": [m for m in json.loads(os.environ["BENCH_HEAVY"]) if m in sys.modules],
+}))
+"""
+
+
+def export_revision(rev):
+    directory = tempfile.mkdtemp(prefix="bench_startup_")
+    archive = subprocess.run(["git", "archive", "--format=tar", rev], cwd=REPO_ROOT, check=True,
+                             capture_output=True).stdout
+    archive_path = os.path.join(directory, "rev.tar")
+    with open(archive_path, "wb") as f:
+        f.write(archive)
+    with tarfile.open(archive_path) as tar:
+        tar.extractall(directory)
+    return directory
+
+
+def run_sample(app_dir, log_file, reruns, logged_in):
+    env = dict(os.environ)
+    env.update({
+        "QUERY_LOG_FILE": log_file,
+        "USER1_USERNAME": "bench1", "USER1_NAME": "Bench One", "USER1_PASSWORD": "plaintext-1",
+        "USER2_USERNAME": "bench2", "USER2_NAME": "Bench Two", "USER2_PASSWORD": "plaintext-2",
+        "BENCH_RERUNS": str(reruns), "BENCH_LOGGED_IN": "1" if logged_in else "0",
+        "BENCH_HEAVY": json.dumps(HEAVY_MODULES),
+    })
+    proc = subprocess.run([sys.executable, "-c", _CHILD], cwd=app_dir, env=env, capture_output=True, text=True)
+    for line in proc.stdout.splitlines():
+        if line.startswith("BENCH_RESULT "):
+            return json.loads(line[len("BENCH_RESULT "):])
+    raise RuntimeError(f"benchmark process failed:\n{proc.stderr[-2000:]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streamlit cold-start and rerun benchmark")
+    parser.add_argument("--samples", type=int, default=3, help="fresh processes to start")
+    parser.add_argument("--reruns", type=int, default=10, help="reruns per process")
+    parser.add_argument("--rev", default=None, help="git revision to benchmark instead of the working tree")
+    parser.add_argument("--login-page", action="store_true", help="measure the login page instead of the dashboard")
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="bench_startup_log_")
+    app_dir = export_revision(args.rev) if args.rev else REPO_ROOT
+    try:
+        log_file = os.path.join(scratch, "query_log.log")
+        results = [run_sample(app_dir, log_file, args.reruns, not args.login_page) for _ in range(args.samples)]
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+        if app_dir != REPO_ROOT:
+            shutil.rmtree(app_dir, ignore_errors=True)
+    first_runs = [r["first_run_s"] for r in results]
+    reruns = [t for r in results for t in r["reruns_s"]]
+    print(f"app: {args.rev or 'working tree'} ({'login page' if args.login_page else 'dashboard'})")
+    print(f"cold first run: median={statistics.median(first_runs) * 1000:8.1f}ms "
+          f"min={min(first_runs) * 1000:8.1f}ms")
+    if reruns:
+        print(f"rerun:          median={statistics.median(reruns) * 1000:8.1f}ms "
+              f"min={min(reruns) * 1000:8.1f}ms")
+    print(f"heavy modules loaded: {results[-1]['heavy_modules_loaded'] or 'none'}")
+    if results[-1]["errors"]:
+        print(f"app errors: {results[-1]['errors']}")
+
+
+if __name__ == "__main__":
+    main()
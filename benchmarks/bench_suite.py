@@ -0,0 +1,230 @@
+# End-to-end benchmark of the app's hot paths on a local SQLite stand-in.
+#
+# For every scale a synthetic OUTSTANDINGLISTING_NEW / M_PARTY database is
+# generated (see synthetic_outstanding.py) and the same code the app runs is
+# timed stage by stage: connect and pooled checkout, execute, transfer,
+# DataFrame build, column rename, summaries, CSV and Excel export, and File
+# Converter parsing of the exported files. Fetch stages run for both the
+# formatted and the typed statement.
+#
+# Results are written as JSON with --output. Given --baseline (an earlier
+# --output file), stages whose median slowed down by more than --tolerance are
+# listed and the exit code is 1, so the suite can gate CI.
+#
+#   python benchmarks/bench_suite.py --scales 10000 100000 --output bench.json
+#   python benchmarks/bench_suite.py --scales 10000 --baseline bench.json --tolerance 0.25
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd  # noqa: E402
+
+from connection_pool import ConnectionPool  # noqa: E402
+from excel_export import available_backends, frame_chunks, write_excel  # noqa: E402
+from fast_readers import PARSER_BACKENDS  # noqa: E402
+from file_converter import parse_file  # noqa: E402
+from perf_timings import StageTimer  # noqa: E402
+from sql_fetch import coerce_typed_columns, display_columns, rows_to_frame, stream_to_spool  # noqa: E402
+from summaries import summarize  # noqa: E402
+from synthetic_outstanding import DEFAULT_DAYS, connect, create_database, sqlite_builder  # noqa: E402
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FETCH_VARIANTS = {"formatted": False, "typed": True}
+# Fixed-cost stages, reported without a rows/s rate
+FIXED_COST_STAGES = {"connect", "pool_checkout", "execute"}
+# Differences below this many seconds are treated as noise when comparing
+MIN_REGRESSION_SECONDS = 0.005
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+# One pass over every stage; returns {(stage, variant): seconds} and the row count
+def run_pass(db_path, pool, args):
+    timings = {}
+    builder = sqlite_builder()
+    end = date.today()
+    start = end - timedelta(days=args.days - 1)
+    frames = {}
+    for variant, typed in FETCH_VARIANTS.items():
+        timer = StageTimer()
+        with timer.stage("connect"):
+            conn = connect(db_path)
+            conn.execute("SELECT 1").fetchone()
+        conn.close()
+        with timer.stage("pool_checkout"):
+            pooled = pool.acquire()
+        try:
+            sql, params = builder.build(start.strftime("%d-%b-%Y"), end.strftime("%d-%b-%Y"), acc2="0001",
+                                        acc3="989801", typed=typed)
+            cursor = pooled.cursor()
+            with timer.stage("execute"):
+                cursor.execute(sql, params)
+            with timer.stage("transfer"):
+                columns = [col[0] for col in cursor.description]
+                rows = cursor.fetchall()
+            cursor.close()
+            with timer.stage("dataframe"):
+                df = rows_to_frame(rows, columns)
+                del rows
+                if typed:
+                    coerce_typed_columns(df)
+            with timer.stage("rename"):
+                df = df.set_axis(display_columns(df.columns), axis=1)
+            cursor = pooled.cursor()
+            with timer.stage("stream"):
+                cursor.execute(sql, params)
+                spool = stream_to_spool(cursor, args.batch_size, typed=typed)
+            spool.close()
+            cursor.close()
+        finally:
+            pool.release(pooled)
+        with timer.stage("summaries"):
+            summarize(df)
+        with timer.stage("export_csv"):
+            csv_buffer = BytesIO()
+            df.to_csv(csv_buffer, index=False)
+        frames[variant] = (df, csv_buffer.getvalue())
+        timings.update({(stage, variant): seconds for stage, seconds in timer.durations.items()})
+
+    # Export and parsing use the formatted rows, which is what users download
+    df, csv_bytes = frames["formatted"]
+    excel_rows = df.head(args.excel_rows)
+    xlsx_bytes = None
+    for backend in available_backends():
+        started = time.perf_counter()
+        buffer = BytesIO()
+        write_excel(frame_chunks(excel_rows), buffer, backend=backend)
+        timings[("export_xlsx", backend)] = time.perf_counter() - started
+        xlsx_bytes = xlsx_bytes or buffer.getvalue()
+    for backend in PARSER_BACKENDS:
+        started = time.perf_counter()
+        parse_file(BytesIO(csv_bytes), ".csv", backend=backend)
+        timings[("parse_csv", backend)] = time.perf_counter() - started
+        if xlsx_bytes is not None:
+            started = time.perf_counter()
+            parse_file(BytesIO(xlsx_bytes), ".xlsx", backend=backend)
+            timings[("parse_xlsx", backend)] = time.perf_counter() - started
+    return timings, len(df), len(excel_rows)
+
+
+def run_scale(scale, args):
+    generate_started = time.perf_counter()
+    db_path = create_database(scale, days=args.days, seed=args.seed)
+    generate_s = time.perf_counter() - generate_started
+    pool = ConnectionPool(lambda: connect(db_path), min_size=1, max_size=2)
+    samples = {}
+    try:
+        for _ in range(args.warmup + args.repeat):
+            timings, rows, excel_rows = run_pass(db_path, pool, args)
+            for key, seconds in timings.items():
+                samples.setdefault(key, []).append(seconds)
+    finally:
+        pool.close()
+        os.remove(db_path)
+
+    results = []
+    for (stage, variant), values in samples.items():
+        values = values[args.warmup:]
+        median = statistics.median(values)
+        stage_rows = excel_rows if stage in ("export_xlsx", "parse_xlsx") else rows
+        results.append({
+            "scale": scale,
+            "stage": stage,
+            "variant": variant,
+            "rows": stage_rows,
+            "repeats": len(values),
+            "median_s": round(median, 6),
+            "min_s": round(min(values), 6),
+            "rows_per_s": round(stage_rows / median) if median > 0 and stage not in FIXED_COST_STAGES else None,
+        })
+    return {"scale": scale, "rows": rows, "generate_s": round(generate_s, 3), "results": results}
+
+
+# Stages slower than baseline by more than tolerance (fraction of the baseline median)
+def compare(results, baseline, tolerance):
+    previous = {(r["scale"], r["stage"], r["variant"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for r in results:
+        old = previous.get((r["scale"], r["stage"], r["variant"]))
+        if old is None:
+            continue
+        if (r["median_s"] > old["median_s"] * (1 + tolerance)
+                and r["median_s"] - old["median_s"] > MIN_REGRESSION_SECONDS):
+            regressions.append({**r, "baseline_median_s": old["median_s"],
+                                "change": round(r["median_s"] / old["median_s"] - 1, 3) if old["median_s"] else None})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hot-path benchmark on a SQLite stand-in")
+    parser.add_argument("--scales", type=int, nargs="+", default=[10000, 100000], help="invoice rows per run")
+    parser.add_argument("--days", type=int, default=DEFAULT_DAYS, help="days of invoices generated and queried")
+    parser.add_argument("--repeat", type=int, default=3, help="timed passes per scale")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed passes per scale")
+    parser.add_argument("--batch-size", type=int, default=5000, help="rows per batch for the streaming stage")
+    parser.add_argument("--excel-rows", type=int, default=20000, help="row cap for the Excel export/parse stages")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="write results as JSON to this path")
+    parser.add_argument("--baseline", default=None, help="earlier --output file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before failing, e.g. 0.25")
+    args = parser.parse_args()
+
+    runs = []
+    for scale in args.scales:
+        run = run_scale(scale, args)
+        runs.append(run)
+        print(f"{scale:,} invoices -> {run['rows']:,} rows (generated in {run['generate_s']:.1f}s)")
+        for r in sorted(run["results"], key=lambda r: (r["stage"], r["variant"])):
+            rate = f"{r['rows_per_s']:>12,d} rows/s" if r["rows_per_s"] else ""
+            print(f"  {r['stage']:14s} {r['variant']:20s} median={r['median_s'] * 1000:9.1f}ms "
+                  f"min={r['min_s'] * 1000:9.1f}ms {rate}")
+
+    output = {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "runs": [{key: value for key, value in run.items() if key != "results"} for run in runs],
+        "results": [r for run in runs for r in run["results"]],
+    }
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(output["results"], json.load(f), args.tolerance)
+        output["regressions"] = regressions
+        for r in regressions:
+            print(f"REGRESSION {r['scale']:,} {r['stage']} [{r['variant']}]: {r['baseline_median_s'] * 1000:.1f}ms -> "
+                  f"{r['median_s'] * 1000:.1f}ms ({r['change']:+.0%})")
+        if regressions:
+            exit_code = 1
+        else:
+            print(f"No stage slowed down by more than {args.tolerance:.0%}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(output, f, indent=2)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
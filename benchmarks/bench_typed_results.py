@@ -0,0 +1,91 @@
+# Before/after for typed results: query time and DataFrame memory when amounts
+# and dates are formatted in SQL versus returned raw and coerced in pandas.
+#
+# The synthetic_outstanding SQLite stand-in uses printf()/strftime() in place of
+# SQL Server's FORMAT(). Set BENCH_ODBC_CONN_STR to run the real
+# OUTSTANDINGLISTING_NEW statements too (BENCH_START_DATE / BENCH_END_DATE pick
+# the range, default the last 90 days).
+#
+#   python benchmarks/bench_typed_results.py --rows 200000
+import argparse
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd  # noqa: E402
+
+from query_builder import OutstandingQueryBuilder  # noqa: E402
+from sql_fetch import coerce_typed_columns  # noqa: E402
+from synthetic_outstanding import DEFAULT_DAYS, connect, create_database, sqlite_builder  # noqa: E402
+
+
+def measure(conn, sql, params=(), typed=False):
+    started = time.perf_counter()
+    cursor = conn.cursor()
+    cursor.execute(sql, params)
+    columns = [col[0] for col in cursor.description]
+    rows = cursor.fetchall()
+    query_s = time.perf_counter() - started
+    started = time.perf_counter()
+    df = pd.DataFrame.from_records([tuple(row) for row in rows], columns=columns)
+    if typed:
+        coerce_typed_columns(df)
+    build_s = time.perf_counter() - started
+    started = time.perf_counter()
+    df.sort_values("NET_AMT")
+    sort_s = time.perf_counter() - started
+    return {
+        "rows": len(df),
+        "query_s": query_s,
+        "build_s": build_s,
+        "sort_s": sort_s,
+        "memory_mb": df.memory_usage(index=True, deep=True).sum() / 1024 / 1024,
+    }
+
+
+def report(label, r):
+    print(f"  {label:10s} rows={r['rows']:>9,d} query={r['query_s']:6.3f}s build={r['build_s']:6.3f}s "
+          f"sort={r['sort_s']:6.3f}s memory={r['memory_mb']:7.1f}MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Formatted vs typed result benchmark")
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    builder = sqlite_builder()
+    start_str = (date.today() - timedelta(days=DEFAULT_DAYS)).strftime("%d-%b-%Y")
+    end_str = date.today().strftime("%d-%b-%Y")
+    path = create_database(args.rows)
+    conn = connect(path)
+    try:
+        print(f"SQLite stand-in: {args.rows} rows")
+        for label, typed in (("formatted", False), ("typed", True)):
+            sql, params = builder.build(start_str, end_str, acc2="0001", acc3="989801", typed=typed)
+            report(label, measure(conn, sql, params, typed=typed))
+    finally:
+        conn.close()
+        os.remove(path)
+
+    odbc_conn_str = os.getenv("BENCH_ODBC_CONN_STR")
+    if odbc_conn_str:
+        import pyodbc
+
+        end = datetime.now()
+        start = end - timedelta(days=90)
+        start_str = os.getenv("BENCH_START_DATE", start.strftime("%d-%b-%Y"))
+        end_str = os.getenv("BENCH_END_DATE", end.strftime("%d-%b-%Y"))
+        builder = OutstandingQueryBuilder({"All": ""}, {"All": ""})
+        conn = pyodbc.connect(odbc_conn_str)
+        print(f"ODBC source: {start_str} to {end_str}")
+        for label, typed in (("formatted", False), ("typed", True)):
+            sql, params = builder.build(start_str, end_str, acc2="0001", acc3="989801", typed=typed)
+            report(label, measure(conn, sql, params, typed=typed))
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
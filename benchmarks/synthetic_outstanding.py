@@ -0,0 +1,154 @@
+# Synthetic OUTSTANDINGLISTING_NEW / M_PARTY data in a SQLite stand-in.
+#
+# The generated tables carry the columns the report query reads (party codes,
+# company, HT and related person, invoice id and date, payable/received
+# amounts, remarks, report type, credit days, payment terms), with a party per
+# ~200 invoices. SQLITE_TEMPLATE / SQLITE_TYPED_TEMPLATE mirror the SQL Server
+# statements in query_builder.py closely enough to exercise the same builder,
+# fetch, export and summary code: FORMAT() becomes printf()/strftime(),
+# DATEDIFF becomes julianday() and the OUTSTANDINGLISTING_NEW(?, ?, ?, ?, ?)
+# table function becomes a date-filtered derived table taking the same five
+# parameters.
+import os
+import sqlite3
+import tempfile
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from query_builder import OutstandingQueryBuilder
+
+DEFAULT_DAYS = 365
+INVOICES_PER_PARTY = 200
+HT_PERSONS = 12
+RELATED_PERSONS = 60
+
+# Same columns, aliases and GROUP BY as OUTSTANDING_QUERY_TEMPLATE. The account
+# and product code arguments are accepted but not modelled.
+SQLITE_TEMPLATE = """
+SELECT
+    acc4 INST_Code,
+    tr.Company as Institute_Name,
+    HTPersonName HT_Person,
+    personName Related_Person,
+    tr.Id INVOICE_NO,
+    strftime('%d-', refDate) || substr('JanFebMarAprMayJunJulAugSepOctNovDec', 1 + 3 * (strftime('%m', refDate) - 1), 3)
+        || strftime('-%Y', refDate) as INV_Date,
+    printf('%,.2f', AmtPayable) NET_AMT,
+    printf('%,.2f', AmtReceived) RECVD_AMT,
+    printf('%,.2f', SUM(AmtPayable - AmtReceived)) AS Balance,
+    remarks REMARKS,
+    CAST(julianday('now') - julianday(refDate) AS INTEGER) AS Day_Passed,
+    CASE
+        WHEN TR.CR_Days = 0 THEN DAYs
+        ELSE TR.CR_Days
+    END AS Day_LIMIT
+FROM
+    (SELECT * FROM OUTSTANDINGLISTING
+     WHERE refDate BETWEEN report_date(?) AND report_date(?)
+       AND ? IS NOT NULL AND ? IS NOT NULL AND ? IS NOT NULL) AS TR
+LEFT JOIN
+    M_PARTY ON TR.ACC4 = M_PARTY.Id
+WHERE
+    ReportType = 'Sales Invoices'
+        {invoice_filter} {payment_filter}
+GROUP BY
+    refDate,acc4, tr.Company, HTPersonName, personName, tr.Id, AmtPayable, AmtReceived, remarks,
+    creditLimit, Days,TR.CR_Days
+"""
+
+SQLITE_TYPED_TEMPLATE = (
+    SQLITE_TEMPLATE
+    .replace("strftime('%d-', refDate) || substr('JanFebMarAprMayJunJulAugSepOctNovDec', 1 + 3 * (strftime('%m', "
+             "refDate) - 1), 3)\n        || strftime('-%Y', refDate) as INV_Date", "refDate as INV_Date")
+    .replace("printf('%,.2f', AmtPayable) NET_AMT", "AmtPayable NET_AMT")
+    .replace("printf('%,.2f', AmtReceived) RECVD_AMT", "AmtReceived RECVD_AMT")
+    .replace("printf('%,.2f', SUM(AmtPayable - AmtReceived)) AS Balance", "SUM(AmtPayable - AmtReceived) AS Balance")
+)
+
+SQLITE_INVOICE_FILTERS = {
+    "All": "",
+    "Over Credit": "AND CAST(julianday('now') - julianday(refDate) AS INTEGER) > DAYs",
+    "No Credit": "AND TR.PaymentTerms = 'No Credit'",
+}
+SQLITE_PAYMENT_FILTERS = {
+    "All": "",
+    "Cash": "AND TR.Terms = 'CASH'",
+    "Cheque": "AND TR.Terms = 'cheque'",
+}
+
+
+# '01-Jan-2025' (the builder's date format) -> '2025-01-01'
+def report_date(value):
+    return datetime.strptime(value, "%d-%b-%Y").date().isoformat()
+
+
+def sqlite_builder():
+    return OutstandingQueryBuilder(SQLITE_INVOICE_FILTERS, SQLITE_PAYMENT_FILTERS, template=SQLITE_TEMPLATE,
+                                   typed_template=SQLITE_TYPED_TEMPLATE)
+
+
+# New connection to the stand-in database; check_same_thread is off so pooled
+# connections can be handed to worker threads like pyodbc ones
+def connect(path):
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.create_function("report_date", 1, report_date, deterministic=True)
+    return conn
+
+
+def _party_rows(parties, rng):
+    days = rng.choice(np.array([30, 45, 60, 90, -1]), parties)
+    credit = np.round(rng.uniform(50000, 2000000, parties), 2)
+    return [(f"{i + 1:05d}", float(credit[i]), None if days[i] < 0 else int(days[i])) for i in range(parties)]
+
+
+def _invoice_rows(start_id, n, parties, end_day, days, rng):
+    party = rng.integers(0, parties, n)
+    ht = rng.integers(0, HT_PERSONS, n)
+    person = rng.integers(0, RELATED_PERSONS, n)
+    ref_offsets = rng.integers(0, days, n)
+    payable = np.round(rng.lognormal(9, 1.1, n), 2)
+    received = np.round(payable * rng.choice(np.array([0.0, 0.0, 0.25, 0.5, 1.0]), n), 2)
+    report_type = np.where(rng.random(n) < 0.9, "Sales Invoices", "Sales Returns")
+    cr_days = rng.choice(np.array([0, 0, 0, 15, 30, 45]), n)
+    terms = rng.choice(np.array(["CASH", "cheque", "credit"]), n)
+    payment_terms = np.where(rng.random(n) < 0.15, "No Credit", "Credit")
+    has_remarks = rng.random(n) < 0.2
+    for i in range(n):
+        code = f"{party[i] + 1:05d}"
+        yield (start_id + i, code, f"Institute {code}", f"HT Person {ht[i] + 1}", f"Person {person[i] + 1}",
+               (end_day - timedelta(days=int(ref_offsets[i]))).isoformat(), float(payable[i]), float(received[i]),
+               f"Follow up {code}" if has_remarks[i] else "", str(report_type[i]), int(cr_days[i]),
+               str(payment_terms[i]), str(terms[i]))
+
+
+# Build a stand-in database with `rows` invoices spread over the `days` before
+# end_day (default today). Returns the database path.
+def create_database(rows, path=None, days=DEFAULT_DAYS, end_day=None, seed=0, chunk_rows=100000):
+    if path is None:
+        fd, path = tempfile.mkstemp(prefix="outstanding_", suffix=".sqlite")
+        os.close(fd)
+    end_day = end_day or date.today()
+    rng = np.random.default_rng(seed)
+    parties = max(1, rows // INVOICES_PER_PARTY)
+    conn = sqlite3.connect(path)
+    try:
+        conn.executescript("""
+            DROP TABLE IF EXISTS OUTSTANDINGLISTING;
+            DROP TABLE IF EXISTS M_PARTY;
+            CREATE TABLE M_PARTY (Id TEXT PRIMARY KEY, creditLimit REAL, DAYs INTEGER);
+            CREATE TABLE OUTSTANDINGLISTING (
+                Id INTEGER PRIMARY KEY, acc4 TEXT, Company TEXT, HTPersonName TEXT, personName TEXT,
+                refDate TEXT, AmtPayable REAL, AmtReceived REAL, remarks TEXT, ReportType TEXT,
+                CR_Days INTEGER, PaymentTerms TEXT, Terms TEXT
+            );
+        """)
+        conn.executemany("INSERT INTO M_PARTY VALUES (?, ?, ?)", _party_rows(parties, rng))
+        for start in range(0, rows, chunk_rows):
+            conn.executemany("INSERT INTO OUTSTANDINGLISTING VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                             _invoice_rows(start + 1, min(chunk_rows, rows - start), parties, end_day, days, rng))
+        conn.execute("CREATE INDEX ix_outstanding_refdate ON OUTSTANDINGLISTING (refDate)")
+        conn.commit()
+    finally:
+        conn.close()
+    return path
@@ -0,0 +1,240 @@
+# Process-wide pyodbc connection pooling, one pool per database.
+# Pools outlive browser sessions: a session only holds a connection for the
+# duration of one fetch and hands it back in a finally block, which also runs
+# when Streamlit stops or reruns the script, so a closed tab never strands a
+# connection. Idle connections are reaped on a timer and the pools themselves
+# are closed when the process exits.
+import atexit
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_MIN_SIZE = 1
+DEFAULT_MAX_SIZE = 5
+DEFAULT_IDLE_SECONDS = 300
+DEFAULT_CHECKOUT_TIMEOUT = 30
+# How often the registry closes expired idle connections and tops pools back up to min_size
+DEFAULT_REAP_SECONDS = 60
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+# Cheap round trip to make sure a pooled connection is still usable
+def is_healthy(conn):
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+        cursor.close()
+        return True
+    except Exception:
+        return False
+
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+# Bounded pool of connections created by connect_fn().
+# Idle connections beyond min_size are closed after idle_seconds, and every
+# checkout runs a health check so dropped TDS sessions are replaced transparently.
+class ConnectionPool:
+    def __init__(self, connect_fn, min_size=DEFAULT_MIN_SIZE, max_size=DEFAULT_MAX_SIZE,
+                 idle_seconds=DEFAULT_IDLE_SECONDS, checkout_timeout=DEFAULT_CHECKOUT_TIMEOUT,
+                 health_check=is_healthy):
+        self.connect_fn = connect_fn
+        self.min_size = min_size
+        self.max_size = max(max_size, 1)
+        self.idle_seconds = idle_seconds
+        self.checkout_timeout = checkout_timeout
+        self.health_check = health_check
+        self._idle = []  # list of (returned_at, conn), most recently used last
+        self._in_use = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self.created = 0
+        self.discarded = 0
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    # Waits up to timeout seconds for a free connection (default checkout_timeout;
+    # math.inf waits until one is returned)
+    def acquire(self, timeout=None):
+        started = time.perf_counter()
+        timeout = self.checkout_timeout if timeout is None else timeout
+        deadline = started + timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Connection pool is closed")
+                self._evict_idle_locked()
+                if self._idle:
+                    _, conn = self._idle.pop()
+                    self._in_use += 1
+                    break
+                if self._in_use < self.max_size:
+                    conn = None
+                    self._in_use += 1
+                    break
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    raise PoolTimeout(f"No connection available within {timeout}s")
+                self._cond.wait(None if math.isinf(remaining) else remaining)
+
+        # Connecting and health checks happen outside the lock
+        discarded = created = 0
+        try:
+            if conn is not None and not self.health_check(conn):
+                _close_quietly(conn)
+                discarded = 1
+                conn = None
+            if conn is None:
+                conn = self.connect_fn()
+                created = 1
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self.discarded += discarded
+                self._cond.notify()
+            raise
+
+        waited = time.perf_counter() - started
+        with self._cond:
+            self.discarded += discarded
+            self.created += created
+            self.checkouts += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+        return conn
+
+    # Return a connection; pass discard=True when it failed mid-query
+    def release(self, conn, discard=False):
+        with self._cond:
+            self._in_use -= 1
+            if discard or self._closed:
+                self.discarded += 1
+                _close_quietly(conn)
+            else:
+                self._idle.append((time.time(), conn))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        except BaseException:
+            # Also on interrupts: the connection may still have a half-read result on it
+            self.release(conn, discard=True)
+            raise
+        else:
+            self.release(conn)
+
+    # Open connections until min_size exist, so early checkouts skip the login
+    # handshake. Stops quietly at the first connection error.
+    def warm(self):
+        while True:
+            with self._cond:
+                if self._closed or len(self._idle) + self._in_use >= min(self.min_size, self.max_size):
+                    return
+                # Reserve the slot like a checkout so concurrent acquires respect max_size
+                self._in_use += 1
+            try:
+                conn = self.connect_fn()
+            except Exception:
+                with self._cond:
+                    self._in_use -= 1
+                    self._cond.notify()
+                return
+            with self._cond:
+                self.created += 1
+            self.release(conn)
+
+    def evict_idle(self):
+        with self._cond:
+            self._evict_idle_locked()
+
+    def _evict_idle_locked(self):
+        now = time.time()
+        total = len(self._idle) + self._in_use
+        keep = []
+        # Oldest connections sit at the front of the list
+        for returned_at, conn in self._idle:
+            if total > self.min_size and now - returned_at > self.idle_seconds:
+                _close_quietly(conn)
+                self.discarded += 1
+                total -= 1
+            else:
+                keep.append((returned_at, conn))
+        self._idle = keep
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            for _, conn in self._idle:
+                _close_quietly(conn)
+            self._idle = []
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "created": self.created,
+                "discarded": self.discarded,
+                "checkouts": self.checkouts,
+                "avg_wait_ms": 1000 * self.total_wait / self.checkouts if self.checkouts else 0.0,
+                "max_wait_ms": 1000 * self.max_wait,
+            }
+
+
+# One ConnectionPool per database name, created on first use and warmed up to
+# min_size in the background. A daemon thread runs idle eviction every
+# reap_seconds (0 turns it off).
+class PoolRegistry:
+    def __init__(self, reap_seconds=DEFAULT_REAP_SECONDS, **pool_kwargs):
+        self.pool_kwargs = pool_kwargs
+        self._pools = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        if reap_seconds > 0:
+            threading.Thread(target=self._reap, args=(reap_seconds,), name="pool-reaper", daemon=True).start()
+        atexit.register(self.close_all)
+
+    def get(self, database, connect_fn):
+        with self._lock:
+            pool = self._pools.get(database)
+            if pool is None:
+                pool = ConnectionPool(connect_fn, **self.pool_kwargs)
+                self._pools[database] = pool
+                threading.Thread(target=pool.warm, name=f"pool-warm-{database}", daemon=True).start()
+            return pool
+
+    def _reap(self, interval):
+        while not self._stopped.wait(interval):
+            with self._lock:
+                pools = list(self._pools.values())
+            for pool in pools:
+                pool.evict_idle()
+                pool.warm()
+
+    def stats(self):
+        with self._lock:
+            pools = dict(self._pools)
+        return {database: pool.stats() for database, pool in pools.items()}
+
+    def close_all(self):
+        self._stopped.set()
+        with self._lock:
+            pools = list(self._pools.values())
+            self._pools = {}
+        for pool in pools:
+            pool.close()
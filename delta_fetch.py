@@ -0,0 +1,198 @@
+# Incremental fetch for overlapping date ranges.
+# Results are remembered per filter combination (database, invoice type, payment
+# terms, account codes, typed) together with the days they cover. A new request
+# only queries the days that are not covered yet, then stitches cached and new
+# rows together. Recent days are always re-queried because payments
+# (AmtReceived) are still being posted against them, and every cached day
+# expires after a TTL so older balances are eventually refreshed as well.
+# Filters that compare against GETDATE() (e.g. "Over Credit") select different
+# rows from one day to the next, so their cached days are only reused on the
+# day they were fetched.
+import itertools
+import threading
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+
+from result_cache import frame_nbytes
+from sql_fetch import concat_frames
+
+DEFAULT_VOLATILE_DAYS = 7
+DEFAULT_TTL_SECONDS = 12 * 3600
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+DATE_COLUMN = "INV_Date"
+DAYS_PASSED_COLUMN = "Day_Passed"
+DATE_TEXT_FORMAT = "%d-%b-%Y"
+
+
+# Cache key without the date range: everything else that changes the result
+def make_filter_key(database, invoice_type, payment_terms, acc1="", acc2="", acc3="", typed=False):
+    def norm(value):
+        return " ".join(str(value or "").split()).lower()
+
+    return tuple(norm(v) for v in (database, invoice_type, payment_terms, acc1, acc2, acc3)) + (bool(typed),)
+
+
+# True for filter keys whose SQL fragments depend on the current date
+def is_date_relative(filter_key):
+    return any(isinstance(part, str) and "getdate(" in part for part in filter_key)
+
+
+def _day_range(start, end):
+    return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+
+# Group a sorted list of days into contiguous (first, last) ranges
+def contiguous_ranges(days):
+    ranges = []
+    for _, group in itertools.groupby(enumerate(days), key=lambda item: item[1].toordinal() - item[0]):
+        group = [day for _, day in group]
+        ranges.append((group[0], group[-1]))
+    return ranges
+
+
+# Invoice date of every row as datetime64, from the typed column or the formatted text
+def row_dates(df):
+    values = df[DATE_COLUMN]
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.dt.normalize().to_numpy()
+    return pd.to_datetime(values, format=DATE_TEXT_FORMAT, errors="coerce").to_numpy()
+
+
+class _Segment:
+    def __init__(self, df, dates, fetched_at, fetched_on):
+        self.df = df
+        self.dates = dates
+        self.fetched_at = fetched_at
+        self.fetched_on = fetched_on
+        self.nbytes = frame_nbytes(df)
+
+
+# What a fetch would do: days served from cache and ranges still to query
+class DeltaPlan:
+    def __init__(self, cached_days, missing_ranges):
+        self.cached_days = cached_days
+        self.missing_ranges = missing_ranges
+
+    @property
+    def missing_days(self):
+        return sum((end - start).days + 1 for start, end in self.missing_ranges)
+
+
+class IncrementalResultCache:
+    def __init__(self, volatile_days=DEFAULT_VOLATILE_DAYS, ttl_seconds=DEFAULT_TTL_SECONDS,
+                 max_bytes=DEFAULT_MAX_BYTES):
+        self.volatile_days = volatile_days
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._coverage = {}  # filter key -> {day: segment}
+        self._lock = threading.Lock()
+        self.reused_days = 0
+        self.queried_days = 0
+
+    def _usable(self, day, segment, today, now, same_day_only=False):
+        return (segment is not None
+                and day < today - timedelta(days=self.volatile_days)
+                and now - segment.fetched_at <= self.ttl_seconds
+                and (not same_day_only or segment.fetched_on == today))
+
+    def plan(self, filter_key, start, end, today=None):
+        today = today or date.today()
+        now = time.time()
+        same_day_only = is_date_relative(filter_key)
+        with self._lock:
+            coverage = self._coverage.get(filter_key, {})
+            cached, missing = {}, []
+            for day in _day_range(start, end):
+                segment = coverage.get(day)
+                if self._usable(day, segment, today, now, same_day_only):
+                    cached[day] = segment
+                else:
+                    missing.append(day)
+        return DeltaPlan(cached, contiguous_ranges(missing))
+
+    # Rows of the cached days, with Day_Passed moved on by the days since they were fetched
+    def _cached_rows(self, cached_days, today):
+        by_segment = {}
+        for day, segment in cached_days.items():
+            by_segment.setdefault(id(segment), (segment, []))[1].append(day)
+        parts = []
+        for segment, days in by_segment.values():
+            wanted = pd.to_datetime(pd.Series(days)).to_numpy()
+            rows = segment.df[pd.Series(segment.dates).isin(wanted).to_numpy()]
+            shift = (today - segment.fetched_on).days
+            if shift and DAYS_PASSED_COLUMN in rows.columns:
+                rows = rows.copy()
+                rows[DAYS_PASSED_COLUMN] = rows[DAYS_PASSED_COLUMN] + shift
+            parts.append((min(days), rows))
+        return parts
+
+    # Remember a freshly queried range; rows without a parseable date make it uncacheable
+    def _store(self, filter_key, start, end, df, fetched_at, fetched_on):
+        dates = row_dates(df)
+        if pd.isna(dates).any():
+            return
+        segment = _Segment(df, dates, fetched_at, fetched_on)
+        with self._lock:
+            coverage = self._coverage.setdefault(filter_key, {})
+            for day in _day_range(start, end):
+                coverage[day] = segment
+            self._evict()
+
+    def _segments(self):
+        seen = {}
+        for coverage in self._coverage.values():
+            for segment in coverage.values():
+                seen[id(segment)] = segment
+        return list(seen.values())
+
+    # Drop the oldest segments until the referenced frames fit in max_bytes
+    def _evict(self):
+        segments = sorted(self._segments(), key=lambda segment: segment.fetched_at)
+        total = sum(segment.nbytes for segment in segments)
+        while segments and total > self.max_bytes:
+            oldest = segments.pop(0)
+            total -= oldest.nbytes
+            for filter_key in list(self._coverage):
+                coverage = self._coverage[filter_key]
+                for day in [day for day, segment in coverage.items() if segment is oldest]:
+                    del coverage[day]
+                if not coverage:
+                    del self._coverage[filter_key]
+
+    # Return (DataFrame, plan) for start..end (dates), calling fetch_ranges(ranges)
+    # with the missing (start, end) ranges; it must return one DataFrame per range
+    def fetch(self, filter_key, start, end, fetch_ranges, today=None):
+        today = today or date.today()
+        plan = self.plan(filter_key, start, end, today)
+        parts = self._cached_rows(plan.cached_days, today)
+        if plan.missing_ranges:
+            fetched_at = time.time()
+            frames = fetch_ranges(plan.missing_ranges)
+            for (range_start, range_end), df in zip(plan.missing_ranges, frames):
+                self._store(filter_key, range_start, range_end, df, fetched_at, today)
+                parts.append((range_start, df))
+        with self._lock:
+            self.reused_days += len(plan.cached_days)
+            self.queried_days += plan.missing_days
+        return concat_frames(df for _, df in sorted(parts, key=lambda part: part[0])), plan
+
+    def invalidate(self, filter_key=None):
+        with self._lock:
+            if filter_key is None:
+                self._coverage.clear()
+            else:
+                self._coverage.pop(filter_key, None)
+
+    def stats(self):
+        with self._lock:
+            segments = self._segments()
+            return {
+                "filters": len(self._coverage),
+                "segments": len(segments),
+                "bytes": sum(segment.nbytes for segment in segments),
+                "reused_days": self.reused_days,
+                "queried_days": self.queried_days,
+            }
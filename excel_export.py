@@ -0,0 +1,284 @@
+# Pluggable Excel writers that take a stream of DataFrame chunks.
+# Streaming backends never hold more than one chunk in memory, and every
+# backend rolls over to a new sheet once Excel's row limit is reached.
+import importlib.util
+import re
+
+import pandas as pd
+
+EXCEL_MAX_ROWS = 1048576
+DEFAULT_CHUNK_ROWS = 50000
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Characters Excel does not allow in sheet names
+_INVALID_SHEET_CHARS = re.compile(r"[\[\]:*?/\\]")
+
+
+# Yield row slices of an in-memory DataFrame so it can go through the chunked writers
+def frame_chunks(df, chunk_rows=DEFAULT_CHUNK_ROWS):
+    if len(df) == 0:
+        yield df
+        return
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+# Replace NaN/NaT with None so the cells are written empty instead of as errors
+def _cell_rows(frame):
+    cleaned = frame.astype(object).where(frame.notna(), None)
+    return cleaned.itertuples(index=False, name=None)
+
+
+# Handles sheet naming and row-limit splitting; subclasses do the actual writing
+class ChunkedExcelWriter:
+    name = None
+    streaming = False
+
+    def __init__(self, target, columns, sheet_name="Sheet1", max_rows_per_sheet=EXCEL_MAX_ROWS,
+                 column_formats=None):
+        self.target = target
+        # Excel number formats by column name, e.g. {"Net Amt": "#,##0.00"}
+        self.format_names = dict(column_formats or {})
+        # The header takes one row of every sheet
+        self.max_data_rows = max(max_rows_per_sheet - 1, 1)
+        self.rows_written = 0
+        self._used_titles = set()
+        self.start_section(sheet_name, columns)
+
+    # Begin a new logical sheet (which may itself overflow into several sheets)
+    def start_section(self, sheet_name, columns):
+        self.columns = [str(col) for col in columns]
+        self.column_formats = {
+            self.columns.index(col): fmt
+            for col, fmt in self.format_names.items() if col in self.columns
+        }
+        self.sheet_name = _INVALID_SHEET_CHARS.sub("_", str(sheet_name))[:31] or "Sheet"
+        self.sheet_count = 0
+        self.sheet_rows = 0
+
+    def _sheet_title(self, n):
+        if n == 1:
+            return self.sheet_name
+        suffix = f"_{n}"
+        return self.sheet_name[:31 - len(suffix)] + suffix
+
+    def _next_sheet(self):
+        self.sheet_count += 1
+        n = self.sheet_count
+        title = self._sheet_title(n)
+        # Excel sheet names are case-insensitive and must be unique in the workbook
+        while title.lower() in self._used_titles:
+            n += 1
+            title = self._sheet_title(n)
+        self._used_titles.add(title.lower())
+        self.sheet_rows = 0
+        self._add_sheet(title)
+
+    # Create the section's first sheet now, even if no rows follow
+    def ensure_sheet(self):
+        if self.sheet_count == 0:
+            self._next_sheet()
+
+    def write_chunk(self, frame):
+        self.ensure_sheet()
+        start = 0
+        while start < len(frame):
+            if self.sheet_rows >= self.max_data_rows:
+                self._next_sheet()
+            take = min(self.max_data_rows - self.sheet_rows, len(frame) - start)
+            self._append(frame.iloc[start:start + take])
+            self.sheet_rows += take
+            self.rows_written += take
+            start += take
+
+    def close(self):
+        self.ensure_sheet()
+        self._finish()
+
+    def _add_sheet(self, title):
+        raise NotImplementedError
+
+    def _append(self, frame):
+        raise NotImplementedError
+
+    def _finish(self):
+        raise NotImplementedError
+
+
+# pandas' default path: a normal openpyxl workbook built entirely in memory
+class PandasExcelWriter(ChunkedExcelWriter):
+    name = "openpyxl"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._sheets = []  # [(title, columns, column_formats, [frames])]
+
+    def _add_sheet(self, title):
+        self._sheets.append((title, self.columns, dict(self.column_formats), []))
+
+    def _append(self, frame):
+        self._sheets[-1][3].append(frame)
+
+    def _finish(self):
+        with pd.ExcelWriter(self.target, engine="openpyxl") as writer:
+            for title, columns, column_formats, frames in self._sheets:
+                sheet = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+                sheet.columns = columns
+                sheet.to_excel(writer, sheet_name=title, index=False)
+                ws = writer.sheets[title]
+                for idx, fmt in column_formats.items():
+                    for (cell,) in ws.iter_rows(min_row=2, min_col=idx + 1, max_col=idx + 1):
+                        cell.number_format = fmt
+
+
+# openpyxl write-only workbook: rows are serialized as they are appended
+class OpenpyxlWriteOnlyWriter(ChunkedExcelWriter):
+    name = "openpyxl_write_only"
+    streaming = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+
+        self._wb = Workbook(write_only=True)
+        self._ws = None
+        self._cell_class = WriteOnlyCell
+
+    def _add_sheet(self, title):
+        self._ws = self._wb.create_sheet(title=title)
+        self._ws.append(self.columns)
+
+    def _append(self, frame):
+        if not self.column_formats:
+            for row in _cell_rows(frame):
+                self._ws.append(row)
+            return
+        for row in _cell_rows(frame):
+            row = list(row)
+            for idx, fmt in self.column_formats.items():
+                if row[idx] is not None:
+                    cell = self._cell_class(self._ws, value=row[idx])
+                    cell.number_format = fmt
+                    row[idx] = cell
+            self._ws.append(row)
+
+    def _finish(self):
+        self._wb.save(self.target)
+
+
+# xlsxwriter in constant_memory mode: each row is flushed to a temp file once written.
+# This holds for file-like targets too; only in_memory mode would turn it off, and the
+# zip is assembled into the target on close.
+class XlsxWriterStreamingWriter(ChunkedExcelWriter):
+    name = "xlsxwriter"
+    streaming = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        import xlsxwriter
+
+        self._wb = xlsxwriter.Workbook(self.target, {
+            "constant_memory": True,
+            "in_memory": False,
+            "nan_inf_to_errors": True,
+            "default_date_format": "dd-mmm-yyyy",
+        })
+        self._ws = None
+        self._row = 0
+        # Every format any section may use, not just the first sheet's columns
+        self._formats = {fmt: self._wb.add_format({"num_format": fmt}) for fmt in set(self.format_names.values())}
+
+    def _add_sheet(self, title):
+        self._ws = self._wb.add_worksheet(title)
+        # Column formats must be set before any rows are flushed in constant_memory mode
+        for idx, fmt in self.column_formats.items():
+            self._ws.set_column(idx, idx, None, self._formats[fmt])
+        self._ws.write_row(0, 0, self.columns)
+        self._row = 1
+
+    def _append(self, frame):
+        for row in _cell_rows(frame):
+            self._ws.write_row(self._row, 0, row)
+            self._row += 1
+
+    def _finish(self):
+        self._wb.close()
+
+
+EXCEL_WRITERS = {
+    writer.name: writer
+    for writer in (XlsxWriterStreamingWriter, OpenpyxlWriteOnlyWriter, PandasExcelWriter)
+}
+
+
+# Checked without importing, so listing backends does not load the Excel libraries
+def _is_installed(module_name):
+    return importlib.util.find_spec(module_name) is not None
+
+
+# Backend names that can be used in this environment, fastest first
+def available_backends():
+    backends = []
+    if _is_installed("xlsxwriter"):
+        backends.append("xlsxwriter")
+    if _is_installed("openpyxl"):
+        backends.extend(["openpyxl_write_only", "openpyxl"])
+    return backends
+
+
+def get_writer_class(backend="auto"):
+    if backend == "auto":
+        backends = available_backends()
+        if not backends:
+            raise RuntimeError("No Excel writer available: install xlsxwriter or openpyxl")
+        backend = backends[0]
+    if backend not in EXCEL_WRITERS:
+        raise ValueError(f"Unknown Excel backend: {backend}")
+    return EXCEL_WRITERS[backend]
+
+
+# Write an iterable of DataFrame chunks to target (path or binary file object).
+# Returns the number of data rows written.
+def write_excel(chunks, target, columns=None, backend="auto", sheet_name="Sheet1",
+                max_rows_per_sheet=EXCEL_MAX_ROWS, column_formats=None):
+    writer_class = get_writer_class(backend)
+    writer = None
+    for chunk in chunks:
+        if writer is None:
+            writer = writer_class(target, columns if columns is not None else chunk.columns,
+                                  sheet_name=sheet_name, max_rows_per_sheet=max_rows_per_sheet,
+                                  column_formats=column_formats)
+        writer.write_chunk(chunk)
+    if writer is None:
+        writer = writer_class(target, columns or [], sheet_name=sheet_name,
+                              max_rows_per_sheet=max_rows_per_sheet, column_formats=column_formats)
+    writer.close()
+    return writer.rows_written
+
+
+# Write several logical sheets into one workbook.
+# sections is an iterable of (sheet_name, columns or None, chunks).
+def write_excel_sheets(sections, target, backend="auto", max_rows_per_sheet=EXCEL_MAX_ROWS,
+                       column_formats=None):
+    writer_class = get_writer_class(backend)
+    writer = None
+    for sheet_name, columns, chunks in sections:
+        chunks = iter(chunks)
+        first = next(chunks, None)
+        if columns is None:
+            columns = list(first.columns) if first is not None else []
+        if writer is None:
+            writer = writer_class(target, columns, sheet_name=sheet_name, max_rows_per_sheet=max_rows_per_sheet,
+                                  column_formats=column_formats)
+        else:
+            writer.start_section(sheet_name, columns)
+        writer.ensure_sheet()
+        if first is not None:
+            writer.write_chunk(first)
+        for chunk in chunks:
+            writer.write_chunk(chunk)
+    if writer is None:
+        writer = writer_class(target, [], max_rows_per_sheet=max_rows_per_sheet)
+    writer.close()
+    return writer.rows_written
@@ -0,0 +1,224 @@
+# Background export jobs: Excel/CSV files are built on a worker pool only when
+# a user asks for them, kept on local disk until they expire, then deleted.
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from admission import AdmissionCancelled
+from excel_export import XLSX_MIME, frame_chunks, write_excel, write_excel_sheets
+from sql_fetch import write_csv
+from summaries import SummaryAccumulator, summarize, summary_excel_formats, summary_sections
+
+DEFAULT_EXPORT_DIR = os.path.join(tempfile.gettempdir(), "sql_to_excel_exports")
+DEFAULT_EXPORT_TTL_SECONDS = 3600
+DEFAULT_EXPORT_WORKERS = 2
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+EXPORT_FORMATS = {
+    "xlsx": XLSX_MIME,
+    "csv": "text/csv",
+}
+
+
+class ExportJob:
+    def __init__(self, owner, fmt, file_name, total_rows, username=None):
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.username = username
+        self.format = fmt
+        self.file_name = file_name
+        self.mime = EXPORT_FORMATS[fmt]
+        self.total_rows = total_rows
+        self.rows_written = 0
+        self.status = QUEUED
+        self.error = None
+        self.path = None
+        self.bytes = 0
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.expires_at = None
+        self.ticket = None
+
+    # Place in the export queue while waiting for a free slot, 0 otherwise
+    @property
+    def queue_position(self):
+        if self.status != QUEUED or self.ticket is None:
+            return 0
+        return self.ticket.position
+
+    @property
+    def progress(self):
+        if self.status == DONE:
+            return 1.0
+        if not self.total_rows:
+            return 0.0
+        return min(self.rows_written / self.total_rows, 1.0)
+
+    @property
+    def duration(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+
+# Runs export jobs on a thread pool and tracks their artifacts on disk.
+# With an AdmissionController, each job queues for an export slot when it is
+# submitted and only goes to a worker once admitted, so queued jobs never tie
+# up a worker; a session's newer export of the same format cancels its older one.
+class ExportJobManager:
+    def __init__(self, export_dir=DEFAULT_EXPORT_DIR, ttl_seconds=DEFAULT_EXPORT_TTL_SECONDS,
+                 max_workers=DEFAULT_EXPORT_WORKERS, admission=None):
+        self.export_dir = export_dir
+        self.admission = admission
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(export_dir, exist_ok=True)
+        self._remove_stale_files()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="export")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    # source is a DataFrame or anything with iter_batches() (e.g. a ResultSpool).
+    # sheet_column (DataFrames only) writes one Excel sheet per value of that column.
+    # summaries adds the summary sheets after the rows (Excel only).
+    def submit(self, owner, source, fmt, file_name, excel_backend="auto", column_formats=None,
+               csv_date_format=None, username=None, on_finish=None, sheet_column=None, summaries=False):
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format: {fmt}")
+        total_rows = source.row_count if hasattr(source, "iter_batches") else len(source)
+        job = ExportJob(owner, fmt, file_name, total_rows, username=username)
+        with self._lock:
+            self._jobs[job.id] = job
+        args = (job, source, excel_backend, column_formats, csv_date_format, on_finish, sheet_column, summaries)
+        if self.admission is None:
+            self._executor.submit(self._run, None, *args)
+            return job
+        job.ticket = self.admission.request(job.username or job.owner, f"export_{job.format}", owner=job.owner,
+                                            on_admit=lambda ticket: self._executor.submit(self._run, ticket, *args))
+        job.ticket.add_cancel_callback(lambda: self._cancel_queued(job, on_finish))
+        return job
+
+    # A job superseded before it was admitted never reaches a worker
+    def _cancel_queued(self, job, on_finish):
+        if job.ticket.admitted_at is not None:
+            return  # _run sees the cancellation and cleans up
+        job.status = FAILED
+        job.error = job.ticket.reason
+        self._finish(job, on_finish)
+
+    def _finish(self, job, on_finish):
+        job.finished_at = time.time()
+        job.expires_at = job.finished_at + self.ttl_seconds
+        if on_finish is not None:
+            try:
+                on_finish(job)
+            except Exception:
+                pass
+
+    def _chunks(self, job, source):
+        if hasattr(source, "path") and not os.path.exists(source.path):
+            raise FileNotFoundError("The result set was replaced before the export started")
+        batches = source.iter_batches() if hasattr(source, "iter_batches") else frame_chunks(source)
+        for batch in batches:
+            if job.ticket is not None and job.ticket.cancelled:
+                raise AdmissionCancelled(job.ticket.reason)
+            yield batch
+            job.rows_written += len(batch)
+
+    def _sections(self, job, source, sheet_column):
+        columns = [col for col in source.columns if col != sheet_column]
+        for value, group in source.groupby(sheet_column, sort=False):
+            yield str(value), columns, self._chunks(job, group[columns])
+
+    # Data sheet(s) first, then one sheet per summary. A single data sheet feeds the
+    # summaries as it is written, so a spooled source is only read once.
+    def _excel_sections(self, job, source, sheet_column, summaries):
+        accumulator = None
+        if sheet_column is not None:
+            yield from self._sections(job, source, sheet_column)
+        else:
+            chunks = self._chunks(job, source)
+            if summaries:
+                accumulator = SummaryAccumulator()
+                chunks = accumulator.feed(chunks)
+            yield "Sheet1", list(source.columns), chunks
+        if summaries:
+            yield from summary_sections(accumulator.result() if accumulator is not None else summarize(source))
+
+    # ticket is the admitted export ticket (None without admission control)
+    def _run(self, ticket, job, source, excel_backend, column_formats, csv_date_format, on_finish, sheet_column=None,
+             summaries=False):
+        path = os.path.join(self.export_dir, f"{job.id}.{job.format}")
+        try:
+            if ticket is not None:
+                job.ticket = ticket
+                if ticket.cancelled:
+                    raise AdmissionCancelled(ticket.reason)
+            job.status = RUNNING
+            job.started_at = time.time()
+            columns = source.columns if hasattr(source, "iter_batches") else list(source.columns)
+            if job.format == "xlsx" and (sheet_column is not None or summaries):
+                if summaries:
+                    column_formats = {**summary_excel_formats(), **(column_formats or {})}
+                write_excel_sheets(self._excel_sections(job, source, sheet_column, summaries), path,
+                                   backend=excel_backend, column_formats=column_formats)
+            elif job.format == "xlsx":
+                write_excel(self._chunks(job, source), path, columns=columns, backend=excel_backend,
+                            column_formats=column_formats)
+            else:
+                write_csv(self._chunks(job, source), path, columns=columns, date_format=csv_date_format)
+            job.path = path
+            job.bytes = os.path.getsize(path)
+            job.status = DONE
+        except Exception as e:
+            job.status = FAILED
+            job.error = str(e)
+            if os.path.exists(path):
+                os.remove(path)
+        finally:
+            if ticket is not None:
+                ticket.release()
+            self._finish(job, on_finish)
+
+    # Files left behind by a previous process are not tracked by any job
+    def _remove_stale_files(self):
+        cutoff = time.time() - self.ttl_seconds
+        for name in os.listdir(self.export_dir):
+            path = os.path.join(self.export_dir, name)
+            try:
+                if os.path.isfile(path) and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def jobs_for(self, owner):
+        self.purge_expired()
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if job.owner == owner]
+        return sorted(jobs, key=lambda job: job.created_at, reverse=True)
+
+    def read(self, job):
+        with open(job.path, "rb") as f:
+            return f.read()
+
+    def remove(self, job_id):
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+        if job is not None and job.path and os.path.exists(job.path):
+            os.remove(job.path)
+
+    # Delete finished jobs (and their files) once they pass their expiry time
+    def purge_expired(self):
+        now = time.time()
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.expires_at is not None and job.expires_at < now]
+        for job_id in expired:
+            self.remove(job_id)
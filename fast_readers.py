@@ -0,0 +1,135 @@
+# Faster whole-file readers for the File Converter tab.
+# CSVs go through the pyarrow engine (multi-threaded, optionally Arrow-backed
+# dtypes) and xlsx through calamine when python-calamine is installed; both fall
+# back to the plain pandas readers. The encoding is sniffed from a sample instead
+# of assuming cp1252, and columns can be downcast to the smallest fitting dtype.
+import codecs
+import importlib.util
+
+import pandas as pd
+
+SNIFF_BYTES = 64 * 1024
+LEGACY_ENCODING = "cp1252"
+# object columns with at most this share of distinct values become categoricals
+CATEGORY_MAX_RATIO = 0.5
+
+PARSER_BACKENDS = ["auto", "pandas"]
+
+
+def _has_module(name):
+    return importlib.util.find_spec(name) is not None
+
+
+HAS_PYARROW = _has_module("pyarrow")
+HAS_CALAMINE = _has_module("python_calamine")
+
+
+def _read_sample(file, size=SNIFF_BYTES):
+    if hasattr(file, "seek"):
+        file.seek(0)
+        sample = file.read(size)
+        file.seek(0)
+        return sample
+    with open(file, "rb") as f:
+        return f.read(size)
+
+
+# Best guess at the text encoding: BOMs first, then strict UTF-8, then the
+# legacy Windows code page the existing exports use, then charset_normalizer
+# if installed. Statistical detectors confuse cp1252 with its neighbours, so
+# it is only consulted for bytes cp1252 cannot decode.
+def sniff_encoding(file, fallback="latin-1"):
+    sample = _read_sample(file)
+    if isinstance(sample, str):
+        return "utf-8"
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    try:
+        # A multi-byte character may be cut off at the end of the sample
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+    try:
+        sample.decode(LEGACY_ENCODING)
+        return LEGACY_ENCODING
+    except UnicodeDecodeError:
+        pass
+    if _has_module("charset_normalizer"):
+        from charset_normalizer import from_bytes
+
+        best = from_bytes(sample).best()
+        if best is not None and best.encoding:
+            return best.encoding
+    return fallback
+
+
+# Shrink numeric columns to the smallest dtype that holds them and turn
+# repetitive text columns into categoricals
+def downcast_frame(df, category_max_ratio=CATEGORY_MAX_RATIO):
+    df = df.copy()
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_bool_dtype(series) or isinstance(series.dtype, pd.ArrowDtype):
+            continue
+        if pd.api.types.is_integer_dtype(series):
+            df[col] = pd.to_numeric(series, downcast="integer")
+        elif pd.api.types.is_float_dtype(series):
+            df[col] = pd.to_numeric(series, downcast="float")
+        elif series.dtype == object and len(series):
+            if series.nunique(dropna=True) <= category_max_ratio * len(series):
+                df[col] = series.astype("category")
+    return df
+
+
+def read_csv_fast(file, encoding=None, arrow_dtypes=False):
+    encoding = encoding or sniff_encoding(file)
+    if hasattr(file, "seek"):
+        file.seek(0)
+    if not HAS_PYARROW:
+        return pd.read_csv(file, encoding=encoding)
+    kwargs = {"engine": "pyarrow", "encoding": encoding}
+    if arrow_dtypes:
+        kwargs["dtype_backend"] = "pyarrow"
+    return pd.read_csv(file, **kwargs)
+
+
+def read_xlsx_fast(file):
+    if hasattr(file, "seek"):
+        file.seek(0)
+    if not HAS_CALAMINE:
+        return pd.read_excel(file)
+    from python_calamine import CalamineWorkbook
+
+    workbook = CalamineWorkbook.from_object(file)
+    rows = workbook.get_sheet_by_index(0).to_python(skip_empty_area=False)
+    if not rows:
+        return pd.DataFrame()
+    header = [str(col) if col not in (None, "") else f"Unnamed: {i}" for i, col in enumerate(rows[0])]
+    # calamine returns "" for empty cells; pandas would read them as missing
+    body = [[None if value == "" else value for value in row] for row in rows[1:]]
+    return pd.DataFrame(body, columns=header).infer_objects()
+
+
+# backend "auto" uses the fast readers when their libraries are installed,
+# "pandas" keeps the default pandas readers
+def read_file(file, ext, backend="auto", encoding=None, arrow_dtypes=False, downcast=False):
+    if ext == ".csv":
+        if backend == "pandas":
+            if hasattr(file, "seek"):
+                file.seek(0)
+            df = pd.read_csv(file, encoding=encoding or sniff_encoding(file))
+        else:
+            df = read_csv_fast(file, encoding=encoding, arrow_dtypes=arrow_dtypes)
+    elif ext == ".xlsx":
+        if backend == "pandas":
+            if hasattr(file, "seek"):
+                file.seek(0)
+            df = pd.read_excel(file)
+        else:
+            df = read_xlsx_fast(file)
+    else:
+        raise ValueError(f"Unsupported file type: {ext}")
+    return downcast_frame(df) if downcast else df
@@ -0,0 +1,370 @@
+# Chunked conversion pipeline for the File Converter tab.
+# Files are read in chunks with column projection at read time, duplicates are
+# dropped with a running set of row hashes, missing numeric values are filled
+# with a two-pass mean, and output is written chunk by chunk. Peak DataFrame
+# memory is bounded by the chunk size rather than the file size; dedup also
+# keeps one copy of each distinct row to confirm hash matches against.
+import hashlib
+import io
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+
+from excel_export import XLSX_MIME, frame_chunks, write_excel, write_excel_sheets
+from fast_readers import read_file, sniff_encoding
+from sql_fetch import write_csv
+
+DEFAULT_CHUNK_ROWS = 50000
+PREVIEW_ROWS = 20
+
+
+def _rewind(file):
+    if hasattr(file, "seek"):
+        file.seek(0)
+
+
+# Column names without reading the data
+# CSV encodings are sniffed from the file when not given
+def read_header(file, ext, encoding=None):
+    if ext == ".csv":
+        encoding = encoding or sniff_encoding(file)
+        _rewind(file)
+        return list(pd.read_csv(file, encoding=encoding, nrows=0).columns)
+    _rewind(file)
+    if ext == ".xlsx":
+        return list(pd.read_excel(file, nrows=0).columns)
+    raise ValueError(f"Unsupported file type: {ext}")
+
+
+# First rows only, for the preview
+def read_preview(file, ext, rows=PREVIEW_ROWS, encoding=None):
+    if ext == ".csv":
+        encoding = encoding or sniff_encoding(file)
+        _rewind(file)
+        return pd.read_csv(file, encoding=encoding, nrows=rows)
+    _rewind(file)
+    return pd.read_excel(file, nrows=rows)
+
+
+def _xlsx_chunks(file, chunk_rows, usecols=None):
+    from openpyxl import load_workbook
+
+    wb = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        header = [str(col) if col is not None else f"Unnamed: {i}" for i, col in enumerate(header)]
+        keep = [i for i, col in enumerate(header) if usecols is None or col in usecols]
+        columns = [header[i] for i in keep]
+        buffer = []
+        for row in rows:
+            buffer.append([row[i] if i < len(row) else None for i in keep])
+            if len(buffer) >= chunk_rows:
+                yield pd.DataFrame(buffer, columns=columns).infer_objects()
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=columns).infer_objects()
+    finally:
+        wb.close()
+
+
+# Yield DataFrame chunks of the file, reading only the columns in usecols
+def read_chunks(file, ext, chunk_rows=DEFAULT_CHUNK_ROWS, usecols=None, encoding=None):
+    if ext == ".csv":
+        encoding = encoding or sniff_encoding(file)
+        _rewind(file)
+        yield from pd.read_csv(file, encoding=encoding, chunksize=chunk_rows, usecols=usecols)
+    elif ext == ".xlsx":
+        _rewind(file)
+        yield from _xlsx_chunks(file, chunk_rows, usecols=usecols)
+    else:
+        raise ValueError(f"Unsupported file type: {ext}")
+
+
+# Drops rows already seen in earlier chunks (or earlier in the same chunk).
+# Rows are bucketed by an 8-byte hash, and a hash match only counts as a
+# duplicate once the stored row compares equal, so a collision never drops a
+# distinct row. Missing values compare equal, as in DataFrame.drop_duplicates.
+class StreamingDeduplicator:
+    def __init__(self):
+        self._seen = {}
+        self.dropped = 0
+
+    # Chunks can infer int64 for a column in one chunk and float64 in the next
+    # (e.g. once a chunk has a gap), so whole floats are hashed as the integer
+    # they hold. Integer columns are hashed as they are and stay exact past 2**53.
+    def _hash_rows(self, chunk):
+        normalized = chunk.copy()
+        for col in chunk.columns:
+            if chunk[col].dtype.kind != "f":
+                continue
+            values = chunk[col].to_numpy(dtype="float64")
+            whole = np.isfinite(values) & (np.floor(values) == values) & (np.abs(values) < 2.0 ** 63)
+            bits = values.view("int64").copy()
+            bits[whole] = values[whole].astype("int64")
+            bits[np.isnan(values)] = np.iinfo("int64").min
+            normalized[col] = bits
+        return pd.util.hash_pandas_object(normalized, index=False).to_numpy()
+
+    def __call__(self, chunk):
+        if chunk.empty:
+            return chunk
+        rows = chunk.astype(object).where(chunk.notna(), None).itertuples(index=False, name=None)
+        keep = []
+        for h, row in zip(self._hash_rows(chunk), rows):
+            stored = self._seen.get(h)
+            if stored is None:
+                self._seen[h] = [row]
+                keep.append(True)
+            elif row in stored:
+                keep.append(False)
+            else:
+                stored.append(row)
+                keep.append(True)
+        self.dropped += len(keep) - sum(keep)
+        return chunk[keep]
+
+
+# First pass: running sums/counts for the columns that are numeric in every chunk
+def numeric_means(chunks):
+    sums = counts = None
+    numeric = None
+    for chunk in chunks:
+        cols = set(chunk.select_dtypes(include=["number"]).columns)
+        numeric = cols if numeric is None else numeric & cols
+        chunk_sums = chunk[list(cols)].sum()
+        chunk_counts = chunk[list(cols)].count()
+        sums = chunk_sums if sums is None else sums.add(chunk_sums, fill_value=0)
+        counts = chunk_counts if counts is None else counts.add(chunk_counts, fill_value=0)
+    if not numeric:
+        return pd.Series(dtype="float64")
+    numeric = list(numeric)
+    return (sums[numeric] / counts[numeric].where(counts[numeric] > 0)).dropna()
+
+
+# Clean chunks in order: dedup, then fill numeric NaNs with the precomputed means
+def clean_chunks(chunks, dedup=False, means=None):
+    dedup_fn = StreamingDeduplicator() if dedup else None
+    for chunk in chunks:
+        if dedup_fn is not None:
+            chunk = dedup_fn(chunk)
+        if means is not None and len(means):
+            cols = [col for col in means.index if col in chunk.columns]
+            chunk = chunk.fillna(means[cols].to_dict())
+        yield chunk
+
+
+# Full streaming conversion of one file. fmt is "CSV" or "Excel".
+# on_progress(rows_read) is called after each chunk of the final pass.
+def convert_streaming(file, ext, out_path, fmt, usecols=None, dedup=False, fill_mean=False,
+                      chunk_rows=DEFAULT_CHUNK_ROWS, excel_backend="auto", on_progress=None,
+                      encoding=None):
+    if ext == ".csv" and encoding is None:
+        # Sniff once rather than on every pass over the file
+        encoding = sniff_encoding(file)
+    means = None
+    if fill_mean:
+        # Means are taken over the rows that survive dedup, as the in-memory path does
+        means = numeric_means(clean_chunks(read_chunks(file, ext, chunk_rows, usecols, encoding), dedup=dedup))
+
+    rows_read = 0
+
+    def counted(chunks):
+        nonlocal rows_read
+        for chunk in chunks:
+            rows_read += len(chunk)
+            if on_progress is not None:
+                on_progress(rows_read)
+            yield chunk
+
+    # Readers return projected columns in file order, not in usecols order
+    columns = [col for col in read_header(file, ext, encoding) if usecols is None or col in usecols]
+    chunks = clean_chunks(counted(read_chunks(file, ext, chunk_rows, usecols, encoding)), dedup=dedup, means=means)
+    if fmt == "CSV":
+        rows_written = write_csv(chunks, out_path, columns=columns)
+    else:
+        rows_written = write_excel(chunks, out_path, columns=columns, backend=excel_backend)
+    return {"rows_read": rows_read, "rows_written": rows_written}
+
+
+# Parse a whole upload into memory (the non-streaming path).
+# backend, arrow_dtypes and downcast are passed through to fast_readers.read_file.
+def parse_file(file, ext, encoding=None, backend="auto", downcast=False, arrow_dtypes=False):
+    return read_file(file, ext, backend=backend, encoding=encoding, arrow_dtypes=arrow_dtypes, downcast=downcast)
+
+
+def content_digest(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+# Everything the converter tab knows about one uploaded file.
+# The parsed frame is never modified; cleaning steps are recorded and the
+# derived frame/preview are recomputed only when those steps or the column
+# selection change.
+class FileState:
+    def __init__(self, key, base_df):
+        self.key = key
+        self.base_df = base_df
+        self.transforms = []
+        self.columns = list(base_df.columns)
+        self._cleaned = base_df
+        self._derived = None
+        self._derived_for = None
+
+    @property
+    def cleaned(self):
+        return self._cleaned
+
+    def remove_duplicates(self):
+        self._cleaned = self._cleaned.drop_duplicates()
+        self.transforms.append("remove_duplicates")
+        self._derived = None
+
+    # Returns False when there is no numeric column to fill
+    def fill_missing(self):
+        numeric_cols = self._cleaned.select_dtypes(include=["number"]).columns
+        if len(numeric_cols) == 0:
+            return False
+        filled = self._cleaned.copy()
+        filled[numeric_cols] = filled[numeric_cols].fillna(filled[numeric_cols].mean())
+        self._cleaned = filled
+        self.transforms.append("fill_missing")
+        self._derived = None
+        return True
+
+    def reset(self):
+        self._cleaned = self.base_df
+        self.transforms = []
+        self._derived = None
+
+    def select_columns(self, columns):
+        self.columns = [col for col in columns if col in self._cleaned.columns]
+
+    # The frame that gets previewed, charted and converted
+    @property
+    def frame(self):
+        selection = tuple(self.columns)
+        if self._derived is None or self._derived_for != selection:
+            self._derived = self._cleaned[list(selection)]
+            self._derived_for = selection
+        return self._derived
+
+    @property
+    def preview(self):
+        return self.frame.head(PREVIEW_ROWS)
+
+
+# Cleaning applied to every file of a batch. columns=None keeps all columns;
+# listed columns a file does not have are simply skipped for that file.
+def apply_spec(df, columns=None, dedup=False, fill_mean=False):
+    if columns:
+        df = df[[col for col in columns if col in df.columns]]
+    if dedup:
+        df = df.drop_duplicates()
+    if fill_mean:
+        numeric_cols = df.select_dtypes(include=["number"]).columns
+        if len(numeric_cols):
+            df = df.copy()
+            df[numeric_cols] = df[numeric_cols].fillna(df[numeric_cols].mean())
+    return df
+
+
+# Runs in a worker process: parse, clean and (unless returning the frame) encode one file
+def _convert_one(name, data, spec, out_format, excel_backend, return_frame):
+    ext = os.path.splitext(name)[-1].lower()
+    df = apply_spec(parse_file(io.BytesIO(data), ext), **spec)
+    if return_frame:
+        return {"rows": len(df), "frame": df}
+    out = io.BytesIO()
+    if out_format == "CSV":
+        df.to_csv(out, index=False)
+    else:
+        write_excel(frame_chunks(df), out, backend=excel_backend)
+    return {"rows": len(df), "data": out.getvalue()}
+
+
+def make_process_pool(max_workers=None):
+    # spawn keeps workers clear of the web server's threads and open sockets
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=get_context("spawn"))
+
+
+def _sheet_name(name, used):
+    base = os.path.splitext(name)[0][:31] or "Sheet"
+    title, n = base, 1
+    while title.lower() in used:
+        n += 1
+        suffix = f"_{n}"
+        title = base[:31 - len(suffix)] + suffix
+    used.add(title.lower())
+    return title
+
+
+# "data.csv", "data (2).csv", ... so files sharing a name stay apart (case-insensitively)
+def _unique_names(names):
+    used = set()
+    unique = []
+    for name in names:
+        stem, ext = os.path.splitext(name)
+        candidate, n = name, 1
+        while candidate.lower() in used:
+            n += 1
+            candidate = f"{stem} ({n}){ext}"
+        used.add(candidate.lower())
+        unique.append(candidate)
+    return unique
+
+
+# Convert many uploads in parallel on executor and package the result.
+# files is a list of (name, bytes); package is "zip" or "workbook". Repeated
+# names get a " (2)", " (3)", ... suffix, and that name is what on_progress and
+# the results use. on_progress(name, status, error) is called as each file finishes.
+# Returns (payload bytes, output file name, mime type, {name: result or error}).
+# A worker process that dies (e.g. out of memory) breaks the whole executor; that
+# raises BrokenProcessPool instead of being recorded against the files.
+def batch_convert(executor, files, spec, out_format="Excel", package="zip", excel_backend="auto",
+                  on_progress=None, archive_name="converted"):
+    return_frame = package == "workbook"
+    files = list(zip(_unique_names([name for name, _ in files]), [data for _, data in files]))
+    futures = {
+        executor.submit(_convert_one, name, data, spec, out_format, excel_backend, return_frame): name
+        for name, data in files
+    }
+    results = {}
+    for future in as_completed(futures):
+        name = futures[future]
+        try:
+            results[name] = future.result()
+            status, error = "done", None
+        except BrokenProcessPool:
+            raise
+        except Exception as e:
+            results[name] = {"error": str(e)}
+            status, error = "failed", str(e)
+        if on_progress is not None:
+            on_progress(name, status, error)
+
+    # Package in upload order so the output is stable regardless of finish order
+    ok = [(name, results[name]) for name, _ in files if "error" not in results[name]]
+    out = io.BytesIO()
+    if package == "workbook":
+        used = set()
+        write_excel_sheets(
+            ((_sheet_name(name, used), None, frame_chunks(result["frame"])) for name, result in ok),
+            out, backend=excel_backend
+        )
+        return out.getvalue(), f"{archive_name}.xlsx", XLSX_MIME, results
+
+    out_ext = ".csv" if out_format == "CSV" else ".xlsx"
+    # "a.csv" and "a.xlsx" would both become "a.xlsx"
+    entry_names = _unique_names([os.path.splitext(name)[0] + out_ext for name, _ in ok])
+    with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for entry_name, (_, result) in zip(entry_names, ok):
+            zf.writestr(entry_name, result["data"])
+    return out.getvalue(), f"{archive_name}.zip", "application/zip", results
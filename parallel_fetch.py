@@ -0,0 +1,91 @@
+# Concurrent fetch helpers.
+# Date-sliced fan-out for long OUTSTANDINGLISTING_NEW ranges: the requested
+# range is cut into contiguous day slices that each run as their own call of
+# the same statement on a separate pooled connection. pyodbc releases the GIL
+# while waiting on the server, so plain threads overlap the slices. Every row
+# carries exactly one refDate (it is part of the GROUP BY), so the slices
+# partition the result and their concatenation matches a single call over the
+# whole range, up to row order. The same thread approach runs one query
+# against several databases at once (fetch_each / merge_sources).
+import math
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+
+from sql_fetch import concat_frames
+
+DEFAULT_SLICES = 4
+DEFAULT_MAX_CONCURRENCY = 4
+SOURCE_COLUMN = "Source"
+
+
+# Split start..end (inclusive dates) into at most `slices` contiguous ranges of
+# near-equal length, earliest first
+def split_date_range(start, end, slices=DEFAULT_SLICES):
+    days = (end - start).days + 1
+    if days <= 0:
+        return []
+    slices = max(1, min(slices, days))
+    base, extra = divmod(days, slices)
+    ranges = []
+    slice_start = start
+    for i in range(slices):
+        length = base + (1 if i < extra else 0)
+        slice_end = slice_start + timedelta(days=length - 1)
+        ranges.append((slice_start, slice_end))
+        slice_start = slice_end + timedelta(days=1)
+    return ranges
+
+
+# Run fetch_range(conn, start, end) for every range on its own connection from
+# pool, at most max_concurrency (and never more than the pool holds) at a time.
+# Returns the frames in range order; the first failure cancels the slices that
+# have not started and is re-raised. Admission control already bounds how many
+# fetches run at once, so when several of them share a pool the slices queue
+# for a connection instead of failing with PoolTimeout.
+def fetch_ranges_parallel(pool, ranges, fetch_range, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+    ranges = list(ranges)
+    if not ranges:
+        return []
+
+    def run(range_start, range_end):
+        with pool.connection(timeout=math.inf) as conn:
+            return fetch_range(conn, range_start, range_end)
+
+    workers = min(max_concurrency, len(ranges), pool.max_size)
+    if workers <= 1:
+        return [run(range_start, range_end) for range_start, range_end in ranges]
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="slice") as executor:
+        futures = [executor.submit(run, range_start, range_end) for range_start, range_end in ranges]
+        try:
+            return [future.result() for future in futures]
+        except Exception:
+            for future in futures:
+                future.cancel()
+            raise
+
+
+# Run fetch_fn(name) for every name concurrently and yield (name, frame, error)
+# in completion order, so callers can show each result as soon as it lands
+def fetch_each(names, fetch_fn, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+    names = list(names)
+    if not names:
+        return
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(names))),
+                            thread_name_prefix="source") as executor:
+        futures = {executor.submit(fetch_fn, name): name for name in names}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], None, e
+
+
+# One frame with a leading source column, in the order of names
+def merge_sources(frames_by_name, names, column=SOURCE_COLUMN):
+    parts = []
+    for name in names:
+        df = frames_by_name.get(name)
+        if df is not None:
+            parts.append(df.assign(**{column: name})[[column] + [col for col in df.columns if col != column]])
+    return concat_frames(parts)
@@ -0,0 +1,100 @@
+# Per-stage timings for the fetch/export hot path, with p50/p95 over recent runs
+import cProfile
+import io
+import pstats
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+DEFAULT_HISTORY = 200
+
+# Display order for the panel; unknown stages are listed after these
+STAGE_ORDER = ["connect", "execute", "transfer", "dataframe", "snapshot", "stream", "rename", "render",
+               "export_xlsx", "export_csv"]
+
+
+# Collects stage durations (seconds) for a single run
+class StageTimer:
+    def __init__(self):
+        self.durations = {}
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name, seconds):
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    @property
+    def total(self):
+        return sum(self.durations.values())
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[rank]
+
+
+# Ring buffer of recent runs shared by all sessions
+class TimingStore:
+    def __init__(self, history=DEFAULT_HISTORY):
+        self._runs = deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    def record(self, durations):
+        if durations:
+            with self._lock:
+                self._runs.append(dict(durations))
+
+    # Rows of {stage, runs, p50_ms, p95_ms, last_ms}
+    def summary(self):
+        with self._lock:
+            runs = list(self._runs)
+        by_stage = {}
+        for run in runs:
+            for name, seconds in run.items():
+                by_stage.setdefault(name, []).append(seconds)
+        names = [n for n in STAGE_ORDER if n in by_stage] + sorted(n for n in by_stage if n not in STAGE_ORDER)
+        return [
+            {
+                "stage": name,
+                "runs": len(by_stage[name]),
+                "p50_ms": round(1000 * percentile(by_stage[name], 50), 1),
+                "p95_ms": round(1000 * percentile(by_stage[name], 95), 1),
+                "last_ms": round(1000 * by_stage[name][-1], 1),
+            }
+            for name in names
+        ]
+
+
+# cProfile wrapper that returns the top functions by cumulative time as text
+class RunProfiler:
+    def __init__(self):
+        self._profile = cProfile.Profile()
+
+    def start(self):
+        self._profile.enable()
+
+    def stop(self):
+        self._profile.disable()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def report(self, limit=30):
+        out = io.StringIO()
+        pstats.Stats(self._profile, stream=out).sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
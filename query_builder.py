@@ -0,0 +1,81 @@
+# Builds the OUTSTANDINGLISTING_NEW statement with ? placeholders.
+# Only the whitelisted filter fragments are ever spliced into the text, so the
+# number of distinct statements is fixed and SQL Server can reuse cached plans
+# no matter which dates or account codes are requested.
+
+OUTSTANDING_QUERY_TEMPLATE = """
+SELECT
+    acc4 INST_Code,
+    tr.Company as Institute_Name,
+    HTPersonName HT_Person,
+    personName Related_Person,
+    tr.Id INVOICE_NO,
+    format(refDate,'dd-MMM-yyyy') as INV_Date,
+    format(AmtPayable,'N2') NET_AMT,
+    format(AmtReceived,'N2') RECVD_AMT,
+    format(SUM(AmtPayable - AmtReceived),'N2') AS Balance,
+    remarks REMARKS,
+    DATEDIFF(DAY, refDate, GETDATE()) AS Day_Passed,
+    CASE
+        WHEN TR.CR_Days = 0 THEN DAYs
+        ELSE TR.CR_Days
+    END AS Day_LIMIT
+FROM
+    OUTSTANDINGLISTING_NEW(?, ?, ?, ?, ?) AS TR
+LEFT JOIN
+    M_PARTY ON TR.ACC4 = M_PARTY.Id
+WHERE
+    ReportType = 'Sales Invoices'
+        {invoice_filter} {payment_filter}
+GROUP BY
+    refDate,acc4, tr.Company, HTPersonName, personName, tr.Id, AmtPayable, AmtReceived, remarks,
+    creditLimit, Days,TR.CR_Days
+"""
+
+# Same statement returning raw datetime/decimal columns; display formatting is
+# applied at render/export time instead of by FORMAT() on every row
+TYPED_OUTSTANDING_QUERY_TEMPLATE = (
+    OUTSTANDING_QUERY_TEMPLATE
+    .replace("format(refDate,'dd-MMM-yyyy') as INV_Date", "refDate as INV_Date")
+    .replace("format(AmtPayable,'N2') NET_AMT", "AmtPayable NET_AMT")
+    .replace("format(AmtReceived,'N2') RECVD_AMT", "AmtReceived RECVD_AMT")
+    .replace("format(SUM(AmtPayable - AmtReceived),'N2') AS Balance", "SUM(AmtPayable - AmtReceived) AS Balance")
+)
+
+
+class UnknownFilterError(ValueError):
+    pass
+
+
+# Holds the allowed filter fragments, keyed by the labels shown in the UI
+class OutstandingQueryBuilder:
+    def __init__(self, invoice_filters, payment_filters, template=OUTSTANDING_QUERY_TEMPLATE,
+                 typed_template=TYPED_OUTSTANDING_QUERY_TEMPLATE):
+        self.invoice_filters = dict(invoice_filters)
+        self.payment_filters = dict(payment_filters)
+        self.template = template
+        self.typed_template = typed_template
+
+    # Returns (sql, params) ready for cursor.execute(sql, params)
+    def build(self, start_date_str, end_date_str, invoice_type="All", payment_terms="All",
+              acc1="", acc2="", acc3="", typed=False):
+        if invoice_type not in self.invoice_filters:
+            raise UnknownFilterError(f"Unknown invoice type: {invoice_type}")
+        if payment_terms not in self.payment_filters:
+            raise UnknownFilterError(f"Unknown payment terms: {payment_terms}")
+        template = self.typed_template if typed else self.template
+        sql = template.format(
+            invoice_filter=self.invoice_filters[invoice_type],
+            payment_filter=self.payment_filters[payment_terms]
+        )
+        params = [start_date_str, end_date_str, acc1, acc2, acc3]
+        return sql, params
+
+    # Every statement text this builder can produce
+    def statement_variants(self):
+        return {
+            template.format(invoice_filter=inv, payment_filter=pay)
+            for template in (self.template, self.typed_template)
+            for inv in self.invoice_filters.values()
+            for pay in self.payment_filters.values()
+        }
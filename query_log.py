@@ -0,0 +1,83 @@
+# Structured, non-blocking query log.
+# Records are handed to a QueueHandler and written by a QueueListener thread, so
+# the Streamlit script never waits on file I/O. Setup happens once per process:
+# this module stays in sys.modules across reruns, unlike the app script itself.
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import tempfile
+import threading
+from datetime import datetime, timezone
+
+LOGGER_NAME = "sql_to_excel.query"
+DEFAULT_LOG_FILE = os.path.join(tempfile.gettempdir(), "sql_to_excel_query_log.log")
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 5
+
+_setup_lock = threading.Lock()
+_listener = None
+
+
+# One JSON object per line; structured fields passed via log_event are merged in
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "event": getattr(record, "event", "message"),
+            "message": record.getMessage(),
+        }
+        payload.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+def _file_handler(path):
+    # QUERY_LOG_ROTATE_WHEN (e.g. "midnight", "H") switches from size- to time-based rotation
+    when = os.getenv("QUERY_LOG_ROTATE_WHEN", "")
+    backups = int(os.getenv("QUERY_LOG_BACKUP_COUNT", str(DEFAULT_BACKUP_COUNT)))
+    if when:
+        return logging.handlers.TimedRotatingFileHandler(path, when=when, backupCount=backups, encoding="utf-8")
+    max_bytes = int(os.getenv("QUERY_LOG_MAX_BYTES", str(DEFAULT_MAX_BYTES)))
+    return logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+
+
+# Return the query logger, attaching handlers the first time only
+def get_query_logger():
+    global _listener
+    logger = logging.getLogger(LOGGER_NAME)
+    with _setup_lock:
+        if _listener is not None:
+            return logger
+
+        level = getattr(logging, os.getenv("QUERY_LOG_LEVEL", "INFO").upper(), logging.INFO)
+        logger.setLevel(level)
+        logger.propagate = False
+
+        handlers = []
+        try:
+            file_handler = _file_handler(os.getenv("QUERY_LOG_FILE", "") or DEFAULT_LOG_FILE)
+            file_handler.setFormatter(JsonFormatter())
+            handlers.append(file_handler)
+        except OSError as e:
+            print(f"Query log file unavailable, logging to console only: {e}")
+        console_handler = logging.StreamHandler()
+        console_handler.setLevel(logging.INFO)
+        console_handler.setFormatter(logging.Formatter('%(asctime)s | %(levelname)s | %(message)s'))
+        handlers.append(console_handler)
+
+        log_queue = queue.SimpleQueue()
+        logger.handlers = [logging.handlers.QueueHandler(log_queue)]
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+    return logger
+
+
+# Log a structured event, e.g. log_event(logger, "fetch", rows=10, fetch_seconds=1.2)
+def log_event(logger, event, message="", level=logging.INFO, **fields):
+    logger.log(level, message or event, extra={"event": event, "fields": fields})
@@ -0,0 +1,63 @@
+# Database list, whitelisted filter fragments and connection strings, read from
+# the environment. Shared by the Streamlit app and the headless report runner.
+import os
+
+
+def database_selection():
+    return {
+        os.getenv("DB1_NAME", "Pharma Solution"): os.getenv("DB1_VALUE", "PS_TRADE"),
+        os.getenv("DB2_NAME", "Hussain Trader"): os.getenv("DB2_VALUE", "Pharma_solution")
+    }
+
+
+def invoice_type_filters():
+    return {
+        "All": "",
+        "Remaining": os.getenv("INVOICE_REMAINING", "AND DATEDIFF(DAY, refDate, GETDATE()) < DAYs"),
+        "Over Credit": os.getenv("INVOICE_OVER_CREDIT", "AND DATEDIFF(DAY, refDate, GETDATE()) > DAYs"),
+        "No Credit": os.getenv("INVOICE_NO_CREDIT", "AND TR.PaymentTerms = 'No Credit'"),
+        "Removed Remaining": os.getenv("INVOICE_REMOVED_REMAINING", "AND NOT DATEDIFF(DAY, refDate, GETDATE()) < DAYs"),
+        "Remove Over Credit": os.getenv("INVOICE_REMOVED_OVER_CREDIT", "AND NOT DATEDIFF(DAY, refDate, GETDATE()) > DAYs"),
+        "Remove No Credit": os.getenv("INVOICE_REMOVED_NO_CREDIT", "AND NOT TR.PaymentTerms = 'No Credit'")
+    }
+
+
+def payment_terms_filters():
+    return {
+        "All": "",
+        "Cash": os.getenv("PAYMENT_CASH", "AND TR.Terms = 'CASH'"),
+        "Cheque": os.getenv("PAYMENT_CHEQUE", "AND TR.Terms = 'cheque'")
+    }
+
+
+# (first, last) product codes passed to OUTSTANDINGLISTING_NEW
+def product_code_range():
+    return os.getenv("FIRST_PRODUCT_CODE", "0001"), os.getenv("LAST_PRODUCT_CODE", "989801")
+
+
+def connection_string(server, database, username, password):
+    return (
+        f"DRIVER={{SQL Server}};"
+        f"SERVER={server};"
+        f"DATABASE={database};"
+        f"UID={username};"
+        f"PWD={password};"
+    )
+
+
+# pyodbc is only imported once a query actually runs, keeping it (and the ODBC
+# driver manager) off the startup path. query_timeout (seconds, 0 = none) makes
+# the driver cancel any statement on this connection that runs longer.
+def odbc_connect(conn_str, query_timeout=0):
+    import pyodbc
+
+    conn = pyodbc.connect(conn_str)
+    if query_timeout:
+        conn.timeout = query_timeout
+    return conn
+
+
+def odbc_errors():
+    import pyodbc
+
+    return pyodbc.Error
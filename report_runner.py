@@ -0,0 +1,324 @@
+# Headless report runner: the same parameterized query and streaming exports
+# as the app, driven by a YAML job file and run without Streamlit.
+#
+#   python report_runner.py jobs.yaml [--workers 4] [--output-dir reports] [--dry-run]
+#
+# Job file:
+#
+#   defaults:
+#     format: xlsx            # or csv
+#     typed: true
+#     output_dir: reports
+#     file_name: "{name}_{database}_{run_date:%Y%m%d}.{format}"
+#   jobs:
+#     - name: outstanding
+#       databases: [Pharma Solution, Hussain Trader]   # or database: <name>
+#       start_date: month_start                        # YYYY-MM-DD, today, yesterday,
+#       end_date: today                                # today-30, month_start
+#       invoice_type: Over Credit
+#       payment_terms: All
+#       summaries: true                                # xlsx: add summary sheets after the rows
+#     - name: aging_totals
+#       summary_only: true                             # xlsx: GROUP BY on the server, totals only
+#
+# Database names are the labels from DB1_NAME/DB2_NAME (or the raw database
+# names). Connection settings come from SQL_SERVER, SQL_USER and SQL_PASSWORD.
+import argparse
+import logging
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+
+import yaml
+from dotenv import load_dotenv
+
+from excel_export import write_excel, write_excel_sheets
+from query_builder import OutstandingQueryBuilder
+from query_log import get_query_logger, log_event
+from report_config import (connection_string, database_selection, invoice_type_filters, odbc_connect,
+                           payment_terms_filters, product_code_range)
+from sql_fetch import (DATE_CSV_FORMAT, DEFAULT_BATCH_SIZE, coerce_typed_columns, display_columns, fetch_batches,
+                       typed_excel_formats, write_csv)
+from summaries import (SUMMARY_KINDS, SummaryAccumulator, fetch_summaries, summary_excel_formats, summary_sections,
+                       summary_statement)
+
+DEFAULT_WORKERS = 4
+DEFAULT_FILE_NAME = "{name}_{database}_{run_date:%Y%m%d}.{format}"
+FORMATS = ("xlsx", "csv")
+
+_RELATIVE_DATE = re.compile(r"^today\s*([+-])\s*(\d+)$")
+
+
+class JobFileError(ValueError):
+    pass
+
+
+# Dates in job files: YAML dates, ISO strings, or today / yesterday / today-N / month_start
+def resolve_date(value, today=None):
+    today = today or date.today()
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = str(value).strip().lower()
+    if text == "today":
+        return today
+    if text == "yesterday":
+        return today - timedelta(days=1)
+    if text == "month_start":
+        return today.replace(day=1)
+    match = _RELATIVE_DATE.match(text)
+    if match:
+        days = int(match.group(2))
+        return today + timedelta(days=days if match.group(1) == "+" else -days)
+    try:
+        return datetime.strptime(text, "%Y-%m-%d").date()
+    except ValueError:
+        raise JobFileError(f"Unrecognised date: {value!r}") from None
+
+
+class ReportJob:
+    def __init__(self, name, database, label, start_date, end_date, invoice_type="All", payment_terms="All",
+                 typed=False, fmt="xlsx", output_dir=".", file_name=DEFAULT_FILE_NAME,
+                 batch_size=DEFAULT_BATCH_SIZE, excel_backend="auto", summaries=False, summary_only=False):
+        self.name = name
+        self.database = database
+        self.label = label
+        self.start_date = start_date
+        self.end_date = end_date
+        self.invoice_type = invoice_type
+        self.payment_terms = payment_terms
+        self.typed = typed
+        self.format = fmt
+        self.output_dir = output_dir
+        self.file_name = file_name
+        self.batch_size = batch_size
+        self.excel_backend = excel_backend
+        self.summaries = summaries
+        self.summary_only = summary_only
+
+    @property
+    def output_path(self):
+        safe_label = re.sub(r"[^\w.-]+", "_", self.label)
+        name = self.file_name.format(name=self.name, database=safe_label, start_date=self.start_date,
+                                     end_date=self.end_date, run_date=date.today(), format=self.format)
+        return os.path.join(self.output_dir, name)
+
+
+# Expand a parsed job file into one ReportJob per (job, database)
+def parse_jobs(spec, output_dir=None, today=None):
+    if not isinstance(spec, dict) or not isinstance(spec.get("jobs"), list):
+        raise JobFileError("Job file needs a top-level 'jobs' list")
+    databases = database_selection()
+    by_name = {db.lower(): (label, db) for label, db in databases.items()}
+    by_name.update({label.lower(): (label, db) for label, db in databases.items()})
+    defaults = spec.get("defaults") or {}
+    invoice_filters = invoice_type_filters()
+    payment_filters = payment_terms_filters()
+
+    jobs = []
+    for i, entry in enumerate(spec["jobs"]):
+        entry = {**defaults, **(entry or {})}
+        name = str(entry.get("name") or f"job{i + 1}")
+        targets = entry.get("databases") or ([entry["database"]] if entry.get("database") else list(databases))
+        fmt = str(entry.get("format", "xlsx")).lower()
+        if fmt not in FORMATS:
+            raise JobFileError(f"{name}: format must be one of {FORMATS}")
+        invoice_type = entry.get("invoice_type", "All")
+        payment_terms = entry.get("payment_terms", "All")
+        if invoice_type not in invoice_filters:
+            raise JobFileError(f"{name}: unknown invoice_type {invoice_type!r}")
+        if payment_terms not in payment_filters:
+            raise JobFileError(f"{name}: unknown payment_terms {payment_terms!r}")
+        summaries = bool(entry.get("summaries", False))
+        summary_only = bool(entry.get("summary_only", False))
+        if (summaries or summary_only) and fmt != "xlsx":
+            raise JobFileError(f"{name}: summaries need format xlsx")
+        start_date = resolve_date(entry.get("start_date", "today"), today)
+        end_date = resolve_date(entry.get("end_date", "today"), today)
+        if start_date > end_date:
+            raise JobFileError(f"{name}: start_date is after end_date")
+        for target in targets:
+            if str(target).lower() not in by_name:
+                raise JobFileError(f"{name}: unknown database {target!r}")
+            label, db = by_name[str(target).lower()]
+            jobs.append(ReportJob(
+                name, db, label, start_date, end_date, invoice_type, payment_terms,
+                typed=bool(entry.get("typed", False)), fmt=fmt,
+                output_dir=output_dir or entry.get("output_dir", "."),
+                file_name=entry.get("file_name", DEFAULT_FILE_NAME),
+                batch_size=int(entry.get("batch_size", DEFAULT_BATCH_SIZE)),
+                excel_backend=entry.get("excel_backend", "auto"),
+                summaries=summaries, summary_only=summary_only
+            ))
+    return jobs
+
+
+def load_jobs(path, output_dir=None):
+    with open(path, encoding="utf-8") as f:
+        return parse_jobs(yaml.safe_load(f), output_dir=output_dir)
+
+
+# Positional arguments of OutstandingQueryBuilder.build for job
+def query_args(job):
+    first_code, last_code = product_code_range()
+    return (job.start_date.strftime("%d-%b-%Y"), job.end_date.strftime("%d-%b-%Y"), job.invoice_type,
+            job.payment_terms, "", first_code, last_code)
+
+
+def build_query(job, builder=None):
+    builder = builder or OutstandingQueryBuilder(invoice_type_filters(), payment_terms_filters())
+    return builder.build(*query_args(job), typed=job.typed)
+
+
+def _renamed_batches(cursor, job):
+    for batch in fetch_batches(cursor, job.batch_size):
+        if job.typed:
+            coerce_typed_columns(batch)
+        batch.columns = display_columns(batch.columns)
+        yield batch
+
+
+# Run one job on conn, streaming batches straight into the output file.
+# The file appears under its final name only once it is complete.
+def run_job(job, conn, builder=None):
+    builder = builder or OutstandingQueryBuilder(invoice_type_filters(), payment_terms_filters())
+    query, params = build_query(job, builder)
+    os.makedirs(job.output_dir or ".", exist_ok=True)
+    path = job.output_path
+    part_path = f"{path}.part"
+    if job.summary_only:
+        # Only the grouped totals leave the server
+        try:
+            with open(part_path, "wb") as f:
+                rows = write_excel_sheets(summary_sections(fetch_summaries(conn, builder, *query_args(job))), f,
+                                          backend=job.excel_backend, column_formats=summary_excel_formats())
+            os.replace(part_path, path)
+        except Exception:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise
+        return {"path": path, "rows": rows, "bytes": os.path.getsize(path)}
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query, params)
+        columns = display_columns([col[0] for col in cursor.description])
+        if job.format == "xlsx" and job.summaries:
+            # Summaries are folded from the same batches as they are written
+            accumulator = SummaryAccumulator()
+            column_formats = {**summary_excel_formats(), **(typed_excel_formats() if job.typed else {})}
+
+            def sections():
+                yield "Sheet1", columns, accumulator.feed(_renamed_batches(cursor, job))
+                yield from summary_sections(accumulator.result())
+
+            with open(part_path, "wb") as f:
+                write_excel_sheets(sections(), f, backend=job.excel_backend, column_formats=column_formats)
+            rows = accumulator.rows
+        elif job.format == "xlsx":
+            with open(part_path, "wb") as f:
+                rows = write_excel(_renamed_batches(cursor, job), f, columns=columns, backend=job.excel_backend,
+                                   column_formats=typed_excel_formats() if job.typed else None)
+        else:
+            rows = write_csv(_renamed_batches(cursor, job), part_path, columns=columns,
+                             date_format=DATE_CSV_FORMAT if job.typed else None)
+        os.replace(part_path, path)
+    except Exception:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    finally:
+        cursor.close()
+    return {"path": path, "rows": rows, "bytes": os.path.getsize(path)}
+
+
+def default_connect(database):
+    return odbc_connect(connection_string(os.getenv("SQL_SERVER", ""), database,
+                                          os.getenv("SQL_USER", ""), os.getenv("SQL_PASSWORD", "")),
+                        query_timeout=int(os.getenv("QUERY_TIMEOUT_SECONDS", "0")))
+
+
+# Run jobs concurrently (one connection per running job) and return
+# [(job, result or None, error or None)] in completion order
+def run_jobs(jobs, workers=DEFAULT_WORKERS, connect=default_connect, logger=None, on_done=None):
+    builder = OutstandingQueryBuilder(invoice_type_filters(), payment_terms_filters())
+
+    def run(job):
+        started = time.perf_counter()
+        conn = connect(job.database)
+        try:
+            result = run_job(job, conn, builder)
+        finally:
+            conn.close()
+        result["seconds"] = round(time.perf_counter() - started, 3)
+        return result
+
+    outcomes = []
+    if not jobs:
+        return outcomes
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(jobs))), thread_name_prefix="report") as executor:
+        futures = {executor.submit(run, job): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                result, error = future.result(), None
+            except Exception as e:
+                result, error = None, e
+            if logger is not None:
+                fields = {"job": job.name, "database": job.database, "start_date": str(job.start_date),
+                          "end_date": str(job.end_date), "format": job.format}
+                if error is None:
+                    log_event(logger, "batch_export", **fields, **result)
+                else:
+                    log_event(logger, "batch_export_error", f"{job.name} failed: {error}", level=logging.ERROR,
+                              **fields)
+            outcomes.append((job, result, error))
+            if on_done is not None:
+                on_done(job, result, error)
+    return outcomes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run outstanding-report exports from a YAML job file")
+    parser.add_argument("jobs", help="path to the YAML job file")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="jobs to run at the same time")
+    parser.add_argument("--output-dir", default=None, help="overrides output_dir from the job file")
+    parser.add_argument("--dry-run", action="store_true", help="print the statements and output paths only")
+    args = parser.parse_args(argv)
+
+    if os.path.exists(".env"):
+        load_dotenv()
+    try:
+        jobs = load_jobs(args.jobs, output_dir=args.output_dir)
+    except (OSError, yaml.YAMLError, JobFileError) as e:
+        print(f"Could not load jobs: {e}", file=sys.stderr)
+        return 2
+
+    if args.dry_run:
+        builder = OutstandingQueryBuilder(invoice_type_filters(), payment_terms_filters())
+        for job in jobs:
+            if job.summary_only:
+                statements = [summary_statement(builder, kind, *query_args(job)) for kind in SUMMARY_KINDS]
+            else:
+                statements = [build_query(job, builder)]
+            print(f"-- {job.name} [{job.label}] -> {job.output_path}")
+            for query, params in statements:
+                print(f"-- params: {params}")
+                print(query.strip())
+        return 0
+
+    def report(job, result, error):
+        if error is None:
+            print(f"OK   {job.name} [{job.label}] {result['rows']:,} rows -> {result['path']} ({result['seconds']}s)")
+        else:
+            print(f"FAIL {job.name} [{job.label}]: {error}", file=sys.stderr)
+
+    outcomes = run_jobs(jobs, workers=args.workers, logger=get_query_logger(), on_done=report)
+    return 1 if any(error is not None for _, _, error in outcomes) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+# Process-wide cache of query results shared by every Streamlit session
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_TTL_SECONDS = 600
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+# Build a cache key from the query parameters, ignoring case and stray whitespace
+def make_cache_key(database, start_date_str, end_date_str, invoice_type, payment_terms, acc1="", acc2="", acc3="",
+                   typed=False):
+    def norm(value):
+        return " ".join(str(value or "").split()).lower()
+
+    return tuple(norm(v) for v in (database, start_date_str, end_date_str, invoice_type,
+                                   payment_terms, acc1, acc2, acc3)) + (bool(typed),)
+
+
+# Rough in-memory size of a DataFrame, counting object columns deeply
+def frame_nbytes(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+# TTL + LRU cache bounded by total DataFrame memory
+class ResultCache:
+    def __init__(self, ttl_seconds=DEFAULT_TTL_SECONDS, max_bytes=DEFAULT_MAX_BYTES):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (stored_at, nbytes, df)
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        return self.get_first([key])
+
+    # First live entry among keys, e.g. either flavour of the same rows. The whole
+    # lookup counts as one hit or one miss, however many keys were tried.
+    def get_first(self, keys):
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                stored_at, nbytes, df = entry
+                if time.time() - stored_at > self.ttl_seconds:
+                    self._remove(key)
+                    continue
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return df
+            self.misses += 1
+            return None
+
+    def put(self, key, df):
+        nbytes = frame_nbytes(df)
+        # A single result bigger than the whole cache is not worth keeping
+        if nbytes > self.max_bytes:
+            return False
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.time(), nbytes, df)
+            self.total_bytes += nbytes
+            while self.total_bytes > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+        return True
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self.total_bytes = 0
+            elif key in self._entries:
+                self._remove(key)
+
+    def _remove(self, key):
+        _, nbytes, _ = self._entries.pop(key)
+        self.total_bytes -= nbytes
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,114 @@
+# Paginated results viewer: only the visible page is sent to the browser,
+# while sorting and filtering run server-side over the cached DataFrame.
+import re
+
+import pandas as pd
+import streamlit as st
+
+PAGE_SIZES = [25, 50, 100, 250, 500]
+DEFAULT_PAGE_SIZE = 100
+
+_COMPARISON = re.compile(r"^\s*(>=|<=|>|<|=)\s*(-?[\d,]*\.?\d+)\s*$")
+
+
+# Case-insensitive "contains" on text columns; numeric columns also accept ">1000", "<=5" or "=0"
+def filter_mask(series, text):
+    match = _COMPARISON.match(text)
+    if match and pd.api.types.is_numeric_dtype(series):
+        op, value = match.group(1), float(match.group(2).replace(",", ""))
+        return {
+            ">=": series >= value,
+            "<=": series <= value,
+            ">": series > value,
+            "<": series < value,
+            "=": series == value,
+        }[op]
+    return series.astype(str).str.contains(text, case=False, regex=False, na=False)
+
+
+# Row positions of the filtered/sorted view, so the frame itself is never copied
+def view_positions(df, filter_column=None, filter_text="", sort_column=None, ascending=True):
+    positions = pd.RangeIndex(len(df))
+    if filter_column and filter_text:
+        mask = filter_mask(df[filter_column], filter_text).to_numpy()
+        positions = positions[mask]
+    if sort_column:
+        keys = df[sort_column].iloc[positions]
+        order = keys.reset_index(drop=True).sort_values(ascending=ascending, kind="stable", na_position="last").index
+        positions = positions[order]
+    return positions
+
+
+def page_count(total_rows, page_size):
+    return max(1, -(-total_rows // page_size))
+
+
+# Render a DataFrame one page at a time. key must be unique per grid on the page.
+def render_results_grid(df, key, column_config=None):
+    columns = list(df.columns)
+    col1, col2, col3, col4 = st.columns([2, 3, 2, 1])
+    with col1:
+        filter_column = st.selectbox("Filter column", ["(none)"] + columns, key=f"{key}_filter_col")
+    with col2:
+        filter_text = st.text_input("Filter value", key=f"{key}_filter_text",
+                                    help="Text match, or >, <, >=, <=, = for numeric columns")
+    with col3:
+        sort_column = st.selectbox("Sort by", ["(none)"] + columns, key=f"{key}_sort_col")
+    with col4:
+        ascending = st.radio("Order", ["Asc", "Desc"], key=f"{key}_sort_dir") == "Asc"
+
+    filter_column = None if filter_column == "(none)" else filter_column
+    sort_column = None if sort_column == "(none)" else sort_column
+
+    # Re-sorting a large frame on every rerun is wasteful; keep the last view per grid
+    view_key = (id(df), len(df), filter_column, filter_text, sort_column, ascending)
+    cached = st.session_state.get(f"{key}_view")
+    if cached is not None and cached[0] == view_key:
+        positions = cached[1]
+    else:
+        try:
+            positions = view_positions(df, filter_column, filter_text, sort_column, ascending)
+        except Exception as e:
+            st.warning(f"Could not apply filter/sort: {e}")
+            positions = pd.RangeIndex(len(df))
+        st.session_state[f"{key}_view"] = (view_key, positions)
+
+    total = len(positions)
+    col1, col2, col3 = st.columns([1, 1, 3])
+    with col1:
+        page_size = st.selectbox("Rows per page", PAGE_SIZES, index=PAGE_SIZES.index(DEFAULT_PAGE_SIZE),
+                                 key=f"{key}_page_size")
+    pages = page_count(total, page_size)
+    with col2:
+        page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1,
+                               key=f"{key}_page")
+    start = (min(page, pages) - 1) * page_size
+    end = min(start + page_size, total)
+    with col3:
+        st.write("")
+        if total < len(df):
+            st.caption(f"Showing {start + 1 if total else 0:,}–{end:,} of {total:,} matching rows "
+                       f"(filtered from {len(df):,})")
+        else:
+            st.caption(f"Showing {start + 1 if total else 0:,}–{end:,} of {total:,} rows")
+
+    st.dataframe(df.iloc[positions[start:end]], column_config=column_config, use_container_width=True)
+
+
+# Page through a streamed result on disk; sorting/filtering would need the full set in memory
+def render_spool_grid(spool, key, column_config=None):
+    col1, col2, col3 = st.columns([1, 1, 3])
+    with col1:
+        page_size = st.selectbox("Rows per page", PAGE_SIZES, index=PAGE_SIZES.index(DEFAULT_PAGE_SIZE),
+                                 key=f"{key}_page_size")
+    pages = page_count(spool.row_count, page_size)
+    with col2:
+        page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1,
+                               key=f"{key}_page")
+    start = (min(page, pages) - 1) * page_size
+    end = min(start + page_size, spool.row_count)
+    with col3:
+        st.write("")
+        st.caption(f"Showing {start + 1 if spool.row_count else 0:,}–{end:,} of {spool.row_count:,} rows "
+                   "(streamed results can be paged but not sorted or filtered)")
+    st.dataframe(spool.read_rows(start, end), column_config=column_config, use_container_width=True)
@@ -0,0 +1,155 @@
+# On-disk snapshots of fetched results in Arrow IPC format.
+# Each snapshot is <id>.arrow plus <id>.json holding the query parameters and
+# fetch time. Snapshots are reloaded through a memory map, so column buffers
+# come straight from the page cache instead of being read and parsed again;
+# numeric columns without nulls convert to pandas without a further copy.
+# The store is pruned by age and total size whenever a snapshot is saved.
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+import pyarrow as pa
+
+DEFAULT_SNAPSHOT_DIR = os.path.join(tempfile.gettempdir(), "sql_to_excel_snapshots")
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024
+DEFAULT_MAX_AGE_SECONDS = 7 * 24 * 3600
+
+
+def snapshot_id(key):
+    return hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+
+
+class SnapshotStore:
+    def __init__(self, directory=DEFAULT_SNAPSHOT_DIR, max_bytes=DEFAULT_MAX_BYTES,
+                 max_age_seconds=DEFAULT_MAX_AGE_SECONDS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.prune()
+
+    def _paths(self, sid):
+        base = os.path.join(self.directory, sid)
+        return base + ".arrow", base + ".json"
+
+    # key is the result cache key; fields are the human-readable query parameters
+    def save(self, key, df, fields=None):
+        sid = snapshot_id(key)
+        data_path, meta_path = self._paths(sid)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        # Write under a temporary name so readers never see a partial file
+        tmp_path = f"{data_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with pa.OSFile(tmp_path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        meta = {
+            "id": sid,
+            "fields": fields or {},
+            "fetched_at": time.time(),
+            "rows": table.num_rows,
+            "bytes": os.path.getsize(tmp_path),
+        }
+        with self._lock:
+            os.replace(tmp_path, data_path)
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump(meta, f, default=str)
+        self.prune()
+        return meta
+
+    def load_id(self, sid):
+        data_path, meta_path = self._paths(sid)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            source = pa.memory_map(data_path, "r")
+            table = pa.ipc.open_file(source).read_all()
+        except (OSError, ValueError, pa.ArrowInvalid):
+            return None
+        return table.to_pandas(split_blocks=True), meta
+
+    # (DataFrame, meta) for key, or None if there is no snapshot younger than max_age
+    def load(self, key, max_age=None):
+        meta = self.meta(snapshot_id(key))
+        if meta is None or (max_age is not None and time.time() - meta["fetched_at"] > max_age):
+            return None
+        return self.load_id(meta["id"])
+
+    def meta(self, sid):
+        try:
+            with open(self._paths(sid)[1], encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    # Metadata of every snapshot, newest first
+    def list(self):
+        snapshots = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                meta = self.meta(name[:-len(".json")])
+                if meta is not None and os.path.exists(self._paths(meta["id"])[0]):
+                    snapshots.append(meta)
+        return sorted(snapshots, key=lambda meta: meta["fetched_at"], reverse=True)
+
+    def remove(self, sid):
+        with self._lock:
+            for path in self._paths(sid):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    # Drop snapshots past max_age_seconds, then the oldest until under max_bytes.
+    # Open memory maps keep working after removal on POSIX; on Windows the
+    # remove fails and is retried on the next prune.
+    def prune(self):
+        now = time.time()
+        total = 0
+        keep = []
+        removed = 0
+        for meta in self.list():
+            if now - meta["fetched_at"] > self.max_age_seconds:
+                removed += self._try_remove(meta["id"])
+            else:
+                keep.append(meta)
+                total += meta["bytes"]
+        while keep and total > self.max_bytes:
+            meta = keep.pop()
+            total -= meta["bytes"]
+            removed += self._try_remove(meta["id"])
+        self._remove_orphans()
+        return removed
+
+    def _try_remove(self, sid):
+        try:
+            self.remove(sid)
+            return 1
+        except OSError:
+            return 0
+
+    # Data files without metadata (e.g. an interrupted save)
+    def _remove_orphans(self):
+        with self._lock:
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                try:
+                    if name.endswith(".tmp"):
+                        orphan = time.time() - os.path.getmtime(path) > 3600
+                    else:
+                        orphan = name.endswith(".arrow") and not os.path.exists(path[:-len(".arrow")] + ".json")
+                    if orphan:
+                        os.remove(path)
+                except OSError:
+                    pass
+
+    def stats(self):
+        snapshots = self.list()
+        return {
+            "snapshots": len(snapshots),
+            "bytes": sum(meta["bytes"] for meta in snapshots),
+            "rows": sum(meta["rows"] for meta in snapshots),
+        }
@@ -0,0 +1,183 @@
+# Helpers for pulling query results off a pyodbc cursor in batches
+import os
+import pickle
+import tempfile
+import weakref
+
+import pandas as pd
+
+DEFAULT_BATCH_SIZE = 5000
+PREVIEW_ROWS = 100
+
+# Columns returned raw by the typed query, by their SQL alias
+TYPED_AMOUNT_COLUMNS = ["NET_AMT", "RECVD_AMT", "Balance"]
+TYPED_DATE_COLUMNS = ["INV_Date"]
+AMOUNT_EXCEL_FORMAT = "#,##0.00"
+DATE_EXCEL_FORMAT = "dd-mmm-yyyy"
+DATE_CSV_FORMAT = "%d-%b-%Y"
+
+
+# Turn SQL column aliases like "Institute_Name" into "Institute Name"
+def display_columns(columns):
+    return [col.replace("_", " ").title() for col in columns]
+
+
+# pyodbc hands back decimal.Decimal objects; turn typed columns into float64/datetime64
+def coerce_typed_columns(df):
+    for col in df.columns:
+        if col in TYPED_AMOUNT_COLUMNS:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("float64")
+        elif col in TYPED_DATE_COLUMNS:
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+    return df
+
+
+# Excel number formats for the typed columns, keyed by display name
+def typed_excel_formats():
+    formats = {name: AMOUNT_EXCEL_FORMAT for name in display_columns(TYPED_AMOUNT_COLUMNS)}
+    formats.update({name: DATE_EXCEL_FORMAT for name in display_columns(TYPED_DATE_COLUMNS)})
+    return formats
+
+
+# pyodbc Row objects -> DataFrame; coerce_float matches what pd.read_sql does with Decimals
+def rows_to_frame(rows, columns):
+    return pd.DataFrame.from_records([tuple(row) for row in rows], columns=columns, coerce_float=True)
+
+
+# Run query on conn and return the whole result as a DataFrame.
+# on_cursor(cursor) is called before executing, e.g. to register cursor.cancel.
+def fetch_frame(conn, query, params, typed=False, on_cursor=None):
+    cursor = conn.cursor()
+    if on_cursor is not None:
+        on_cursor(cursor)
+    try:
+        cursor.execute(query, params)
+        columns = [col[0] for col in cursor.description]
+        df = rows_to_frame(cursor.fetchall(), columns)
+    finally:
+        cursor.close()
+    if typed:
+        coerce_typed_columns(df)
+    return df
+
+
+# Concatenate partial results in order. Empty parts are skipped because their
+# all-object columns would otherwise widen the dtypes of the real rows.
+def concat_frames(frames):
+    frames = list(frames)
+    non_empty = [df for df in frames if len(df)]
+    if not non_empty:
+        return frames[0] if frames else pd.DataFrame()
+    if len(non_empty) == 1:
+        return non_empty[0]
+    return pd.concat(non_empty, ignore_index=True)
+
+
+# Yield DataFrames of at most batch_size rows from an executed cursor
+def fetch_batches(cursor, batch_size=DEFAULT_BATCH_SIZE):
+    columns = [col[0] for col in cursor.description]
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        yield rows_to_frame(rows, columns)
+
+
+# Write an iterable of DataFrame chunks to a CSV file at path, with a header
+# row even when there are no rows. Returns the number of data rows written.
+def write_csv(chunks, path, columns=None, date_format=None):
+    rows = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        header = True
+        for chunk in chunks:
+            chunk.to_csv(f, index=False, header=header, date_format=date_format)
+            header = False
+            rows += len(chunk)
+        if header:
+            pd.DataFrame(columns=list(columns or [])).to_csv(f, index=False)
+    return rows
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+# Disk-backed holder for a streamed result set.
+# Only the first PREVIEW_ROWS rows stay in memory; every batch is appended to a
+# temp file so the session never holds the whole result at once. The file is
+# removed on close(), or once the spool is garbage collected (e.g. with the
+# session state of a closed browser tab) or the process exits.
+class ResultSpool:
+    def __init__(self, preview_rows=PREVIEW_ROWS):
+        fd, self.path = tempfile.mkstemp(prefix="sql_spool_", suffix=".pkl")
+        os.close(fd)
+        self._finalizer = weakref.finalize(self, _remove_file, self.path)
+        self.preview_rows = preview_rows
+        self.preview = None
+        self.columns = []
+        self.row_count = 0
+        self.batch_count = 0
+
+    def append(self, batch):
+        if self.preview is None:
+            self.columns = list(batch.columns)
+            self.preview = batch.head(self.preview_rows).copy()
+        elif len(self.preview) < self.preview_rows:
+            missing = self.preview_rows - len(self.preview)
+            self.preview = pd.concat([self.preview, batch.head(missing)], ignore_index=True)
+        with open(self.path, "ab") as f:
+            pickle.dump(batch, f, protocol=pickle.HIGHEST_PROTOCOL)
+        self.row_count += len(batch)
+        self.batch_count += 1
+
+    # Read the spooled batches back one at a time
+    def iter_batches(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            while True:
+                try:
+                    yield pickle.load(f)
+                except EOFError:
+                    break
+
+    # Rows [start, stop) of the spooled result, reading only as far as needed
+    def read_rows(self, start, stop):
+        parts = []
+        offset = 0
+        for batch in self.iter_batches():
+            batch_end = offset + len(batch)
+            if batch_end > start:
+                parts.append(batch.iloc[max(start - offset, 0):max(stop - offset, 0)])
+            offset = batch_end
+            if offset >= stop:
+                break
+        if not parts:
+            return pd.DataFrame(columns=self.columns)
+        return pd.concat(parts, ignore_index=True)
+
+    def close(self):
+        self._finalizer()
+
+
+# Stream a cursor into a ResultSpool, calling on_batch(spool, batch) after each batch
+def stream_to_spool(cursor, batch_size=DEFAULT_BATCH_SIZE, on_batch=None, rename=True, typed=False):
+    spool = ResultSpool()
+    columns = [col[0] for col in cursor.description]
+    spool.columns = display_columns(columns) if rename else columns
+    try:
+        for batch in fetch_batches(cursor, batch_size):
+            if typed:
+                coerce_typed_columns(batch)
+            if rename:
+                batch.columns = display_columns(batch.columns)
+            spool.append(batch)
+            if on_batch is not None:
+                on_batch(spool, batch)
+    except Exception:
+        spool.close()
+        raise
+    return spool
@@ -0,0 +1,241 @@
+# Summary views of the outstanding report: balance by institute, aging buckets
+# (days past the credit limit, Day_Passed - Day_LIMIT) and totals by HT person.
+# Fetched rows are reduced with vectorized groupby/NumPy ops one chunk at a
+# time, so a spooled result never has to be loaded whole. When no rows are at
+# hand, the same aggregations run on SQL Server as GROUP BY statements over the
+# typed report query and only the summary rows come back.
+import numpy as np
+import pandas as pd
+
+from parallel_fetch import SOURCE_COLUMN
+from sql_fetch import AMOUNT_EXCEL_FORMAT, display_columns, fetch_frame
+
+SUMMARY_KINDS = ["institute", "aging", "ht_person"]
+SUMMARY_SHEETS = {
+    "institute": "Summary by Institute",
+    "aging": "Aging",
+    "ht_person": "Summary by HT Person",
+}
+
+# (upper bound of days past the limit, label); the last bucket is open-ended.
+# Rows without a credit limit land in UNKNOWN_BUCKET.
+AGING_BUCKETS = [
+    (0, "Within limit"),
+    (30, "1-30 days over"),
+    (60, "31-60 days over"),
+    (90, "61-90 days over"),
+    (None, "Over 90 days"),
+]
+UNKNOWN_BUCKET = "No credit limit"
+
+SUMMARY_AMOUNT_COLUMNS = ["Net Amt", "Recvd Amt", "Balance", "Overdue Balance"]
+SHARE_COLUMN = "Balance Share %"
+
+_GROUP_KEYS = {
+    "institute": ["Inst Code", "Institute Name"],
+    "aging": ["Aging Bucket"],
+    "ht_person": ["Ht Person"],
+}
+# Output column -> (input column, partial aggregation, combining aggregation)
+_METRICS = {
+    "Invoices": ("Balance", "size", "sum"),
+    "Net Amt": ("Net Amt", "sum", "sum"),
+    "Recvd Amt": ("Recvd Amt", "sum", "sum"),
+    "Balance": ("Balance", "sum", "sum"),
+    "Overdue Balance": ("Overdue Balance", "sum", "sum"),
+    "Max Day Passed": ("Day Passed", "max", "max"),
+}
+_KIND_METRICS = {
+    "institute": ["Invoices", "Net Amt", "Recvd Amt", "Balance", "Overdue Balance", "Max Day Passed"],
+    "aging": ["Invoices", "Balance"],
+    "ht_person": ["Invoices", "Net Amt", "Recvd Amt", "Balance", "Overdue Balance"],
+}
+# Partials are folded together once this many pile up
+_COMPACT_EVERY = 32
+
+
+# Excel number formats for the summary sheets, keyed by column name
+def summary_excel_formats():
+    formats = {name: AMOUNT_EXCEL_FORMAT for name in SUMMARY_AMOUNT_COLUMNS}
+    formats[SHARE_COLUMN] = "0.0"
+    return formats
+
+
+# Amounts come back as floats from the typed query and as 'N2' text ("1,234.56") otherwise
+def _amounts(values):
+    if values.dtype == object:
+        values = values.astype(str).str.replace(",", "", regex=False)
+    return pd.to_numeric(values, errors="coerce")
+
+
+# Aging bucket label for every row, from days past the credit limit (NaN = no limit)
+def aging_buckets(days_over):
+    days_over = np.asarray(days_over, dtype="float64")
+    conditions = []
+    labels = []
+    for upper, label in AGING_BUCKETS:
+        conditions.append(~np.isnan(days_over) if upper is None else days_over <= upper)
+        labels.append(label)
+    return np.select(conditions, labels, default=UNKNOWN_BUCKET)
+
+
+# The columns every summary needs, numeric and under display names
+def _prepare(frame):
+    frame = frame.set_axis(display_columns(frame.columns), axis=1)
+    prepared = pd.DataFrame(index=frame.index)
+    for col in ["Inst Code", "Institute Name", "Ht Person", SOURCE_COLUMN]:
+        if col in frame.columns:
+            prepared[col] = frame[col]
+    for col in ["Net Amt", "Recvd Amt", "Balance"]:
+        prepared[col] = _amounts(frame[col])
+    passed = pd.to_numeric(frame["Day Passed"], errors="coerce")
+    days_over = (passed - pd.to_numeric(frame["Day Limit"], errors="coerce")).to_numpy(dtype="float64")
+    prepared["Day Passed"] = passed
+    prepared["Overdue Balance"] = np.where(days_over > 0, prepared["Balance"].to_numpy(dtype="float64"), 0.0)
+    prepared["Aging Bucket"] = aging_buckets(days_over)
+    return prepared
+
+
+def _keys(frame, kind):
+    keys = _GROUP_KEYS[kind]
+    return [SOURCE_COLUMN] + keys if SOURCE_COLUMN in frame.columns else keys
+
+
+def _aggregate(frame, kind, step):
+    spec = {}
+    for name in _KIND_METRICS[kind]:
+        column, partial, combine = _METRICS[name]
+        spec[name] = (column, partial) if step == "partial" else (name, combine)
+    return frame.groupby(_keys(frame, kind), sort=False, dropna=False).agg(**spec).reset_index()
+
+
+# Sort, round and add the derived columns of a combined summary
+def _finish(summary, kind):
+    if kind == "aging":
+        order = {label: i for i, (_, label) in enumerate(AGING_BUCKETS)}
+        order[UNKNOWN_BUCKET] = len(order)
+        keys = _keys(summary, kind)
+        summary = (summary.assign(_order=summary["Aging Bucket"].map(order))
+                   .sort_values(keys[:-1] + ["_order"]).drop(columns="_order"))
+        if len(keys) > 1:
+            totals = summary.groupby(keys[:-1])["Balance"].transform("sum")
+        else:
+            totals = pd.Series(summary["Balance"].sum(), index=summary.index)
+        summary[SHARE_COLUMN] = (summary["Balance"] / totals * 100).where(totals != 0, 0.0)
+    else:
+        summary = summary.sort_values("Balance", ascending=False)
+    summary["Invoices"] = summary["Invoices"].astype("int64")
+    amount_columns = [col for col in SUMMARY_AMOUNT_COLUMNS + [SHARE_COLUMN] if col in summary.columns]
+    summary[amount_columns] = summary[amount_columns].round(2)
+    return summary.reset_index(drop=True)
+
+
+# Folds fetched chunks into partial aggregates as they stream past.
+# add() takes rows under SQL or display names; result() returns {kind: DataFrame}.
+class SummaryAccumulator:
+    def __init__(self, kinds=SUMMARY_KINDS):
+        self.kinds = list(kinds)
+        self.rows = 0
+        self._partials = {kind: [] for kind in self.kinds}
+
+    def add(self, chunk):
+        if len(chunk) == 0:
+            return
+        prepared = _prepare(chunk)
+        self.rows += len(prepared)
+        for kind in self.kinds:
+            parts = self._partials[kind]
+            parts.append(_aggregate(prepared, kind, "partial"))
+            if len(parts) >= _COMPACT_EVERY:
+                self._partials[kind] = [_aggregate(pd.concat(parts, ignore_index=True), kind, "combine")]
+
+    # Wraps an iterable of chunks, adding each one as it is consumed
+    def feed(self, chunks):
+        for chunk in chunks:
+            self.add(chunk)
+            yield chunk
+
+    def result(self):
+        summaries = {}
+        for kind in self.kinds:
+            parts = self._partials[kind]
+            if parts:
+                combined = _aggregate(pd.concat(parts, ignore_index=True), kind, "combine")
+            else:
+                combined = pd.DataFrame(columns=_GROUP_KEYS[kind] + _KIND_METRICS[kind])
+            summaries[kind] = _finish(combined, kind)
+        return summaries
+
+
+# Summaries of an iterable of row chunks (a single DataFrame works too)
+def summarize(chunks, kinds=SUMMARY_KINDS):
+    if isinstance(chunks, pd.DataFrame):
+        chunks = [chunks]
+    accumulator = SummaryAccumulator(kinds)
+    for chunk in chunks:
+        accumulator.add(chunk)
+    return accumulator.result()
+
+
+# The typed report rows with the overdue amount and aging bucket worked out per row
+_SUMMARY_SOURCE = """
+SELECT R.*,
+    CASE WHEN R.Day_Passed - R.Day_LIMIT > 0 THEN R.Balance ELSE 0 END AS Overdue_Balance,
+    {aging_case} AS Aging_Bucket
+FROM ({report}) AS R
+"""
+
+_SQL_KEYS = {
+    "institute": ["INST_Code", "Institute_Name"],
+    "aging": ["Aging_Bucket"],
+    "ht_person": ["HT_Person"],
+}
+_SQL_METRICS = {
+    "Invoices": "COUNT(*) AS Invoices",
+    "Net Amt": "SUM(S.NET_AMT) AS NET_AMT",
+    "Recvd Amt": "SUM(S.RECVD_AMT) AS RECVD_AMT",
+    "Balance": "SUM(S.Balance) AS Balance",
+    "Overdue Balance": "SUM(S.Overdue_Balance) AS Overdue_Balance",
+    "Max Day Passed": "MAX(S.Day_Passed) AS Max_Day_Passed",
+}
+
+
+def _aging_case():
+    whens = []
+    lower = None
+    for upper, label in AGING_BUCKETS:
+        condition = "R.Day_Passed - R.Day_LIMIT " + (f"<= {upper}" if upper is not None else f"> {lower}")
+        whens.append(f"WHEN {condition} THEN '{label}'")
+        lower = upper
+    return f"CASE {' '.join(whens)} ELSE '{UNKNOWN_BUCKET}' END"
+
+
+# GROUP BY statement for one summary kind over the report query built by
+# builder; build_args are the usual builder.build arguments (dates, filters, codes)
+def summary_statement(builder, kind, *build_args):
+    report, params = builder.build(*build_args, typed=True)
+    keys = ", ".join(f"S.{col}" for col in _SQL_KEYS[kind])
+    metrics = ",\n    ".join(_SQL_METRICS[name] for name in _KIND_METRICS[kind])
+    sql = (f"SELECT {keys},\n    {metrics}\n"
+           f"FROM ({_SUMMARY_SOURCE.format(aging_case=_aging_case(), report=report)}) AS S\n"
+           f"GROUP BY {keys}")
+    return sql, params
+
+
+# Run the pushed-down summaries on conn; returns {kind: DataFrame} shaped like summarize()
+def fetch_summaries(conn, builder, *build_args, kinds=SUMMARY_KINDS, on_cursor=None):
+    summaries = {}
+    for kind in kinds:
+        sql, params = summary_statement(builder, kind, *build_args)
+        summary = fetch_frame(conn, sql, params, on_cursor=on_cursor)
+        summary = summary.set_axis(display_columns(summary.columns), axis=1)
+        for name in _KIND_METRICS[kind]:
+            summary[name] = pd.to_numeric(summary[name], errors="coerce").astype("float64")
+        summaries[kind] = _finish(summary, kind)
+    return summaries
+
+
+# (sheet name, columns, chunks) sections for write_excel_sheets
+def summary_sections(summaries):
+    for kind, summary in summaries.items():
+        yield SUMMARY_SHEETS[kind], list(summary.columns), [summary]
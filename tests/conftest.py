@@ -0,0 +1,10 @@
+# Tests import the app's flat modules and the benchmark stand-in database
+# straight from the checkout. The query log goes to a scratch directory so a
+# test run never writes into the working tree.
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "benchmarks")]
+os.environ["QUERY_LOG_FILE"] = os.path.join(tempfile.mkdtemp(prefix="sql_to_excel_tests_"), "query_log.log")
@@ -0,0 +1,134 @@
+import threading
+
+import pytest
+
+from admission import (ACTIVE, CANCELLED, RELEASED, WAITING, AdmissionCancelled, AdmissionController,
+                       AdmissionTimeout)
+
+
+def test_admits_up_to_max_active():
+    controller = AdmissionController(max_active=2, max_per_user=5)
+    tickets = [controller.request("alice", "fetch") for _ in range(3)]
+    assert [t.state for t in tickets] == [ACTIVE, ACTIVE, WAITING]
+    assert tickets[2].position == 1
+    tickets[0].release()
+    assert tickets[2].state == ACTIVE
+    assert tickets[2].position == 0
+
+
+def test_per_user_limit_lets_other_users_through():
+    controller = AdmissionController(max_active=4, max_per_user=1)
+    first = controller.request("alice", "fetch")
+    second = controller.request("alice", "fetch")
+    other = controller.request("bob", "fetch")
+    assert (first.state, second.state, other.state) == (ACTIVE, WAITING, ACTIVE)
+    first.release()
+    assert second.state == ACTIVE
+
+
+def test_user_with_fewest_running_goes_first():
+    controller = AdmissionController(max_active=2, max_per_user=2)
+    alice_1 = controller.request("alice", "fetch")
+    alice_2 = controller.request("alice", "fetch")
+    alice_3 = controller.request("alice", "fetch")
+    bob = controller.request("bob", "fetch")
+    assert bob.position == 1 and alice_3.position == 2
+    alice_1.release()
+    assert bob.state == ACTIVE
+    assert alice_3.state == WAITING
+    alice_2.release()
+    assert alice_3.state == ACTIVE
+
+
+def test_newer_request_from_same_owner_supersedes_waiting_one():
+    controller = AdmissionController(max_active=1, max_per_user=1)
+    blocker = controller.request("bob", "fetch", owner="tab-b")
+    old = controller.request("alice", "fetch", owner="tab-a")
+    new = controller.request("alice", "fetch", owner="tab-a")
+    assert old.state == CANCELLED
+    with pytest.raises(AdmissionCancelled):
+        old.wait(timeout=0)
+    blocker.release()
+    assert new.state == ACTIVE
+
+
+def test_superseding_a_running_request_calls_cancel_and_keeps_its_slot():
+    controller = AdmissionController(max_active=4, max_per_user=1)
+    old = controller.request("alice", "fetch", owner="tab-a")
+    cancelled = []
+    old.add_cancel_callback(lambda: cancelled.append("cursor.cancel"))
+    new = controller.request("alice", "fetch", owner="tab-a")
+    assert cancelled == ["cursor.cancel"]
+    assert old.state == CANCELLED
+    # The cancelled query still counts against the user until SQL Server has stopped it
+    assert new.state == WAITING
+    assert controller.stats()["active"] == 1
+    old.release()
+    assert new.state == ACTIVE
+
+
+def test_cancelled_running_request_counts_against_max_active():
+    controller = AdmissionController(max_active=1, max_per_user=5)
+    old = controller.request("alice", "fetch", owner="tab-a")
+    new = controller.request("alice", "fetch", owner="tab-a")
+    other = controller.request("bob", "fetch", owner="tab-b")
+    assert old.state == CANCELLED
+    assert (new.state, other.state) == (WAITING, WAITING)
+    old.release()
+    assert new.state == ACTIVE
+
+
+def test_other_owners_and_kinds_are_not_superseded():
+    controller = AdmissionController(max_active=4, max_per_user=4)
+    fetch = controller.request("alice", "fetch", owner="tab-a")
+    summary = controller.request("alice", "summary", owner="tab-a")
+    other_tab = controller.request("alice", "fetch", owner="tab-b")
+    no_owner = controller.request("alice", "fetch")
+    assert [t.state for t in (fetch, summary, other_tab, no_owner)] == [ACTIVE] * 4
+
+
+def test_callback_added_after_cancel_runs_immediately():
+    controller = AdmissionController()
+    ticket = controller.request("alice", "fetch")
+    controller.cancel(ticket)
+    called = []
+    ticket.add_cancel_callback(lambda: called.append(True))
+    assert called == [True]
+
+
+def test_wait_returns_false_on_timeout_and_true_once_admitted():
+    controller = AdmissionController(max_active=1, max_wait_seconds=0)
+    first = controller.request("alice", "fetch")
+    second = controller.request("bob", "fetch")
+    assert second.wait(timeout=0.01) is False
+    threading.Timer(0.05, first.release).start()
+    assert second.wait(timeout=5) is True
+
+
+def test_wait_gives_up_after_max_wait_seconds():
+    controller = AdmissionController(max_active=1, max_wait_seconds=0.05)
+    controller.request("alice", "fetch")
+    waiting = controller.request("bob", "fetch")
+    with pytest.raises(AdmissionTimeout):
+        waiting.wait()
+    assert waiting.state == CANCELLED
+    assert controller.stats()["waiting"] == 0
+    assert controller.stats()["timed_out"] == 1
+
+
+def test_release_as_context_manager():
+    controller = AdmissionController(max_active=1)
+    with controller.request("alice", "fetch") as ticket:
+        assert ticket.state == ACTIVE
+    assert ticket.state == RELEASED
+    assert controller.stats()["active"] == 0
+
+
+def test_on_admit_runs_when_a_slot_frees_up():
+    controller = AdmissionController(max_active=1)
+    admitted = []
+    first = controller.request("alice", "export", on_admit=admitted.append)
+    second = controller.request("bob", "export", on_admit=admitted.append)
+    assert admitted == [first]
+    first.release()
+    assert admitted == [first, second]
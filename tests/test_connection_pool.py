@@ -0,0 +1,126 @@
+import threading
+import time
+
+import pytest
+
+from connection_pool import ConnectionPool, PoolRegistry, PoolTimeout
+
+
+class FakeConnection:
+    def __init__(self, number):
+        self.number = number
+        self.closed = False
+        self.healthy = True
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(**kwargs):
+    made = []
+
+    def connect():
+        conn = FakeConnection(len(made))
+        made.append(conn)
+        return conn
+
+    kwargs.setdefault("health_check", lambda conn: conn.healthy)
+    return ConnectionPool(connect, **kwargs), made
+
+
+def test_released_connection_is_reused():
+    pool, made = make_pool(max_size=2)
+    conn = pool.acquire()
+    pool.release(conn)
+    assert pool.acquire() is conn
+    assert len(made) == 1
+    assert pool.stats()["checkouts"] == 2
+
+
+def test_checkout_times_out_when_exhausted():
+    pool, _ = make_pool(max_size=1, checkout_timeout=0.05)
+    pool.acquire()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+
+
+def test_waiting_checkout_gets_released_connection():
+    pool, made = make_pool(max_size=1, checkout_timeout=5)
+    conn = pool.acquire()
+    threading.Timer(0.05, pool.release, args=(conn,)).start()
+    assert pool.acquire() is conn
+    assert len(made) == 1
+    assert pool.stats()["max_wait_ms"] > 0
+
+
+def test_unhealthy_connection_is_replaced():
+    pool, made = make_pool()
+    conn = pool.acquire()
+    pool.release(conn)
+    conn.healthy = False
+    replacement = pool.acquire()
+    assert replacement is not conn
+    assert conn.closed
+    assert pool.stats()["discarded"] == 1
+
+
+def test_failed_query_discards_connection():
+    pool, _ = make_pool()
+    with pytest.raises(ValueError):
+        with pool.connection() as conn:
+            raise ValueError("query failed")
+    assert conn.closed
+    assert pool.stats()["idle"] == 0
+    assert pool.stats()["in_use"] == 0
+
+
+def test_connect_error_frees_the_slot():
+    def connect():
+        raise OSError("login failed")
+
+    pool = ConnectionPool(connect, max_size=1, checkout_timeout=0.05)
+    for _ in range(2):
+        with pytest.raises(OSError):
+            pool.acquire()
+    assert pool.stats()["in_use"] == 0
+
+
+def test_warm_opens_min_size_connections():
+    pool, made = make_pool(min_size=2, max_size=5)
+    pool.warm()
+    assert len(made) == 2
+    assert pool.stats()["idle"] == 2
+    pool.warm()
+    assert len(made) == 2
+
+
+def test_evict_idle_keeps_min_size():
+    pool, made = make_pool(min_size=1, max_size=3, idle_seconds=0)
+    conns = [pool.acquire() for _ in range(3)]
+    for conn in conns:
+        pool.release(conn)
+    time.sleep(0.01)
+    pool.evict_idle()
+    assert pool.stats()["idle"] == 1
+    assert sum(conn.closed for conn in made) == 2
+
+
+def test_closed_pool_rejects_checkout_and_closes_returns():
+    pool, _ = make_pool()
+    conn = pool.acquire()
+    pool.close()
+    pool.release(conn)
+    assert conn.closed
+    with pytest.raises(RuntimeError):
+        pool.acquire()
+
+
+def test_registry_keeps_one_pool_per_database():
+    registry = PoolRegistry(reap_seconds=0, min_size=0)
+    try:
+        first = registry.get("PS_TRADE", lambda: FakeConnection(0))
+        assert registry.get("PS_TRADE", lambda: FakeConnection(1)) is first
+        assert registry.get("Pharma_solution", lambda: FakeConnection(2)) is not first
+        assert set(registry.stats()) == {"PS_TRADE", "Pharma_solution"}
+    finally:
+        registry.close_all()
@@ -0,0 +1,90 @@
+from datetime import date, timedelta
+
+import pandas as pd
+
+from delta_fetch import IncrementalResultCache, is_date_relative, make_filter_key
+
+TODAY = date(2025, 6, 30)
+KEY = make_filter_key("PS_TRADE", "", "", acc2="0001", acc3="989801", typed=True)
+OVER_CREDIT_KEY = make_filter_key("PS_TRADE", "AND DATEDIFF(DAY, refDate, GETDATE()) > DAYs", "", typed=True)
+
+
+# One invoice per day, like a typed fetch of start..end
+def day_rows(start, end, today):
+    days = pd.date_range(start, end)
+    return pd.DataFrame({
+        "INV_Date": days,
+        "Balance": [float(day.day) for day in days],
+        "Day_Passed": [(today - day.date()).days for day in days],
+    })
+
+
+class Source:
+    def __init__(self, today):
+        self.today = today
+        self.calls = []
+
+    def __call__(self, ranges):
+        self.calls.append(list(ranges))
+        return [day_rows(start, end, self.today) for start, end in ranges]
+
+
+def test_second_fetch_only_queries_uncovered_days():
+    cache = IncrementalResultCache(volatile_days=0)
+    source = Source(TODAY)
+    cache.fetch(KEY, date(2025, 5, 1), date(2025, 5, 31), source, today=TODAY)
+    df, plan = cache.fetch(KEY, date(2025, 5, 20), date(2025, 6, 10), source, today=TODAY)
+    assert source.calls[-1] == [(date(2025, 6, 1), date(2025, 6, 10))]
+    assert len(plan.cached_days) == 12
+    assert plan.missing_days == 10
+    assert list(df["INV_Date"].dt.date) == [date(2025, 5, 20) + timedelta(days=i) for i in range(22)]
+
+
+def test_recent_days_are_always_queried():
+    cache = IncrementalResultCache(volatile_days=7)
+    source = Source(TODAY)
+    cache.fetch(KEY, date(2025, 6, 1), date(2025, 6, 30), source, today=TODAY)
+    plan = cache.plan(KEY, date(2025, 6, 1), date(2025, 6, 30), today=TODAY)
+    assert plan.missing_ranges == [(date(2025, 6, 23), date(2025, 6, 30))]
+
+
+def test_expired_days_are_queried_again():
+    cache = IncrementalResultCache(volatile_days=0, ttl_seconds=-1)
+    source = Source(TODAY)
+    cache.fetch(KEY, date(2025, 5, 1), date(2025, 5, 10), source, today=TODAY)
+    plan = cache.plan(KEY, date(2025, 5, 1), date(2025, 5, 10), today=TODAY)
+    assert plan.missing_days == 10
+
+
+def test_cached_day_passed_moves_on_with_the_date():
+    cache = IncrementalResultCache(volatile_days=0)
+    cache.fetch(KEY, date(2025, 5, 1), date(2025, 5, 10), Source(TODAY), today=TODAY)
+    tomorrow = TODAY + timedelta(days=1)
+    df, plan = cache.fetch(KEY, date(2025, 5, 1), date(2025, 5, 10), Source(tomorrow), today=tomorrow)
+    assert plan.missing_days == 0
+    assert list(df["Day_Passed"]) == list(day_rows(date(2025, 5, 1), date(2025, 5, 10), tomorrow)["Day_Passed"])
+
+
+def test_getdate_filters_are_only_reused_on_the_same_day():
+    assert is_date_relative(OVER_CREDIT_KEY)
+    assert not is_date_relative(KEY)
+    cache = IncrementalResultCache(volatile_days=0)
+    cache.fetch(OVER_CREDIT_KEY, date(2025, 5, 1), date(2025, 5, 10), Source(TODAY), today=TODAY)
+    assert cache.plan(OVER_CREDIT_KEY, date(2025, 5, 1), date(2025, 5, 10), today=TODAY).missing_days == 0
+    tomorrow = TODAY + timedelta(days=1)
+    assert cache.plan(OVER_CREDIT_KEY, date(2025, 5, 1), date(2025, 5, 10), today=tomorrow).missing_days == 10
+
+
+def test_filter_keys_are_kept_apart():
+    cache = IncrementalResultCache(volatile_days=0)
+    cache.fetch(KEY, date(2025, 5, 1), date(2025, 5, 10), Source(TODAY), today=TODAY)
+    other = make_filter_key("Pharma_solution", "", "", acc2="0001", acc3="989801", typed=True)
+    assert cache.plan(other, date(2025, 5, 1), date(2025, 5, 10), today=TODAY).missing_days == 10
+    cache.invalidate(KEY)
+    assert cache.plan(KEY, date(2025, 5, 1), date(2025, 5, 10), today=TODAY).missing_days == 10
+
+
+def test_eviction_keeps_within_max_bytes():
+    cache = IncrementalResultCache(volatile_days=0, max_bytes=1)
+    cache.fetch(KEY, date(2025, 5, 1), date(2025, 5, 10), Source(TODAY), today=TODAY)
+    assert cache.stats()["segments"] == 0
@@ -0,0 +1,37 @@
+import io
+
+import pandas as pd
+import pytest
+
+from excel_export import XlsxWriterStreamingWriter, available_backends, frame_chunks, write_excel, write_excel_sheets
+
+
+@pytest.mark.parametrize("backend", available_backends())
+def test_rows_past_the_limit_roll_over_to_new_sheets(backend):
+    df = pd.DataFrame({"n": range(10), "name": [f"r{i}" for i in range(10)]})
+    out = io.BytesIO()
+    # Four rows per sheet is the header plus three data rows
+    rows = write_excel(frame_chunks(df, chunk_rows=4), out, backend=backend, sheet_name="Data", max_rows_per_sheet=4)
+    sheets = pd.read_excel(io.BytesIO(out.getvalue()), sheet_name=None)
+    assert rows == 10
+    assert list(sheets) == ["Data", "Data_2", "Data_3", "Data_4"]
+    assert [len(sheet) for sheet in sheets.values()] == [3, 3, 3, 1]
+    pd.testing.assert_frame_equal(pd.concat(sheets.values(), ignore_index=True), df)
+
+
+@pytest.mark.parametrize("backend", available_backends())
+def test_split_sheet_names_stay_unique_across_sections(backend):
+    out = io.BytesIO()
+    write_excel_sheets([("Data", None, frame_chunks(pd.DataFrame({"a": range(3)}))),
+                        ("Data_2", None, frame_chunks(pd.DataFrame({"b": [1]})))],
+                       out, backend=backend, max_rows_per_sheet=3)
+    sheets = pd.read_excel(io.BytesIO(out.getvalue()), sheet_name=None)
+    assert list(sheets) == ["Data", "Data_2", "Data_2_2"]
+    assert list(sheets["Data_2_2"].columns) == ["b"]
+
+
+def test_xlsxwriter_streams_into_file_objects():
+    pytest.importorskip("xlsxwriter")
+    writer = XlsxWriterStreamingWriter(io.BytesIO(), ["a"])
+    assert writer._wb.constant_memory
+    writer.close()
@@ -0,0 +1,82 @@
+import io
+import os
+import threading
+
+import pandas as pd
+
+from admission import AdmissionController
+from export_jobs import DONE, FAILED, QUEUED, ExportJobManager
+
+FRAME = pd.DataFrame({"Institute": ["a", "b", "a"], "Balance": [1.0, 2.0, 3.0]})
+
+
+class Finished:
+    def __init__(self):
+        self.jobs = []
+        self._event = threading.Event()
+
+    def __call__(self, job):
+        self.jobs.append(job)
+        self._event.set()
+
+    def wait(self):
+        assert self._event.wait(10)
+        self._event.clear()
+
+
+def test_csv_export_runs_to_done_and_expires(tmp_path):
+    manager = ExportJobManager(export_dir=str(tmp_path), ttl_seconds=-1)
+    finished = Finished()
+    job = manager.submit("tab-a", FRAME, "csv", "rows.csv", on_finish=finished)
+    finished.wait()
+    assert job.status == DONE and job.progress == 1.0
+    assert job.rows_written == 3 and job.bytes == os.path.getsize(job.path)
+    pd.testing.assert_frame_equal(pd.read_csv(io.BytesIO(manager.read(job))), FRAME)
+    path = job.path
+    assert manager.jobs_for("tab-a") == []
+    assert not os.path.exists(path)
+
+
+def test_excel_export_with_sheet_per_value(tmp_path):
+    manager = ExportJobManager(export_dir=str(tmp_path))
+    finished = Finished()
+    job = manager.submit("tab-a", FRAME, "xlsx", "rows.xlsx", sheet_column="Institute", on_finish=finished)
+    finished.wait()
+    assert job.status == DONE
+    sheets = pd.read_excel(job.path, sheet_name=None)
+    assert list(sheets) == ["a", "b"]
+    assert list(sheets["a"]["Balance"]) == [1.0, 3.0]
+    assert manager.jobs_for("tab-a") == [job] and manager.jobs_for("tab-b") == []
+
+
+def test_failed_export_leaves_no_file(tmp_path):
+    class GoneSpool:
+        path = str(tmp_path / "missing.parquet")
+        row_count = 3
+        columns = list(FRAME.columns)
+
+        def iter_batches(self):
+            yield FRAME
+
+    manager = ExportJobManager(export_dir=str(tmp_path / "exports"))
+    finished = Finished()
+    job = manager.submit("tab-a", GoneSpool(), "csv", "rows.csv", on_finish=finished)
+    finished.wait()
+    assert job.status == FAILED and "replaced" in job.error
+    assert os.listdir(manager.export_dir) == []
+
+
+def test_superseded_queued_export_never_runs(tmp_path):
+    admission = AdmissionController(max_active=1, max_per_user=1)
+    blocker = admission.request("bob", "export_csv")
+    manager = ExportJobManager(export_dir=str(tmp_path), admission=admission)
+    finished = Finished()
+    old = manager.submit("tab-a", FRAME, "csv", "old.csv", username="alice", on_finish=finished)
+    assert old.status == QUEUED and old.queue_position == 1
+    new = manager.submit("tab-a", FRAME, "csv", "new.csv", username="alice", on_finish=finished)
+    finished.wait()
+    assert finished.jobs == [old]
+    assert old.status == FAILED and old.started_at is None
+    blocker.release()
+    finished.wait()
+    assert new.status == DONE
@@ -0,0 +1,44 @@
+import codecs
+import io
+
+import pandas as pd
+import pytest
+
+from fast_readers import LEGACY_ENCODING, SNIFF_BYTES, downcast_frame, read_file, sniff_encoding
+
+TEXT = "Institute,Balance\nCafé Müller,12.5\nΣ Lab,3\n"
+
+
+@pytest.mark.parametrize("data, expected", [
+    (TEXT.encode("utf-8"), "utf-8"),
+    (codecs.BOM_UTF8 + TEXT.encode("utf-8"), "utf-8-sig"),
+    (TEXT.encode("utf-16"), "utf-16"),
+    (TEXT.replace("Σ", "S").encode(LEGACY_ENCODING), LEGACY_ENCODING),
+])
+def test_sniff_encoding(data, expected):
+    file = io.BytesIO(data)
+    assert sniff_encoding(file) == expected
+    assert file.tell() == 0
+
+
+def test_utf8_character_cut_off_by_the_sample_is_still_utf8():
+    data = b"a" * (SNIFF_BYTES - 1) + "é".encode("utf-8")
+    assert sniff_encoding(io.BytesIO(data)) == "utf-8"
+
+
+@pytest.mark.parametrize("backend", ["auto", "pandas"])
+def test_read_file_decodes_legacy_csv(backend):
+    data = "Institute,Balance\nCafé,1\n".encode(LEGACY_ENCODING)
+    df = read_file(io.BytesIO(data), ".csv", backend=backend)
+    assert list(df["Institute"]) == ["Café"]
+
+
+def test_downcast_shrinks_numbers_and_repetitive_text():
+    df = pd.DataFrame({"n": [1, 2, 3, 4], "x": [0.5, 1.5, 2.5, 3.5], "city": ["a", "a", "b", "a"],
+                       "id": ["p", "q", "r", "s"]})
+    small = downcast_frame(df)
+    assert str(small["n"].dtype) == "int8"
+    assert str(small["x"].dtype) == "float32"
+    assert str(small["city"].dtype) == "category"
+    assert small["id"].dtype == object
+    pd.testing.assert_frame_equal(small.astype(df.dtypes.to_dict()), df)
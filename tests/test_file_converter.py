@@ -0,0 +1,112 @@
+import io
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from file_converter import (PREVIEW_ROWS, StreamingDeduplicator, apply_spec, batch_convert, convert_streaming,
+                            make_process_pool, read_preview)
+
+SPEC = {"columns": None, "dedup": False, "fill_mean": False}
+
+
+def csv_bytes(df):
+    return df.to_csv(index=False).encode("utf-8")
+
+
+def test_batch_convert_keeps_same_named_uploads_apart():
+    files = [("data.csv", csv_bytes(pd.DataFrame({"a": [1]}))),
+             ("DATA.csv", csv_bytes(pd.DataFrame({"a": [2, 3]}))),
+             ("data.csv", csv_bytes(pd.DataFrame({"a": [4]})))]
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        data, out_name, mime, results = batch_convert(executor, files, SPEC, out_format="CSV")
+    assert set(results) == {"data.csv", "DATA (2).csv", "data (3).csv"}
+    assert [results[name]["rows"] for name in ("data.csv", "DATA (2).csv", "data (3).csv")] == [1, 2, 1]
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert zf.namelist() == ["data.csv", "DATA (2).csv", "data (3).csv"]
+        assert pd.read_csv(zf.open("DATA (2).csv"))["a"].tolist() == [2, 3]
+    assert out_name == "converted.zip" and mime == "application/zip"
+
+
+def test_batch_convert_records_per_file_errors():
+    files = [("good.csv", csv_bytes(pd.DataFrame({"a": [1, 1, None]}))), ("bad.txt", b"not a table")]
+    progress = []
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        data, _, _, results = batch_convert(executor, files, {**SPEC, "dedup": True}, out_format="CSV",
+                                            on_progress=lambda name, status, error: progress.append((name, status)))
+    assert "error" in results["bad.txt"]
+    assert results["good.csv"]["rows"] == 2
+    assert sorted(progress) == [("bad.txt", "failed"), ("good.csv", "done")]
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert zf.namelist() == ["good.csv"]
+
+
+def test_batch_convert_workbook_gets_one_sheet_per_file():
+    files = [("north.csv", csv_bytes(pd.DataFrame({"a": [1]}))), ("south.csv", csv_bytes(pd.DataFrame({"a": [2]})))]
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        data, out_name, _, _ = batch_convert(executor, files, SPEC, package="workbook")
+    assert out_name == "converted.xlsx"
+    assert list(pd.read_excel(io.BytesIO(data), sheet_name=None)) == ["north", "south"]
+
+
+def test_broken_process_pool_is_raised_not_recorded():
+    pool = make_process_pool(max_workers=1)
+    try:
+        with pytest.raises(BrokenProcessPool):
+            pool.submit(os._exit, 1).result()
+        with pytest.raises(BrokenProcessPool):
+            batch_convert(pool, [("a.csv", csv_bytes(pd.DataFrame({"a": [1]})))], SPEC, out_format="CSV")
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+# Duplicates cross chunk boundaries, and the gaps make "qty" int64 in some chunks and float64 in others
+def messy_frame():
+    rows = [{"id": i % 7, "qty": None if i % 5 == 0 else i % 3, "name": f"n{i % 4}"} for i in range(60)]
+    return pd.DataFrame(rows + rows[:10])
+
+
+@pytest.mark.parametrize("dedup, fill_mean", [(True, False), (False, True), (True, True)])
+def test_streaming_clean_matches_in_memory(tmp_path, dedup, fill_mean):
+    data = csv_bytes(messy_frame())
+    out_path = tmp_path / "out.csv"
+    result = convert_streaming(io.BytesIO(data), ".csv", str(out_path), "CSV", dedup=dedup, fill_mean=fill_mean,
+                               chunk_rows=8)
+    expected = apply_spec(pd.read_csv(io.BytesIO(data)), dedup=dedup, fill_mean=fill_mean).reset_index(drop=True)
+    streamed = pd.read_csv(out_path)
+    assert result["rows_written"] == len(expected)
+    pd.testing.assert_frame_equal(streamed, expected, check_dtype=False)
+
+
+def test_dedup_keeps_integers_apart_past_float_precision():
+    big = 2 ** 53
+    dedup = StreamingDeduplicator()
+    first = dedup(pd.DataFrame({"id": [big, big + 1]}))
+    second = dedup(pd.DataFrame({"id": [big + 1, big + 2]}))
+    assert list(first["id"]) == [big, big + 1]
+    assert list(second["id"]) == [big + 2]
+    assert dedup.dropped == 1
+
+
+def test_dedup_matches_int_and_float_chunks_of_the_same_rows():
+    dedup = StreamingDeduplicator()
+    dedup(pd.DataFrame({"qty": [1, 2]}))
+    assert list(dedup(pd.DataFrame({"qty": [2.0, np.nan, 2.5]}))["qty"].fillna(-1)) == [-1, 2.5]
+    assert dedup(pd.DataFrame({"qty": [np.nan]})).empty
+
+
+def test_hash_collision_does_not_drop_a_distinct_row(monkeypatch):
+    monkeypatch.setattr(StreamingDeduplicator, "_hash_rows", lambda self, chunk: np.zeros(len(chunk), dtype="uint64"))
+    dedup = StreamingDeduplicator()
+    kept = dedup(pd.DataFrame({"a": [1, 2, 1, 3], "b": ["x", "y", "x", None]}))
+    assert list(kept["a"]) == [1, 2, 3]
+    assert dedup.dropped == 1
+
+
+def test_read_preview_defaults_to_preview_rows():
+    data = csv_bytes(pd.DataFrame({"a": range(PREVIEW_ROWS + 5)}))
+    assert len(read_preview(io.BytesIO(data), ".csv")) == PREVIEW_ROWS
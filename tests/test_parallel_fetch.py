@@ -0,0 +1,104 @@
+import threading
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+from connection_pool import ConnectionPool
+from parallel_fetch import fetch_each, fetch_ranges_parallel, merge_sources, split_date_range
+from sql_fetch import concat_frames, fetch_frame
+from synthetic_outstanding import connect, create_database, sqlite_builder
+
+DAYS = 90
+
+
+@pytest.fixture(scope="module")
+def db_path(tmp_path_factory):
+    return create_database(4000, str(tmp_path_factory.mktemp("db") / "outstanding.sqlite"), days=DAYS, seed=2)
+
+
+def test_split_date_range_covers_every_day_once():
+    start, end = date(2025, 1, 1), date(2025, 1, 10)
+    ranges = split_date_range(start, end, 4)
+    assert ranges[0][0] == start and ranges[-1][1] == end
+    assert [(b - a).days + 1 for a, b in ranges] == [3, 3, 2, 2]
+    assert all(prev[1] + timedelta(days=1) == cur[0] for prev, cur in zip(ranges, ranges[1:]))
+    assert split_date_range(start, start, 8) == [(start, start)]
+    assert split_date_range(end, start) == []
+
+
+def test_sliced_fetch_matches_single_query(db_path):
+    builder = sqlite_builder()
+    end = date.today()
+    start = end - timedelta(days=DAYS - 1)
+
+    def fetch_range(conn, range_start, range_end):
+        sql, params = builder.build(range_start.strftime("%d-%b-%Y"), range_end.strftime("%d-%b-%Y"),
+                                    acc2="0001", acc3="989801", typed=True)
+        return fetch_frame(conn, sql, params, typed=True)
+
+    pool = ConnectionPool(lambda: connect(db_path), max_size=3)
+    with pool.connection() as conn:
+        single = fetch_range(conn, start, end)
+    sliced = concat_frames(fetch_ranges_parallel(pool, split_date_range(start, end, 6), fetch_range))
+    pool.close()
+
+    assert len(sliced) == len(single) > 0
+    assert sliced["Balance"].sum() == pytest.approx(single["Balance"].sum())
+    pd.testing.assert_frame_equal(sliced.sort_values("INVOICE_NO").reset_index(drop=True),
+                                  single.sort_values("INVOICE_NO").reset_index(drop=True))
+
+
+def test_parallel_fetches_sharing_a_pool_queue_instead_of_timing_out():
+    pool = ConnectionPool(object, max_size=2, checkout_timeout=0.01, health_check=lambda conn: True)
+    in_use = []
+    peak = []
+    lock = threading.Lock()
+
+    def fetch_range(conn, range_start, range_end):
+        with lock:
+            in_use.append(conn)
+            peak.append(len(in_use))
+        time.sleep(0.02)
+        with lock:
+            in_use.remove(conn)
+        return pd.DataFrame({"day": [range_start]})
+
+    ranges = split_date_range(date(2025, 1, 1), date(2025, 1, 8), 8)
+    results = []
+    fetches = [threading.Thread(target=lambda: results.append(fetch_ranges_parallel(pool, ranges, fetch_range)))
+               for _ in range(3)]
+    for thread in fetches:
+        thread.start()
+    for thread in fetches:
+        thread.join()
+    assert len(results) == 3
+    assert all(len(concat_frames(frames)) == 8 for frames in results)
+    assert max(peak) <= 2
+
+
+def test_first_failure_is_raised():
+    pool = ConnectionPool(object, max_size=4, health_check=lambda conn: True)
+
+    def fetch_range(conn, range_start, range_end):
+        if range_start.day == 3:
+            raise ValueError("slice failed")
+        return pd.DataFrame({"day": [range_start]})
+
+    with pytest.raises(ValueError):
+        fetch_ranges_parallel(pool, split_date_range(date(2025, 1, 1), date(2025, 1, 4), 4), fetch_range)
+    assert pool.stats()["in_use"] == 0
+
+
+def test_fetch_each_reports_errors_per_name_and_merge_keeps_order():
+    def fetch(name):
+        if name == "bad":
+            raise RuntimeError("down")
+        return pd.DataFrame({"value": [len(name)]})
+
+    results = {name: (frame, error) for name, frame, error in fetch_each(["a", "bad", "ccc"], fetch)}
+    assert isinstance(results["bad"][1], RuntimeError)
+    merged = merge_sources({name: frame for name, (frame, error) in results.items() if error is None}, ["ccc", "a"])
+    assert list(merged.columns) == ["Source", "value"]
+    assert list(merged["Source"]) == ["ccc", "a"]
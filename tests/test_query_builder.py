@@ -0,0 +1,40 @@
+import pytest
+
+from query_builder import OutstandingQueryBuilder, UnknownFilterError
+from report_config import invoice_type_filters, payment_terms_filters
+
+
+@pytest.fixture
+def builder():
+    return OutstandingQueryBuilder(invoice_type_filters(), payment_terms_filters())
+
+
+def test_values_are_parameters_not_statement_text(builder):
+    injected = "0001'; DROP TABLE M_PARTY; --"
+    sql, params = builder.build("01-Jan-2025", "31-Jan-2025", "Over Credit", "Cash", "", injected, "989801")
+    assert params == ["01-Jan-2025", "31-Jan-2025", "", injected, "989801"]
+    assert injected not in sql and "01-Jan-2025" not in sql
+    assert "OUTSTANDINGLISTING_NEW(?, ?, ?, ?, ?)" in sql
+    assert invoice_type_filters()["Over Credit"] in sql
+    assert payment_terms_filters()["Cash"] in sql
+
+
+def test_same_filters_give_the_same_statement(builder):
+    first, _ = builder.build("01-Jan-2025", "31-Jan-2025", "No Credit", "Cheque", "", "0001", "989801")
+    second, _ = builder.build("05-Mar-2024", "06-Mar-2024", "No Credit", "Cheque", "x", "0002", "5")
+    assert first == second
+    assert first in builder.statement_variants()
+
+
+def test_unknown_filters_are_rejected(builder):
+    with pytest.raises(UnknownFilterError):
+        builder.build("01-Jan-2025", "31-Jan-2025", "AND 1=1", "All")
+    with pytest.raises(UnknownFilterError):
+        builder.build("01-Jan-2025", "31-Jan-2025", "All", "Cash' OR '1'='1")
+
+
+def test_typed_statement_skips_format(builder):
+    formatted, _ = builder.build("01-Jan-2025", "31-Jan-2025")
+    typed, _ = builder.build("01-Jan-2025", "31-Jan-2025", typed=True)
+    assert "format(" in formatted and "format(" not in typed
+    assert len(builder.statement_variants()) == 2 * len(invoice_type_filters()) * len(payment_terms_filters())
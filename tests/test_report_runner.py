@@ -0,0 +1,97 @@
+import csv
+import os
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+from report_runner import JobFileError, ReportJob, parse_jobs, resolve_date, run_job, run_jobs
+from summaries import SUMMARY_SHEETS
+from synthetic_outstanding import connect, create_database, sqlite_builder
+
+TODAY = date(2025, 6, 18)
+DAYS = 60
+
+
+@pytest.fixture(scope="module")
+def db_path(tmp_path_factory):
+    return create_database(1500, str(tmp_path_factory.mktemp("db") / "outstanding.sqlite"), days=DAYS, seed=3)
+
+
+def make_job(tmp_path, **kwargs):
+    end = date.today()
+    return ReportJob("outstanding", "PS_TRADE", "Pharma Solution", end - timedelta(days=DAYS - 1), end,
+                     output_dir=str(tmp_path), **kwargs)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("today", TODAY), ("yesterday", date(2025, 6, 17)), ("today-30", date(2025, 5, 19)),
+    ("today + 2", date(2025, 6, 20)), ("month_start", date(2025, 6, 1)), ("2025-01-05", date(2025, 1, 5)),
+])
+def test_resolve_date(text, expected):
+    assert resolve_date(text, today=TODAY) == expected
+
+
+def test_parse_jobs_expands_databases_and_applies_defaults():
+    jobs = parse_jobs({
+        "defaults": {"format": "csv", "typed": True},
+        "jobs": [{"name": "all", "start_date": "month_start"},
+                 {"name": "one", "database": "hussain trader", "format": "xlsx", "summaries": True}],
+    }, output_dir="out", today=TODAY)
+    assert [(job.name, job.label, job.format) for job in jobs] == [
+        ("all", "Pharma Solution", "csv"), ("all", "Hussain Trader", "csv"), ("one", "Hussain Trader", "xlsx")]
+    assert jobs[0].database == "PS_TRADE" and jobs[0].typed and jobs[0].start_date == date(2025, 6, 1)
+    assert jobs[2].summaries and all(job.output_dir == "out" for job in jobs)
+
+
+@pytest.mark.parametrize("entry, message", [
+    ({"database": "nowhere"}, "unknown database"),
+    ({"format": "pdf"}, "format"),
+    ({"format": "csv", "summary_only": True}, "summaries need format xlsx"),
+    ({"invoice_type": "Bogus"}, "invoice_type"),
+    ({"start_date": "2025-02-01", "end_date": "2025-01-01"}, "after end_date"),
+])
+def test_parse_jobs_rejects_bad_entries(entry, message):
+    with pytest.raises(JobFileError, match=message):
+        parse_jobs({"jobs": [entry]}, today=TODAY)
+
+
+def test_csv_job_streams_every_row(db_path, tmp_path):
+    job = make_job(tmp_path, fmt="csv", typed=True)
+    conn = connect(db_path)
+    try:
+        result = run_job(job, conn, sqlite_builder())
+    finally:
+        conn.close()
+    with open(result["path"], newline="", encoding="utf-8") as f:
+        assert sum(1 for _ in csv.reader(f)) == result["rows"] + 1
+    assert result["rows"] > 0
+    # Written under a .part name and renamed once complete
+    assert os.listdir(tmp_path) == [os.path.basename(result["path"])]
+
+
+def test_xlsx_summary_modes(db_path, tmp_path):
+    conn = connect(db_path)
+    try:
+        with_rows = run_job(make_job(tmp_path, summaries=True, file_name="rows.xlsx"), conn, sqlite_builder())
+        totals = run_job(make_job(tmp_path, summary_only=True, file_name="totals.xlsx"), conn, sqlite_builder())
+    finally:
+        conn.close()
+    summary_names = list(SUMMARY_SHEETS.values())
+    rows_sheets = pd.read_excel(with_rows["path"], sheet_name=None)
+    totals_sheets = pd.read_excel(totals["path"], sheet_name=None)
+    assert list(rows_sheets) == ["Sheet1"] + summary_names
+    assert len(rows_sheets["Sheet1"]) == with_rows["rows"]
+    assert list(totals_sheets) == summary_names
+    for name in summary_names:
+        assert rows_sheets[name].shape == totals_sheets[name].shape
+
+
+def test_run_jobs_reports_failures_per_job(tmp_path):
+    def connect_or_fail(database):
+        raise ConnectionError(f"{database} is down")
+
+    jobs = [make_job(tmp_path, fmt="csv")]
+    outcomes = run_jobs(jobs, connect=connect_or_fail)
+    assert [(job, result) for job, result, _ in outcomes] == [(jobs[0], None)]
+    assert isinstance(outcomes[0][2], ConnectionError)
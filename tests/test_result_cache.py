@@ -0,0 +1,49 @@
+import pandas as pd
+
+from result_cache import ResultCache, make_cache_key
+
+TYPED = make_cache_key("PS_TRADE", "01-Jan-2025", "31-Jan-2025", "", "", typed=True)
+TEXT = make_cache_key("PS_TRADE", "01-Jan-2025", "31-Jan-2025", "", "", typed=False)
+
+
+def test_lookup_over_both_flavours_counts_once():
+    cache = ResultCache()
+    assert cache.get_first([TYPED, TEXT]) is None
+    assert (cache.hits, cache.misses) == (0, 1)
+    cache.put(TEXT, pd.DataFrame({"a": [1]}))
+    assert list(cache.get_first([TYPED, TEXT])["a"]) == [1]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_keys_ignore_case_and_whitespace_but_not_typed():
+    assert make_cache_key("PS_TRADE ", "01-jan-2025", "31-Jan-2025", "AND  x > 1", "") == \
+        make_cache_key("ps_trade", "01-Jan-2025", " 31-JAN-2025", "and x > 1", None)
+    assert TYPED != TEXT
+
+
+def test_expired_entries_are_misses_and_dropped():
+    cache = ResultCache(ttl_seconds=-1)
+    cache.put(TEXT, pd.DataFrame({"a": [1]}))
+    assert cache.get(TEXT) is None
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["bytes"] == 0
+
+
+def test_least_recently_used_is_evicted_first():
+    frame = pd.DataFrame({"a": range(100)})
+    size = int(frame.memory_usage(index=True, deep=True).sum())
+    cache = ResultCache(max_bytes=2 * size)
+    first, second, third = (make_cache_key(db, "", "", "", "") for db in ("a", "b", "c"))
+    cache.put(first, frame)
+    cache.put(second, frame)
+    cache.get(first)
+    cache.put(third, frame)
+    assert cache.get(second) is None
+    assert cache.get(first) is not None and cache.get(third) is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_result_bigger_than_the_cache_is_not_kept():
+    cache = ResultCache(max_bytes=10)
+    assert cache.put(TEXT, pd.DataFrame({"a": range(100)})) is False
+    assert cache.get(TEXT) is None
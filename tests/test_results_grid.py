@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+
+from results_grid import filter_mask, page_count, view_positions
+
+FRAME = pd.DataFrame({
+    "Institute": ["Alpha Clinic", "beta lab", "Gamma", "ALPHA store", None],
+    "Balance": [1500.0, 20.0, np.nan, 1000.0, 5.0],
+})
+
+
+def test_text_filter_is_case_insensitive_contains():
+    assert list(filter_mask(FRAME["Institute"], "alpha")) == [True, False, False, True, False]
+
+
+def test_numeric_comparisons_accept_thousands_separators():
+    assert list(filter_mask(FRAME["Balance"], ">=1,000")) == [True, False, False, True, False]
+    assert list(filter_mask(FRAME["Balance"], "< 20")) == [False, False, False, False, True]
+    assert list(filter_mask(FRAME["Balance"], "=20")) == [False, True, False, False, False]
+
+
+def test_view_filters_then_sorts_with_missing_values_last():
+    assert list(view_positions(FRAME, sort_column="Balance")) == [4, 1, 3, 0, 2]
+    assert list(view_positions(FRAME, sort_column="Balance", ascending=False)) == [0, 3, 1, 4, 2]
+    assert list(view_positions(FRAME, "Institute", "a", "Balance")) == [1, 3, 0, 2]
+
+
+def test_page_count_rounds_up_and_never_drops_below_one():
+    assert page_count(0, 100) == 1
+    assert page_count(100, 100) == 1
+    assert page_count(101, 100) == 2
@@ -0,0 +1,53 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from result_cache import make_cache_key
+from snapshot_store import SnapshotStore
+
+KEY = make_cache_key("PS_TRADE", "01-Jan-2025", "31-Jan-2025", "", "", typed=True)
+OTHER_KEY = make_cache_key("Pharma_solution", "01-Jan-2025", "31-Jan-2025", "", "", typed=True)
+FRAME = pd.DataFrame({
+    "Institute": ["Alpha", None, "Gamma"],
+    "Balance": [1.25, np.nan, -3.0],
+    "Day_Passed": [1, 20, 300],
+    "INV_Date": pd.to_datetime(["2025-01-01", None, "2025-01-31"]),
+})
+
+
+def test_save_and_load_round_trip(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    meta = store.save(KEY, FRAME, {"database": "PS_TRADE", "typed": True})
+    df, loaded_meta = store.load(KEY)
+    pd.testing.assert_frame_equal(df, FRAME)
+    assert loaded_meta == meta
+    assert loaded_meta["fields"] == {"database": "PS_TRADE", "typed": True}
+    assert loaded_meta["rows"] == 3
+    assert store.load(OTHER_KEY) is None
+
+
+def test_load_skips_snapshots_older_than_max_age(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    store.save(KEY, FRAME)
+    assert store.load(KEY, max_age=-1) is None
+    assert store.load(KEY, max_age=60) is not None
+
+
+def test_prune_keeps_the_newest_within_max_bytes(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    size = store.save(KEY, FRAME)["bytes"]
+    store.save(OTHER_KEY, FRAME)
+    store.max_bytes = size
+    assert store.prune() == 1
+    assert store.load(KEY) is None
+    assert store.load(OTHER_KEY) is not None
+    assert store.stats()["snapshots"] == 1
+
+
+def test_data_file_without_metadata_is_removed(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    meta = store.save(KEY, FRAME)
+    os.remove(os.path.join(str(tmp_path), meta["id"] + ".json"))
+    store.prune()
+    assert os.listdir(str(tmp_path)) == []
@@ -0,0 +1,54 @@
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+from sql_fetch import fetch_frame
+from summaries import SUMMARY_KINDS, fetch_summaries, summarize
+from synthetic_outstanding import connect, create_database, sqlite_builder
+
+DAYS = 120
+
+
+@pytest.fixture(scope="module")
+def conn(tmp_path_factory):
+    path = create_database(3000, str(tmp_path_factory.mktemp("db") / "outstanding.sqlite"), days=DAYS, seed=1)
+    conn = connect(path)
+    yield conn
+    conn.close()
+
+
+def build_args(invoice_type, payment_terms):
+    end = date.today()
+    start = end - timedelta(days=DAYS - 1)
+    return start.strftime("%d-%b-%Y"), end.strftime("%d-%b-%Y"), invoice_type, payment_terms, "", "0001", "989801"
+
+
+# Same rows regardless of how ties in the sort order came out
+def normalized(summary):
+    keys = [col for col in summary.columns if summary[col].dtype == object]
+    return summary.sort_values(keys).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("invoice_type, payment_terms", [("All", "All"), ("Over Credit", "Cash")])
+def test_sql_summaries_match_pandas(conn, invoice_type, payment_terms):
+    builder = sqlite_builder()
+    args = build_args(invoice_type, payment_terms)
+    sql, params = builder.build(*args, typed=True)
+    rows = fetch_frame(conn, sql, params, typed=True)
+    assert len(rows) > 0
+    in_pandas = summarize(rows)
+    in_sql = fetch_summaries(conn, builder, *args)
+    for kind in SUMMARY_KINDS:
+        assert list(in_pandas[kind].columns) == list(in_sql[kind].columns)
+        pd.testing.assert_frame_equal(normalized(in_pandas[kind]), normalized(in_sql[kind]), check_dtype=False)
+
+
+def test_chunked_summaries_match_whole_frame(conn):
+    builder = sqlite_builder()
+    sql, params = builder.build(*build_args("All", "All"), typed=True)
+    rows = fetch_frame(conn, sql, params, typed=True)
+    whole = summarize(rows)
+    chunked = summarize(rows.iloc[i:i + 100] for i in range(0, len(rows), 100))
+    for kind in SUMMARY_KINDS:
+        pd.testing.assert_frame_equal(normalized(whole[kind]), normalized(chunked[kind]), check_exact=False)